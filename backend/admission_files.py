@@ -0,0 +1,126 @@
+# admission_files.py
+# Streaming reader for admission rosters (CSV / XLSX) used by bulk_admit.py.
+#
+# The upload is copied to a temp file in CHUNK_BYTES pieces (it outlives the request, the job
+# reads it in the background), then read row by row: the csv module for .csv, openpyxl in
+# read-only mode for .xlsx. Rows come out as validated, normalized (email, name) pairs in lists
+# of BATCH_ROWS, so memory stays flat however long the file is, and the API process no longer
+# needs pandas.
+import os
+import csv
+import tempfile
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+MAX_UPLOAD_BYTES = int(os.getenv("ADMIT_UPLOAD_MAX_BYTES", 50 * 1024 * 1024))
+BATCH_ROWS = int(os.getenv("ADMIT_BATCH_ROWS", 1000))
+CHUNK_BYTES = 1024 * 1024
+
+CSV, XLSX = "csv", "xlsx"
+DEFAULT_NAME = "Student"
+
+
+class RosterError(Exception):
+    """Unusable upload (the API answers 400/413)."""
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def kind_for(filename):
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return CSV
+    if name.endswith(".xlsx") or name.endswith(".xlsm"):
+        return XLSX
+    raise RosterError("Invalid file format. Please upload CSV or Excel.")
+
+
+async def spool(upload):
+    """Copies an UploadFile to a temp file in chunks; returns its path (the caller deletes it)."""
+    fd, path = tempfile.mkstemp(prefix="admit_", suffix="." + kind_for(upload.filename))
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await upload.read(CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise RosterError(f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB).", status_code=413)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def _csv_rows(path):
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        yield from csv.reader(f)
+
+
+def _xlsx_rows(path):
+    from openpyxl import load_workbook
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        raise RosterError(f"Invalid file format. Please upload CSV or Excel. ({e})")
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _rows(path, kind):
+    return _csv_rows(path) if kind == CSV else _xlsx_rows(path)
+
+
+def _columns(header):
+    columns = {str(c).lower().strip(): i for i, c in enumerate(header or ()) if c is not None}
+    if "email" not in columns:
+        raise RosterError("Missing 'email' column in file.")
+    return columns["email"], columns.get("name")
+
+
+def check(path, kind):
+    """Reads just the header: raises RosterError when the file can't be admitted from."""
+    rows = _rows(path, kind)
+    try:
+        _columns(next(rows, None))
+    except RosterError:
+        raise
+    except Exception as e:
+        raise RosterError(f"Invalid file format. Please upload CSV or Excel. ({e})")
+    finally:
+        rows.close()
+
+
+def _cell(row, index):
+    if index is None or index >= len(row) or row[index] is None:
+        return ""
+    return str(row[index]).strip()
+
+
+def batches(path, kind):
+    """
+    Yields (students, skipped) per BATCH_ROWS data rows: students is [(email, name)], unique within
+    the batch (first row wins); skipped counts rows without a plausible email.
+    """
+    rows = _rows(path, kind)
+    try:
+        email_at, name_at = _columns(next(rows, None))
+        students, skipped, read = {}, 0, 0
+        for row in rows:
+            read += 1
+            email = _cell(row, email_at)
+            if "@" in email and " " not in email:
+                students.setdefault(email, _cell(row, name_at) or DEFAULT_NAME)
+            elif any(_cell(row, i) for i in range(len(row))):   # blank lines aren't "skipped"
+                skipped += 1
+            if read >= BATCH_ROWS:
+                yield list(students.items()), skipped
+                students, skipped, read = {}, 0, 0
+        if read:
+            yield list(students.items()), skipped
+    finally:
+        rows.close()
@@ -0,0 +1,431 @@
+# async_worker.py
+# Standalone asyncio execution worker (alternative to the gevent Celery worker for run_code_task).
+#
+# Reads the same Redis queue Celery uses for executions ("execution", see celery_config.task_routes),
+# runs the submission on Judge0 over an async keep-alive HTTP/2 client and writes the result
+# exactly where Celery would ("celery-task-meta-<id>"), so /api/v1/result and /api/v1/stream
+# don't know which worker handled a task. Both kinds of worker can consume the queue at once.
+#
+# One process keeps up to ASYNC_WORKER_CONCURRENCY Judge0 calls in flight. Memory stays bounded:
+# a message is only taken off the queue once a slot is free, so the backlog waits in Redis.
+# Taken messages sit in a per-worker "processing" list until finished. Every worker process has
+# its own id (host:pid) and keeps a heartbeat key alive; any worker that finds a processing list
+# whose owner stopped heartbeating (crash / kill) puts its messages back on the queue.
+#
+# Run:  python async_worker.py
+#       ASYNC_WORKER_QUEUE=execution_exam python async_worker.py   (exam lane, see execution_lanes.py)
+import os
+import sys
+import json
+import time
+import socket
+import base64
+import asyncio
+import datetime
+from dotenv import load_dotenv
+import httpx
+import redis.asyncio as aioredis
+from celery_config import REDIS_URL, EXECUTION_QUEUE, redis_sync
+from executors import (
+    EXECUTOR_BACKEND, JUDGE0_BATCH_SIZE, JUDGE0_BATCH_CONCURRENCY, JUDGE0_POLL_INTERVAL,
+    JUDGE0_BATCH_TIMEOUT, JUDGE0_MAX_WALL_TIME, COMPILATION_ERROR_ID, PENDING_STATUS_IDS,
+    GOVERNOR_ENABLED, Judge0Executor,
+)
+from grading import (
+    COMPILED_LANGUAGES, PYTHON_LANGUAGE_ID, no_progress, parse_test_cases,
+    build_python_driver, python_time_budget, cases_stdin, grade_python_result, grade_harness_result, grade_case_results,
+    redact_hidden,
+)
+from harnesses import build_function_harness, harness_stdin
+from judge0_governor import AsyncJudge0Governor
+import http_client
+import result_cache
+import execution_events
+import challenge_cases
+import execution_lanes
+import result_storage
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+CONCURRENCY = int(os.getenv("ASYNC_WORKER_CONCURRENCY", 500))            # tasks in flight per process
+MAX_CONNECTIONS = int(os.getenv("ASYNC_WORKER_MAX_CONNECTIONS", 200))    # sockets to Judge0
+MAX_KEEPALIVE = int(os.getenv("ASYNC_WORKER_MAX_KEEPALIVE", 50))
+HTTP2 = os.getenv("ASYNC_WORKER_HTTP2", "true").lower() == "true"
+WORKER_ID = os.getenv("ASYNC_WORKER_ID", f"{socket.gethostname()}:{os.getpid()}")
+HEARTBEAT_TTL = int(os.getenv("ASYNC_WORKER_HEARTBEAT_TTL", 30))        # seconds without a beat => worker dead
+RECOVERY_INTERVAL = int(os.getenv("ASYNC_WORKER_RECOVERY_INTERVAL", 60))
+RESULT_EXPIRES = int(os.getenv("ASYNC_WORKER_RESULT_EXPIRES", result_storage.RESULT_TTL))   # same as celery_config.result_expires
+BATCH_MODE = os.getenv("EXECUTION_BATCH_MODE", "true").lower() == "true"
+COMPILE_ONCE = os.getenv("EXECUTION_COMPILE_ONCE", "true").lower() == "true"
+QUEUE = os.getenv("ASYNC_WORKER_QUEUE", EXECUTION_QUEUE)
+
+TASK_NAME = "worker.run_code_task"
+PROCESSING_PREFIX = f"{QUEUE}:processing:"
+PROCESSING_KEY = PROCESSING_PREFIX + WORKER_ID
+HEARTBEAT_PREFIX = f"{QUEUE}:worker:"
+CELERY_RESULT_PREFIX = "celery-task-meta-"
+
+
+# ---------------------------------------------------------
+# ASYNC JUDGE0 CLIENT (same requests as executors.Judge0Executor)
+# ---------------------------------------------------------
+class AsyncJudge0Client:
+    def __init__(self, redis_conn):
+        self.builder = Judge0Executor()
+        self.governor = AsyncJudge0Governor(redis_conn) if GOVERNOR_ENABLED else None
+        self.http = httpx.AsyncClient(
+            http2=HTTP2 and _has_h2(),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+            timeout=httpx.Timeout(http_client.READ_TIMEOUT, connect=http_client.CONNECT_TIMEOUT, pool=None),
+            transport=httpx.AsyncHTTPTransport(retries=http_client.RETRIES, http2=HTTP2 and _has_h2()),
+        )
+
+    async def close(self):
+        await self.http.aclose()
+
+    async def _send(self, send, cost=1):
+        if self.governor is None:
+            return await send()
+        return await self.governor.call(send, cost=cost)
+
+    async def unavailable_reason(self):
+        if self.governor is None: return None
+        open_for = await self.governor.open_for()
+        if open_for > 0:
+            return f"Code execution service is temporarily unavailable. Please retry in {int(open_for) + 1}s."
+        return None
+
+    async def execute(self, source_code, language_id, stdin):
+        url, querystring, payload = self.builder.single_request(source_code, language_id, stdin)
+        try:
+            response = await self._send(lambda: self.http.post(url, json=payload, headers=self.builder.headers(), params=querystring))
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def execute_many(self, source_code, language_id, stdins):
+        request = self.builder.many_request(source_code, language_id, stdins)
+        if request is None:
+            return await self.execute_batch(source_code, language_id, stdins)
+
+        url, querystring, payload = request
+        try:
+            response = await self._send(lambda: self.http.post(url, json=payload, headers=self.builder.headers(), params=querystring, timeout=JUDGE0_MAX_WALL_TIME + 10))
+            data = response.json()
+        except Exception as e:
+            data = {"error": str(e)}
+
+        results = Judge0Executor.parse_many(data, len(stdins))
+        return results if results is not None else await self.execute_batch(source_code, language_id, stdins)
+
+    async def _submit_chunk(self, source_code, language_id, stdins):
+        url, querystring, payload = self.builder.batch_submit_request(source_code, language_id, stdins)
+        try:
+            response = await self._send(lambda: self.http.post(url, json=payload, headers=self.builder.headers(), params=querystring), cost=len(stdins))
+            body = response.json()
+            if isinstance(body, list):
+                return body
+            return [{"error": str(body)}] * len(stdins)
+        except Exception as e:
+            return [{"error": str(e)}] * len(stdins)
+
+    async def _poll_chunk(self, tokens):
+        url, querystring = self.builder.batch_poll_request(tokens)
+        try:
+            response = await self._send(lambda: self.http.get(url, headers=self.builder.headers(), params=querystring))
+            return response.json().get("submissions", [])
+        except Exception:
+            return []
+
+    async def _gather_limited(self, coros):
+        """Like asyncio.gather, but at most JUDGE0_BATCH_CONCURRENCY at once (per task, as in the sync path)."""
+        limit = asyncio.Semaphore(max(1, JUDGE0_BATCH_CONCURRENCY))
+        async def run(coro):
+            async with limit:
+                return await coro
+        return await asyncio.gather(*(run(c) for c in coros))
+
+    async def execute_batch(self, source_code, language_id, stdins):
+        n = len(stdins)
+        results = [None] * n
+        tokens = [None] * n
+        chunk_ranges = [(i, min(i + JUDGE0_BATCH_SIZE, n)) for i in range(0, n, JUDGE0_BATCH_SIZE)]
+
+        # 1. Fan out submissions
+        submitted = await self._gather_limited(self._submit_chunk(source_code, language_id, stdins[a:b]) for a, b in chunk_ranges)
+        for (start, _), items in zip(chunk_ranges, submitted):
+            for offset, item in enumerate(items):
+                if item.get("token"):
+                    tokens[start + offset] = item["token"]
+                else:
+                    results[start + offset] = {"error": item.get("error", "Submission rejected")}
+
+        # 2. Poll all outstanding tokens together
+        pending = {tok: i for i, tok in enumerate(tokens) if tok}
+        deadline = time.time() + JUDGE0_BATCH_TIMEOUT
+        while pending and time.time() < deadline:
+            await asyncio.sleep(JUDGE0_POLL_INTERVAL)
+            pending_tokens = list(pending)
+            token_chunks = [pending_tokens[i:i + JUDGE0_BATCH_SIZE] for i in range(0, len(pending_tokens), JUDGE0_BATCH_SIZE)]
+            polled = [sub for subs in await self._gather_limited(self._poll_chunk(c) for c in token_chunks) for sub in subs]
+
+            for sub in polled:
+                status_id = sub.get("status", {}).get("id", 0)
+                if sub.get("token") not in pending or status_id in PENDING_STATUS_IDS:
+                    continue
+                results[pending.pop(sub["token"])] = sub
+                # ⛔ Same source everywhere: one compile error means they all fail
+                if status_id == COMPILATION_ERROR_ID:
+                    return results
+
+        for i in pending.values():
+            results[i] = {"error": "Judge0 batch timed out"}
+        return results
+
+
+def _has_h2():
+    try:
+        import h2  # noqa: F401  (httpx[http2] extra)
+        return True
+    except ImportError:
+        return False
+
+
+# ---------------------------------------------------------
+# GRADING (async twin of worker.run_code)
+# ---------------------------------------------------------
+async def run_code(client, source_code, language_id, test_cases_json, progress=no_progress, function_name=None):
+    if not client.builder.is_configured():
+        return {"status": "error", "output": client.builder.config_error()}
+
+    unavailable = await client.unavailable_reason()
+    if unavailable:
+        return {"status": "error", "output": unavailable}
+
+    test_cases = parse_test_cases(test_cases_json)
+    if test_cases is None:
+        return {"status": "error", "output": "Invalid Test Cases Format"}
+
+    total_start = time.time()
+
+    # STRATEGY 1: PYTHON (Inject Driver Code - Fastest)
+    if language_id == PYTHON_LANGUAGE_ID:
+        driver = build_python_driver(source_code, time_budget=python_time_budget(client.builder.time_limit()))
+        progress("running", total=len(test_cases))
+        data = await client.execute(driver, language_id, cases_stdin(test_cases))
+        progress("grading")
+        return grade_python_result(data, test_cases, progress)
+
+    # STRATEGY 1b: JAVA / C++ function harness (falls through when it doesn't fit)
+    harness = build_function_harness(source_code, language_id, function_name)
+    if harness:
+        progress("running", total=len(test_cases))
+        data = await client.execute(harness, language_id, harness_stdin(test_cases))
+        progress("grading")
+        report = grade_harness_result(data, test_cases, progress)
+        if report is not None:
+            return report
+
+    # STRATEGY 2: JAVA / C++ (compiled once, then run per case)
+    stdins = [case.get("input") for case in test_cases]
+    progress("running", total=len(test_cases))
+    if COMPILE_ONCE and language_id in COMPILED_LANGUAGES:
+        batch = await client.execute_many(source_code, language_id, stdins)
+    elif BATCH_MODE:
+        batch = await client.execute_batch(source_code, language_id, stdins)
+    else:
+        batch = []
+        for inp in stdins:
+            data = await client.execute(source_code, language_id, inp)
+            batch.append(data)
+            if data.get("status", {}).get("id") == COMPILATION_ERROR_ID: break
+        batch += [None] * (len(stdins) - len(batch))
+    progress("grading")
+    return grade_case_results(test_cases, batch, total_start, progress)
+
+
+# ---------------------------------------------------------
+# QUEUE PLUMBING (Celery protocol v2 over the Redis transport)
+# ---------------------------------------------------------
+class AsyncExecutionWorker:
+    def __init__(self):
+        if "rediss://" in REDIS_URL:
+            self.redis = aioredis.from_url(REDIS_URL, decode_responses=True, ssl_cert_reqs="none")
+        else:
+            self.redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+        self.client = AsyncJudge0Client(self.redis)
+        self.slots = asyncio.Semaphore(CONCURRENCY)
+        self.background = set()   # fire-and-forget publishes (kept referenced until done)
+        self.stopping = False
+        self.keepalive = None
+
+    def _fire(self, coro):
+        task = asyncio.ensure_future(coro)
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+
+    async def _publish(self, task_id, payload):
+        try:
+            if payload.get("type") == "progress" and payload.get("stage") != "case":
+                await self.redis.set(execution_events.stage_key(task_id), payload["stage"], ex=execution_events.STAGE_TTL)
+            await self.redis.publish(execution_events.channel(task_id), json.dumps(payload))
+        except Exception as e:
+            print(f"Progress publish failed (ignored): {e}")
+
+    def progress_publisher(self, task_id):
+        def progress(stage, **fields):
+            self._fire(self._publish(task_id, {"type": "progress", "stage": stage, **fields}))
+        return progress
+
+    async def store_result(self, task_id, result, status="SUCCESS"):
+        """Writes the result the way Celery's Redis backend does, so AsyncResult(task_id) sees it."""
+        key = CELERY_RESULT_PREFIX + task_id
+        meta = json.dumps({
+            "status": status,
+            "result": result,
+            "traceback": None,
+            "children": [],
+            "date_done": datetime.datetime.utcnow().isoformat(),
+            "task_id": task_id,
+        })
+        pipe = self.redis.pipeline()
+        pipe.set(key, meta, ex=RESULT_EXPIRES)
+        pipe.publish(key, meta)
+        await pipe.execute()
+
+    async def heartbeat(self):
+        await self.redis.set(HEARTBEAT_PREFIX + WORKER_ID, time.time(), ex=HEARTBEAT_TTL)
+
+    async def requeue_leftovers(self):
+        """Messages taken by workers that stopped heartbeating (crash / kill) go back on the queue."""
+        async for key in self.redis.scan_iter(match=PROCESSING_PREFIX + "*"):
+            owner = key[len(PROCESSING_PREFIX):]
+            if owner == WORKER_ID or await self.redis.exists(HEARTBEAT_PREFIX + owner):
+                continue
+            moved = 0
+            while await self.redis.rpoplpush(key, QUEUE):   # atomic per message: two recoverers never double it
+                moved += 1
+            if moved:
+                print(f"♻️ Requeued {moved} unfinished execution(s) of dead worker {owner}")
+
+    async def keep_alive(self):
+        """Heartbeat every HEARTBEAT_TTL/3 seconds, dead-worker recovery every RECOVERY_INTERVAL."""
+        last_recovery = time.monotonic()
+        while not self.stopping:
+            await asyncio.sleep(HEARTBEAT_TTL / 3)
+            try:
+                await self.heartbeat()
+                if time.monotonic() - last_recovery >= RECOVERY_INTERVAL:
+                    last_recovery = time.monotonic()
+                    await self.requeue_leftovers()
+            except Exception as e:
+                print(f"Heartbeat/recovery failed (retrying): {e}")
+
+    async def fail(self, task_id, error):
+        """Stores a Celery-style FAILURE so pollers of task_id stop waiting, and tells stream listeners."""
+        await self.store_result(task_id, {"exc_type": type(error).__name__, "exc_message": [str(error)], "exc_module": "builtins"}, status="FAILURE")
+        self._fire(self._publish(task_id, {"type": "result", "status": "failed", "error": str(error)}))
+
+    async def handle(self, raw):
+        task_id = None
+        try:
+            message = json.loads(raw)
+            headers = message.get("headers") or {}
+            task_id = headers.get("id") or (message.get("properties") or {}).get("correlation_id")
+            task_name = headers.get("task")
+            if task_name != TASK_NAME:
+                # Not ours: hand it to the Celery workers on the default queue
+                await self.redis.lpush("celery", raw)
+                return
+            args, kwargs, _embed = json.loads(base64.b64decode(message["body"]))
+            params = dict(zip(("source_code", "language_id", "test_cases_json", "function_name"), args), **kwargs)
+            source_code, language_id, test_cases_json = params["source_code"], params["language_id"], params["test_cases_json"]
+            function_name, challenge_id = params.get("function_name"), params.get("challenge_id")
+            asyncio.get_running_loop().run_in_executor(None, execution_lanes.record_wait, redis_sync, params.get("lane"), params.get("enqueued_at"))
+
+            progress = self.progress_publisher(task_id)
+            progress("started")
+
+            # 📚 Challenge runs reference their cases (see challenge_cases.py)
+            cache_cases, run_function = test_cases_json, function_name
+            if challenge_id is not None:
+                cache_cases = challenge_cases.cache_ref(challenge_id, params.get("test_case_version"))
+                snapshot = await challenge_cases.resolve_async(self.redis, challenge_id, params.get("test_case_version"))
+                if snapshot is None:
+                    result = {"status": "error", "output": "This challenge no longer exists."}
+                    await self.store_result(task_id, result)
+                    self._fire(self._publish(task_id, execution_events.result_event(result)))
+                    return
+                test_cases_json = snapshot["test_cases"]
+                run_function = function_name or snapshot.get("function_name")
+
+            try:
+                result = result_storage.compact(await run_code(self.client, source_code, language_id, test_cases_json, progress=progress, function_name=run_function))
+            except Exception as e:
+                print(f"❌ Execution {task_id} crashed: {e}")
+                await self.fail(task_id, e)
+                return
+
+            # ⚡ Same redaction, cache + events as worker.run_code_task
+            result = redact_hidden(result, parse_test_cases(test_cases_json) or [])
+            key = result_cache.cache_key(source_code, language_id, cache_cases, function_name)
+            await asyncio.get_running_loop().run_in_executor(None, result_cache.store, redis_sync, key, result)
+            await self.store_result(task_id, result_storage.pack(result))
+            self._fire(self._publish(task_id, execution_events.result_event(result)))
+        except Exception as e:
+            print(f"❌ Bad execution message dropped: {e}")
+            if task_id:
+                # The sender is polling this id: answer with a failure instead of leaving it pending forever
+                try:
+                    await self.fail(task_id, e)
+                except Exception as store_error:
+                    print(f"❌ Could not store failure for {task_id}: {store_error}")
+        finally:
+            await self.redis.lrem(PROCESSING_KEY, 1, raw)
+            self.slots.release()
+
+    async def run(self):
+        await self.heartbeat()
+        await self.requeue_leftovers()
+        self.keepalive = asyncio.ensure_future(self.keep_alive())
+        print(f"🚀 Async execution worker {WORKER_ID}: queue={QUEUE} concurrency={CONCURRENCY}")
+        while not self.stopping:
+            await self.slots.acquire()   # 🚦 only take work we have room for
+            try:
+                raw = await self.redis.brpoplpush(QUEUE, PROCESSING_KEY, timeout=5)
+            except Exception as e:
+                self.slots.release()
+                print(f"Queue read failed, retrying: {e}")
+                await asyncio.sleep(1)
+                continue
+            if raw is None:
+                self.slots.release()
+                continue
+            self._fire(self.handle(raw))
+
+    async def drain(self):
+        self.stopping = True
+        if self.keepalive: self.keepalive.cancel()
+        while self.background:
+            await asyncio.gather(*list(self.background), return_exceptions=True)
+        await self.client.close()
+        await self.redis.delete(HEARTBEAT_PREFIX + WORKER_ID)
+        await self.redis.close()
+
+
+async def main():
+    worker = AsyncExecutionWorker()
+    try:
+        await worker.run()
+    finally:
+        await worker.drain()
+
+
+if __name__ == "__main__":
+    if EXECUTOR_BACKEND != "judge0":
+        print("async_worker only drives Judge0; use the Celery worker for EXECUTOR_BACKEND=local.")
+        sys.exit(1)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Async execution worker stopped.")
@@ -0,0 +1,242 @@
+# bulk_admit.py
+# Set-based bulk admission (/api/v1/admin/bulk-admit): create missing students and enroll
+# everyone in one course with a handful of statements instead of ~4 round trips per row.
+#
+# The roster file (spooled to disk by admission_files.py) is read in batches of ADMIT_BATCH_ROWS
+# rows; each batch goes through:
+#   1. prefetch   existing users, one IN query per BATCH_SIZE emails
+#   2. hashing    passwords for the new users only, through password_hashing's pool; when the
+#                 pool is saturated (HashingBusy, e.g. a login burst) the job backs off and waits
+#   3. writing    one transaction: multi-row INSERT ... ON CONFLICT (email) DO NOTHING RETURNING for
+#                 users (rows that lost a race with another signup are re-read), then the course's
+#                 missing enrollments, multi-row. The transaction holds an advisory lock per course,
+#                 since enrollments have no unique key to conflict on.
+#   4. emailing   credentials for the users this batch created, after commit
+# A student repeated in a later batch is simply found as existing there.
+#
+# Jobs run as a task in the API process that received the file; state lives in one Redis hash
+# per job ("bulk_admit:<job_id>"): course_id, status (queued|running|completed|failed), phase,
+# counters (total = valid rows read so far, skipped, existing, created, hashed, enrolled,
+# already_enrolled, emailed, email_failed), error, timestamps.
+# A job whose process died stops heartbeating and reads "interrupted"; uploading the same file
+# again is safe (existing users and enrollments are skipped).
+import os
+import time
+import uuid
+import asyncio
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from dotenv import load_dotenv
+from database import AsyncSessionLocal
+import models
+import password_hashing
+import admission_files
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+BATCH_SIZE = int(os.getenv("BULK_ADMIT_BATCH_SIZE", 1000))             # rows per IN / INSERT statement
+SYNC_WAIT = float(os.getenv("BULK_ADMIT_SYNC_WAIT", 10))              # seconds the upload request waits for small jobs
+EMAIL_CONCURRENCY = int(os.getenv("BULK_ADMIT_EMAIL_CONCURRENCY", 4))
+JOB_TTL = int(os.getenv("BULK_ADMIT_JOB_TTL", 24 * 3600))
+STALE_AFTER = int(os.getenv("BULK_ADMIT_STALE_AFTER", 120))           # seconds without progress => interrupted
+HASH_RETRY_DELAY = float(os.getenv("BULK_ADMIT_HASH_RETRY_DELAY", 0.5))  # first back-off when the hashing pool is full
+HASH_RETRY_MAX_DELAY = float(os.getenv("BULK_ADMIT_HASH_RETRY_MAX_DELAY", 10))
+
+PREFIX = "bulk_admit:"
+LOCK_NAMESPACE = 7301   # pg_advisory_xact_lock(LOCK_NAMESPACE, course_id)
+COUNTERS = ("total", "skipped", "existing", "created", "hashed", "enrolled", "already_enrolled", "emailed", "email_failed")
+
+_running = set()   # strong refs, so the event loop doesn't drop running jobs
+
+
+def job_key(job_id):
+    return PREFIX + job_id
+
+
+def _chunks(items):
+    for i in range(0, len(items), BATCH_SIZE):
+        yield items[i:i + BATCH_SIZE]
+
+
+def _decode(raw):
+    if not raw:
+        return None
+    job = dict(raw)
+    for field in COUNTERS:
+        job[field] = int(job.get(field) or 0)
+    job["course_id"] = int(job["course_id"])
+    if job["status"] in ("queued", "running") and time.time() - float(job.get("updated_at") or 0) > STALE_AFTER:
+        job["status"] = "interrupted"
+    return job
+
+
+async def create(redis_conn, course_id, requested_by):
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    pipe = redis_conn.pipeline()
+    pipe.hset(job_key(job_id), mapping={
+        "job_id": job_id, "course_id": course_id, "requested_by": requested_by, "status": "queued", "phase": "",
+        **{field: 0 for field in COUNTERS}, "created_at": now, "updated_at": now,
+    })
+    pipe.expire(job_key(job_id), JOB_TTL)
+    await pipe.execute()
+    return job_id
+
+
+async def get(redis_conn, job_id):
+    return _decode(await redis_conn.hgetall(job_key(job_id)))
+
+
+async def _update(redis_conn, job_id, **fields):
+    await redis_conn.hset(job_key(job_id), mapping={**fields, "updated_at": time.time()})
+
+
+async def _count(redis_conn, job_id, **increments):
+    pipe = redis_conn.pipeline()
+    for field, n in increments.items():
+        pipe.hincrby(job_key(job_id), field, n)
+    pipe.hset(job_key(job_id), "updated_at", time.time())
+    await pipe.execute()
+
+
+# ---------------------------------------------------------
+# PIPELINE
+# ---------------------------------------------------------
+async def _existing_users(session, emails):
+    found = {}
+    for chunk in _chunks(emails):
+        res = await session.execute(select(models.User.email, models.User.id).where(models.User.email.in_(chunk)))
+        found.update(res.all())
+    return found
+
+
+async def _insert_users(session, rows):
+    """{email: id} of the users actually inserted."""
+    inserted = {}
+    now = datetime.utcnow()
+    for chunk in _chunks(rows):
+        stmt = (
+            pg_insert(models.User)
+            .values([{**row, "role": "student", "is_active": True, "created_at": now} for row in chunk])
+            .on_conflict_do_nothing(index_elements=["email"])
+            .returning(models.User.email, models.User.id)
+        )
+        inserted.update((await session.execute(stmt)).all())
+    return inserted
+
+
+async def _enroll(session, course_id, user_ids):
+    """(enrolled, already_enrolled) for `user_ids` in `course_id`."""
+    enrolled = set()
+    for chunk in _chunks(user_ids):
+        res = await session.execute(select(models.Enrollment.user_id).where(
+            models.Enrollment.course_id == course_id, models.Enrollment.user_id.in_(chunk)
+        ))
+        enrolled.update(res.scalars().all())
+    missing = [uid for uid in user_ids if uid not in enrolled]
+    now = datetime.utcnow()
+    for chunk in _chunks(missing):
+        await session.execute(pg_insert(models.Enrollment).values([
+            {"user_id": uid, "course_id": course_id, "enrolled_at": now, "enrollment_type": "paid"} for uid in chunk
+        ]))
+    return len(missing), len(user_ids) - len(missing)
+
+
+async def _hash_passwords(redis_conn, job_id, passwords, progress):
+    """
+    password_hashing.hash_many, one pool-sized batch at a time, waiting out HashingBusy with
+    exponential back-off instead of failing the job (sign-ins keep their share of the pool).
+    """
+    hashes, delay = [], HASH_RETRY_DELAY
+    while len(hashes) < len(passwords):
+        try:
+            hashes += await password_hashing.hash_many(passwords[len(hashes):len(hashes) + password_hashing.WORKERS])
+        except password_hashing.HashingBusy:
+            await _update(redis_conn, job_id, phase="hashing (pool busy, waiting)")   # keeps the job from reading as stale
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, HASH_RETRY_MAX_DELAY)
+            continue
+        delay = HASH_RETRY_DELAY
+        await progress(len(hashes))
+    return hashes
+
+
+async def _admit_batch(redis_conn, job_id, course_id, students, make_password, send_email):
+    """Stages 1-4 for one batch of [(email, name)] (unique emails), counting into the job as it goes."""
+    emails = [email for email, _ in students]
+    async with AsyncSessionLocal() as session:
+        existing = await _existing_users(session, emails)
+    new = [(email, name, make_password()) for email, name in students if email not in existing]
+    await _count(redis_conn, job_id, total=len(students), existing=len(existing))
+    await _update(redis_conn, job_id, phase="hashing")
+
+    reported = 0
+    async def hashed(done):
+        nonlocal reported
+        await _count(redis_conn, job_id, hashed=done - reported)
+        reported = done
+    hashes = await _hash_passwords(redis_conn, job_id, [password for _, _, password in new], hashed)
+
+    await _update(redis_conn, job_id, phase="writing")
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(text("SELECT pg_advisory_xact_lock(:ns, :course_id)"), {"ns": LOCK_NAMESPACE, "course_id": course_id})
+            created = await _insert_users(session, [
+                {"email": email, "full_name": name, "hashed_password": h} for (email, name, _), h in zip(new, hashes)
+            ])
+            ids = {**existing, **created}
+            lost = [email for email in emails if email not in ids]   # signed up while we were hashing
+            if lost:
+                ids.update(await _existing_users(session, lost))
+            enrolled, already = await _enroll(session, course_id, [ids[email] for email in emails])
+    await _count(redis_conn, job_id, created=len(created), enrolled=enrolled, already_enrolled=already)
+
+    await _update(redis_conn, job_id, phase="emailing")
+    to_email = [(email, name, password) for email, name, password in new if email in created]
+    for i in range(0, len(to_email), EMAIL_CONCURRENCY):
+        batch = to_email[i:i + EMAIL_CONCURRENCY]
+        results = await asyncio.gather(*(asyncio.to_thread(send_email, *args) for args in batch), return_exceptions=True)
+        for (email, _, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                print(f"Failed to email {email}: {result}")
+        failed = sum(isinstance(result, Exception) for result in results)
+        await _count(redis_conn, job_id, emailed=len(batch) - failed, email_failed=failed)
+
+
+async def run(redis_conn, job_id, course_id, path, kind, make_password, send_email):
+    """
+    Admits every student in the roster file at `path` (admission_files kind) into `course_id`,
+    one admission_files batch at a time, and deletes the file when done.
+    `make_password()` generates a password, `send_email(email, name, password)` is blocking (run in a thread).
+    """
+    rows = admission_files.batches(path, kind)
+    try:
+        await _update(redis_conn, job_id, status="running", started_at=time.time())
+        while True:
+            await _update(redis_conn, job_id, phase="reading")
+            batch = await asyncio.to_thread(next, rows, None)   # parsing is blocking: off the loop
+            if batch is None:
+                break
+            students, skipped = batch
+            await _count(redis_conn, job_id, skipped=skipped)
+            await _admit_batch(redis_conn, job_id, course_id, students, make_password, send_email)
+
+        job = await get(redis_conn, job_id)
+        await _update(redis_conn, job_id, status="completed", phase="", finished_at=time.time())
+        print(f"👥 Bulk admit {job_id}: course {course_id}, {job['created']} created, {job['enrolled']} enrolled, {job['emailed']} emailed")
+    except Exception as e:
+        print(f"❌ Bulk admit {job_id} failed: {e}")
+        await _update(redis_conn, job_id, status="failed", error=str(e), finished_at=time.time())
+    finally:
+        rows.close()
+        os.unlink(path)
+
+
+def start(redis_conn, job_id, course_id, path, kind, make_password, send_email):
+    """Runs the job in the background of this process; returns its asyncio task."""
+    task = asyncio.create_task(run(redis_conn, job_id, course_id, path, kind, make_password, send_email))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return task
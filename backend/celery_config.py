@@ -1,8 +1,10 @@
 import os
+import redis
 from celery import Celery
 from celery.schedules import crontab
 from dotenv import load_dotenv
 import backup_manager
+import result_storage
 load_dotenv()
 
 # Get the REDIS_URL from Render, or default to localhost for your laptop
@@ -17,6 +19,25 @@ celery_app = Celery(
 
 celery_app.conf.imports = ('worker',)
 
+# Code execution gets its own queue so the asyncio worker (async_worker.py) can
+# consume it too. Celery workers listen on both queues (see start_worker.sh).
+# Exam runs are sent to EXAM_EXECUTION_QUEUE instead (see execution_lanes.py).
+EXECUTION_QUEUE = os.getenv("EXECUTION_QUEUE", "execution")
+EXAM_EXECUTION_QUEUE = os.getenv("EXAM_EXECUTION_QUEUE", "execution_exam")
+celery_app.conf.task_routes = {'worker.run_code_task': {'queue': EXECUTION_QUEUE}}
+# Check queues in the order given to -Q (exam lane first) instead of round-robin.
+# visibility_timeout: an unacked acks_late task (regrades) is redelivered after this many seconds,
+# so it must cover the longest job; regrade.py also locks each job against a double run.
+celery_app.conf.broker_transport_options = {
+    "queue_order_strategy": "priority",
+    "visibility_timeout": int(os.getenv("CELERY_VISIBILITY_TIMEOUT", 6 * 3600)),
+}
+# Don't let a shared worker hoard practice messages while exam ones arrive behind them
+celery_app.conf.worker_prefetch_multiplier = int(os.getenv("CELERY_PREFETCH_MULTIPLIER", 1))
+
+# Results are only needed until the client has read them (see result_storage.py)
+celery_app.conf.result_expires = result_storage.RESULT_TTL
+
 # OPTIONAL: Fix for SSL if Render requires it (Common in production Redis)
 if "rediss://" in REDIS_URL:
     celery_app.conf.update(
@@ -24,9 +45,19 @@ if "rediss://" in REDIS_URL:
         redis_backend_use_ssl={"ssl_cert_reqs": "none"},
     )
     
+# Plain (sync) Redis connection for worker-side helpers (result cache, progress events, ...)
+if "rediss://" in REDIS_URL:
+    redis_sync = redis.Redis.from_url(REDIS_URL, decode_responses=True, ssl_cert_reqs="none")
+else:
+    redis_sync = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    
 celery_app.conf.beat_schedule = {
     'daily-database-backup': {
         'task': 'worker.run_backup_task',
         'schedule': crontab(hour=3, minute=0), # Runs at 3:00 AM every day
     },
+    'evict-execution-results': {
+        'task': 'worker.evict_results_task',
+        'schedule': result_storage.EVICT_INTERVAL,
+    },
 }    
\ No newline at end of file
@@ -0,0 +1,172 @@
+# challenge_cases.py
+# Challenge test cases by reference: the API enqueues (challenge_id, test_case_version)
+# instead of the full case list, and the worker looks the cases up.
+#
+# Redis holds one immutable snapshot per version ("challenge_cases:<id>:v<version>") plus a
+# pointer to the current version ("challenge_cases:<id>:current"). update_challenge bumps
+# CourseChallenge.test_case_version and drops the pointer, so the next execute re-publishes
+# from the DB. It also records that version as a floor ("challenge_cases:<id>:min"): a publish
+# that read the challenge before the update commits carries an older version and is refused,
+# instead of pointing `current` back at the old cases after the invalidation. Workers keep
+# recently used snapshots in a small in-process LRU; since a snapshot never changes,
+# (id, version) is a safe cache key and no invalidation is needed there.
+# A snapshot missing from Redis (evicted, flushed) is reloaded from course_challenges and put
+# back, so runs don't fail just because Redis lost it; if the DB has moved on to a newer
+# version meanwhile, the current cases are used.
+import os
+import json
+import asyncio
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+SNAPSHOT_TTL = int(os.getenv("CHALLENGE_CASES_TTL", 7 * 24 * 3600))
+LRU_SIZE = int(os.getenv("CHALLENGE_CASES_LRU_SIZE", 256))
+
+PREFIX = "challenge_cases:"
+
+
+def snapshot_key(challenge_id, version):
+    return f"{PREFIX}{challenge_id}:v{version}"
+
+
+def current_key(challenge_id):
+    return f"{PREFIX}{challenge_id}:current"
+
+
+def floor_key(challenge_id):
+    return f"{PREFIX}{challenge_id}:min"
+
+
+# KEYS: snapshot, current, floor   ARGV: version, snapshot json, snapshot ttl, pointer ttl
+PUBLISH_LUA = """
+local floor = tonumber(redis.call('GET', KEYS[3]) or '0')
+if tonumber(ARGV[1]) < floor then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[4])
+return 1
+"""
+
+
+def cache_ref(challenge_id, version):
+    """What result_cache hashes in place of the case list for challenge runs."""
+    return {"challenge_id": int(challenge_id), "version": int(version)}
+
+
+# --- 🚀 API SIDE (async redis) ---
+async def current_version(redis_conn, challenge_id):
+    """Published version for the challenge, or None (never published / invalidated / Redis down)."""
+    try:
+        version = await redis_conn.get(current_key(challenge_id))
+        return int(version) if version else None
+    except Exception as e:
+        print(f"Challenge cases lookup failed (ignored): {e}")
+        return None
+
+
+async def publish(redis_conn, challenge_id, version, test_cases, function_name=None):
+    """
+    Stores the snapshot and points `current` at it, unless `version` is older than the last
+    invalidation's. Returns False if it was refused or Redis is unavailable.
+    """
+    try:
+        script = redis_conn.register_script(PUBLISH_LUA)
+        keys = [snapshot_key(challenge_id, version), current_key(challenge_id), floor_key(challenge_id)]
+        # Snapshot outlives the pointer, so a task enqueued right before expiry still finds it
+        snapshot = json.dumps({"test_cases": test_cases, "function_name": function_name})
+        published = await script(keys=keys, args=[int(version), snapshot, SNAPSHOT_TTL + 3600, SNAPSHOT_TTL])
+        if not published:
+            print(f"Challenge cases publish for {challenge_id} v{version} refused: a newer version exists")
+        return bool(published)
+    except Exception as e:
+        print(f"Challenge cases publish failed: {e}")
+        return False
+
+
+async def invalidate(redis_conn, challenge_id, version=None):
+    """Drops the pointer; `version` (the DB's test_case_version after the change) becomes the floor."""
+    try:
+        pipe = redis_conn.pipeline()
+        if version is not None:
+            pipe.set(floor_key(challenge_id), int(version), ex=SNAPSHOT_TTL)
+        pipe.delete(current_key(challenge_id))
+        await pipe.execute()
+    except Exception as e:
+        print(f"Challenge cases invalidation failed: {e}")
+
+
+# --- 🔄 WORKER SIDE (in-process LRU in front of Redis) ---
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _remember(key, snapshot):
+    with _lru_lock:
+        _lru[key] = snapshot
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _local(key):
+    with _lru_lock:
+        snapshot = _lru.get(key)
+        if snapshot is not None:
+            _lru.move_to_end(key)
+        return snapshot
+
+
+def load_from_db(challenge_id, version):
+    """
+    The challenge's cases straight from the DB, re-stored as the snapshot of the DB's version
+    (sync; the async worker runs it in a thread). None if the challenge is gone.
+    """
+    from sqlalchemy import text
+    from database import get_sync_engine
+    from celery_config import redis_sync
+
+    with get_sync_engine().connect() as conn:
+        row = conn.execute(text("SELECT test_cases, function_name, test_case_version FROM course_challenges WHERE id = :cid"), {"cid": challenge_id}).first()
+    if row is None:
+        return None
+    test_cases, function_name, db_version = row
+    db_version = db_version or 1
+    if db_version != int(version):
+        print(f"Challenge {challenge_id} v{version} snapshot is gone and the DB is at v{db_version}: using the current cases")
+    snapshot = {"test_cases": test_cases, "function_name": function_name}
+    try:
+        redis_sync.set(snapshot_key(challenge_id, db_version), json.dumps(snapshot), ex=SNAPSHOT_TTL + 3600)
+    except Exception as e:
+        print(f"Challenge cases republish failed: {e}")
+    if db_version == int(version):
+        _remember(snapshot_key(challenge_id, version), snapshot)
+    return snapshot
+
+
+def resolve(redis_conn, challenge_id, version):
+    """Returns {"test_cases": <json str>, "function_name": ...}, from Redis or else the DB; None if the challenge is gone."""
+    key = snapshot_key(challenge_id, version)
+    snapshot = _local(key)
+    if snapshot is None:
+        blob = redis_conn.get(key)
+        if not blob:
+            return load_from_db(challenge_id, version)
+        snapshot = json.loads(blob)
+        _remember(key, snapshot)
+    return snapshot
+
+
+async def resolve_async(redis_conn, challenge_id, version):
+    key = snapshot_key(challenge_id, version)
+    snapshot = _local(key)
+    if snapshot is None:
+        blob = await redis_conn.get(key)
+        if not blob:
+            return await asyncio.get_running_loop().run_in_executor(None, load_from_db, challenge_id, version)
+        snapshot = json.loads(blob)
+        _remember(key, snapshot)
+    return snapshot
@@ -1,3 +1,4 @@
+from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 import os
@@ -46,5 +47,15 @@ async def get_db():
         finally:
             await session.close()
 
+# 🔄 Sync engine for Celery tasks (psycopg2). Created on first use so the API never opens it.
+SYNC_DATABASE_URL = ASYNC_DATABASE_URL.replace("postgresql+asyncpg://", "postgresql+psycopg2://")
+_sync_engine = None
+
+def get_sync_engine():
+    global _sync_engine
+    if _sync_engine is None:
+        _sync_engine = create_engine(SYNC_DATABASE_URL, pool_size=2, max_overflow=3, pool_recycle=1800, pool_pre_ping=True)
+    return _sync_engine
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379") 
 redis_client = redis.from_url(REDIS_URL, decode_responses=True)
\ No newline at end of file
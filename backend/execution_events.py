@@ -0,0 +1,67 @@
+# execution_events.py
+# Live progress for code execution tasks over Redis pub/sub.
+#
+# The worker publishes small JSON events on "exec_events:<task_id>":
+#   {"type": "progress", "stage": "started"}                  worker picked the task up
+#   {"type": "progress", "stage": "running", "total": 10}     submission sent to the executor
+#   {"type": "progress", "stage": "grading"}                  executor answered, outputs being compared
+#   {"type": "progress", "stage": "case", "index": 3, "total": 10, "status": "Passed"}
+#   {"type": "result", "status": "completed", "data": {...}}   <- same shape as GET /api/v1/result/{task_id}
+# The API relays them to the browser as Server-Sent Events (see /api/v1/stream/{task_id}), opening
+# with the task's last stage ("queued" until a worker takes it, from "exec_events:<task_id>:stage").
+#
+# "case" events are post-hoc: every strategy gets all cases back from the executor at once (one
+# driver/harness run, one compile-once run, or a routed batch), so they are emitted while grading,
+# after "grading", not while the code runs. Live signals during a run are the stages above.
+import json
+
+CHANNEL_PREFIX = "exec_events:"
+STAGE_TTL = 3600
+QUEUED = "queued"
+
+
+def channel(task_id):
+    return CHANNEL_PREFIX + task_id
+
+
+def stage_key(task_id):
+    return f"{CHANNEL_PREFIX}{task_id}:stage"
+
+
+def publish(redis_conn, task_id, payload):
+    """Fire-and-forget: progress is best effort, polling stays the source of truth."""
+    if not task_id: return
+    try:
+        redis_conn.publish(channel(task_id), json.dumps(payload))
+    except Exception as e:
+        print(f"Progress publish failed (ignored): {e}")
+
+
+def progress_publisher(redis_conn, task_id):
+    """Returns a progress(stage, **fields) callback bound to one task."""
+    def progress(stage, **fields):
+        if stage != "case" and task_id:
+            try:
+                redis_conn.set(stage_key(task_id), stage, ex=STAGE_TTL)
+            except Exception as e:
+                print(f"Progress stage store failed (ignored): {e}")
+        publish(redis_conn, task_id, {"type": "progress", "stage": stage, **fields})
+    return progress
+
+
+async def current_stage(redis_conn, task_id):
+    """Last stage a worker reported for the task (API side), QUEUED when none yet."""
+    try:
+        return await redis_conn.get(stage_key(task_id)) or QUEUED
+    except Exception:
+        return QUEUED
+
+
+def result_event(result):
+    return {"type": "result", "status": "completed", "data": result}
+
+
+def sse(payload, event=None):
+    """Formats one Server-Sent Events frame."""
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(payload) if not isinstance(payload, str) else payload}\n\n"
@@ -0,0 +1,144 @@
+# execution_lanes.py
+# Priority lanes for run_code_task, so a flood of practice "Run" clicks can't delay a live exam.
+#
+#   exam      -> EXAM_EXECUTION_QUEUE ("execution_exam"): CodeTest runs by a student with an open
+#                attempt at that test, and runs for a scheduled ContentItem by an enrolled
+#                student inside its start_time..end_time window who opened it (or has progress
+#                on it) and wasn't terminated by proctoring. Dedicated workers consume only this
+#                lane (reserved capacity); shared workers check it before the practice lane.
+#   practice  -> EXECUTION_QUEUE ("execution"): everything else. Best effort: it has the smaller
+#                backlog limit and is refused first while the exam lane is backed up.
+#
+# Metrics per lane: depth (LLEN of the queue + runs still parked in fair_share.py) and wait time
+# (enqueue -> worker pickup). The API stamps `enqueued_at` on the task, the worker records the
+# wait into "exec_lane:<lane>:waits" (newest WAIT_SAMPLES, for percentiles) and running totals
+# in "exec_lane:<lane>:totals".
+#
+# An attempt ("exec_lane:attempt:<kind>:<id>:<user>") is opened when a student starts a test
+# with its pass key (kind "test", closed when they submit) or opens a scheduled item inside its
+# window (kind "item"); it expires after the time limit / window plus ATTEMPT_GRACE, so a known
+# id alone doesn't get anyone into the exam lane.
+import os
+import time
+from dotenv import load_dotenv
+from celery_config import EXECUTION_QUEUE, EXAM_EXECUTION_QUEUE
+import fair_share
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+PRACTICE_MAX_DEPTH = int(os.getenv("EXEC_QUEUE_MAX_DEPTH", 500))
+EXAM_MAX_DEPTH = int(os.getenv("EXAM_QUEUE_MAX_DEPTH", 2000))
+SHED_PRACTICE_AT = int(os.getenv("EXEC_SHED_PRACTICE_AT_EXAM_DEPTH", 50))   # exam backlog that pauses practice
+WAIT_SAMPLES = int(os.getenv("EXEC_LANE_WAIT_SAMPLES", 500))
+ATTEMPT_GRACE = int(os.getenv("EXAM_ATTEMPT_GRACE", 300))       # seconds past the time limit
+DEFAULT_ATTEMPT_MINUTES = 180                                   # tests without a time limit
+
+EXAM, PRACTICE = "exam", "practice"
+TEST_ATTEMPT, ITEM_ATTEMPT = "test", "item"
+QUEUES = {EXAM: EXAM_EXECUTION_QUEUE, PRACTICE: EXECUTION_QUEUE}
+MAX_DEPTH = {EXAM: EXAM_MAX_DEPTH, PRACTICE: PRACTICE_MAX_DEPTH}
+
+PREFIX = "exec_lane:"
+
+
+def queue_for(lane):
+    return QUEUES.get(lane, EXECUTION_QUEUE)
+
+
+def _waits_key(lane): return f"{PREFIX}{lane}:waits"
+def _totals_key(lane): return f"{PREFIX}{lane}:totals"
+def _attempt_key(kind, ref_id, user): return f"{PREFIX}attempt:{kind}:{ref_id}:{user}"
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else None
+
+
+# --- 🚀 API SIDE (async redis) ---
+async def open_attempt(redis_conn, ref_id, user, time_limit_minutes=None, kind=TEST_ATTEMPT):
+    ttl = int((time_limit_minutes or DEFAULT_ATTEMPT_MINUTES) * 60) + ATTEMPT_GRACE
+    await redis_conn.set(_attempt_key(kind, ref_id, user), int(time.time()), ex=ttl)
+
+
+async def close_attempt(redis_conn, ref_id, user, kind=TEST_ATTEMPT):
+    await redis_conn.delete(_attempt_key(kind, ref_id, user))
+
+
+async def has_open_attempt(redis_conn, ref_id, user, kind=TEST_ATTEMPT):
+    try:
+        return bool(await redis_conn.exists(_attempt_key(kind, ref_id, user)))
+    except Exception as e:
+        print(f"Exam attempt lookup failed (practice lane): {e}")
+        return False
+
+
+async def _depths(redis_conn):
+    """{lane: (queued in Celery, parked in fair-share)}"""
+    pipe = redis_conn.pipeline()
+    for lane in QUEUES:
+        pipe.llen(QUEUES[lane])
+        pipe.get(fair_share.pending_key(lane))
+    raw = await pipe.execute()
+    return {lane: (int(raw[2 * i]), max(0, int(raw[2 * i + 1] or 0))) for i, lane in enumerate(QUEUES)}
+
+
+async def depths(redis_conn):
+    return {lane: queued + parked for lane, (queued, parked) in (await _depths(redis_conn)).items()}
+
+
+async def admission_error(redis_conn, lane):
+    """None when `lane` may take another task, otherwise why not (the caller answers 429)."""
+    try:
+        depth = await depths(redis_conn)
+    except Exception:
+        return None
+    if depth[lane] >= MAX_DEPTH[lane]:
+        return "Execution queue is busy. Please retry shortly."
+    if lane == PRACTICE and depth[EXAM] >= SHED_PRACTICE_AT:
+        return "Practice runs are paused while exams are being graded. Please retry shortly."
+    return None
+
+
+async def stats(redis_conn):
+    depth = await _depths(redis_conn)
+    pipe = redis_conn.pipeline()
+    for lane in QUEUES:
+        pipe.lrange(_waits_key(lane), 0, -1)
+        pipe.hgetall(_totals_key(lane))
+    raw = await pipe.execute()
+
+    out = {}
+    for i, lane in enumerate(QUEUES):
+        samples = sorted(float(v) for v in raw[2 * i])
+        totals = raw[2 * i + 1]
+        count = int(totals.get("count") or 0)
+        out[lane] = {
+            "queue": QUEUES[lane],
+            "depth": sum(depth[lane]),
+            "queued": depth[lane][0],
+            "fair_share_pending": depth[lane][1],
+            "max_depth": MAX_DEPTH[lane],
+            "tasks": count,
+            "avg_wait_ms": round(float(totals.get("wait_ms") or 0) / count, 1) if count else None,
+            "p50_wait_ms": _percentile(samples, 0.5),
+            "p95_wait_ms": _percentile(samples, 0.95),
+            "max_wait_ms": samples[-1] if samples else None,
+        }
+    return out
+
+
+# --- 🔄 WORKER SIDE (sync redis) ---
+def record_wait(redis_conn, lane, enqueued_at):
+    """Called when a worker picks a task up. Metrics only: failures are ignored."""
+    if lane not in QUEUES or not enqueued_at:
+        return
+    wait_ms = round(max(0.0, time.time() - float(enqueued_at)) * 1000, 1)
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.lpush(_waits_key(lane), wait_ms)
+        pipe.ltrim(_waits_key(lane), 0, WAIT_SAMPLES - 1)
+        pipe.hincrby(_totals_key(lane), "count", 1)
+        pipe.hincrbyfloat(_totals_key(lane), "wait_ms", wait_ms)
+        pipe.execute()
+    except Exception as e:
+        print(f"Lane metrics update failed (ignored): {e}")
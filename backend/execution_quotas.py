@@ -0,0 +1,57 @@
+# execution_quotas.py
+# Per-user execution quotas for /api/v1/execute and challenge submits.
+#
+# Every requester (JWT subject, else client IP) has a token bucket in Redis, refilled at
+# rate_per_min and capped at burst; a run costs one token. Quotas come from the requester's
+# role (EXEC_ROLE_QUOTAS, anonymous callers use the "anonymous" entry). A course listed in
+# EXEC_COURSE_QUOTAS overrides the role quota for runs belonging to that course and gets its
+# own bucket, e.g. to give a contest course more headroom:
+#   EXEC_ROLE_QUOTAS='{"student": {"rate_per_min": 30, "burst": 10}, "instructor": {"rate_per_min": 120, "burst": 40}}'
+#   EXEC_COURSE_QUOTAS='{"12": {"rate_per_min": 60, "burst": 20}}'
+# A quota with rate_per_min <= 0 means unlimited. Redis errors fail open.
+import os
+import json
+import math
+from dotenv import load_dotenv
+from judge0_governor import TOKEN_BUCKET_LUA
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+QUOTAS_ENABLED = os.getenv("EXEC_QUOTAS_ENABLED", "true").lower() == "true"
+DEFAULT_QUOTA = {
+    "rate_per_min": float(os.getenv("EXEC_QUOTA_RATE_PER_MIN", 30)),
+    "burst": float(os.getenv("EXEC_QUOTA_BURST", 10)),
+}
+ROLE_QUOTAS = json.loads(os.getenv("EXEC_ROLE_QUOTAS", '{"anonymous": {"rate_per_min": 10, "burst": 5}, "instructor": {"rate_per_min": 120, "burst": 40}}'))
+COURSE_QUOTAS = {str(k): v for k, v in json.loads(os.getenv("EXEC_COURSE_QUOTAS", "{}")).items()}
+
+PREFIX = "exec_quota:"
+
+
+def has_course_quotas():
+    return bool(COURSE_QUOTAS)
+
+
+def quota_for(role, course_id=None):
+    """Returns (scope, quota): the course override when there is one, else the role's quota."""
+    if course_id is not None and str(course_id) in COURSE_QUOTAS:
+        return f"course:{course_id}", {**DEFAULT_QUOTA, **COURSE_QUOTAS[str(course_id)]}
+    return "global", {**DEFAULT_QUOTA, **ROLE_QUOTAS.get(role or "anonymous", {})}
+
+
+# --- 🚀 API SIDE (async redis) ---
+async def take(redis_conn, requester, role, course_id=None):
+    """Spends one token. Returns 0 when the run may proceed, else seconds until it may (Retry-After)."""
+    if not QUOTAS_ENABLED:
+        return 0
+    scope, quota = quota_for(role, course_id)
+    rate_per_sec = float(quota["rate_per_min"]) / 60
+    if rate_per_sec <= 0:
+        return 0
+    try:
+        bucket = redis_conn.register_script(TOKEN_BUCKET_LUA)
+        wait = float(await bucket(keys=[f"{PREFIX}{scope}:{requester}"], args=[rate_per_sec, float(quota["burst"]), 1]))
+    except Exception as e:
+        print(f"Execution quota check failed (allowing run): {e}")
+        return 0
+    return math.ceil(wait) if wait > 0 else 0
@@ -0,0 +1,251 @@
+# execution_router.py
+# Spreads executions over several backends (RapidAPI Judge0, self-hosted Judge0, local sandbox).
+#
+# Enable with EXECUTOR_BACKEND=router and describe the backends in EXECUTION_BACKENDS (JSON):
+#   [{"name": "rapidapi", "type": "judge0", "weight": 1, "max_concurrency": 8},
+#    {"name": "selfhosted", "type": "judge0", "url": "http://judge0:2358", "auth_token": "...",
+#     "weight": 3, "max_concurrency": 32, "rate_per_sec": 50, "burst": 100},
+#    {"name": "local", "type": "local", "weight": 1, "max_concurrency": 4}]
+#
+# Every call goes to the healthiest backend that supports the language and has a free slot:
+#   cost = latency EWMA * (1 + load) * (1 + 10 * error EWMA) / weight
+# A failed call (transport error, Internal Error, open circuit) fails over to the next backend.
+# With hedging on, a call still running past its backend's p95 is also sent to the
+# second-best backend and the first good answer wins.
+import os
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from celery_config import redis_sync
+from executors import Executor, Judge0Executor, LocalExecutor, API_HOST, API_KEY, STATUS_INTERNAL_ERROR
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+BACKENDS_JSON = os.getenv("EXECUTION_BACKENDS", '[{"name": "rapidapi", "type": "judge0"}]')
+EWMA_ALPHA = float(os.getenv("EXECUTION_ROUTER_EWMA_ALPHA", 0.2))
+MAX_ATTEMPTS = int(os.getenv("EXECUTION_ROUTER_MAX_ATTEMPTS", 2))
+SLOT_WAIT = float(os.getenv("EXECUTION_ROUTER_SLOT_WAIT", 30))          # seconds to wait for any free slot
+HEDGE_ENABLED = os.getenv("EXECUTION_ROUTER_HEDGE", "false").lower() == "true"
+HEDGE_MIN_SAMPLES = int(os.getenv("EXECUTION_ROUTER_HEDGE_MIN_SAMPLES", 20))
+STATS_TTL = int(os.getenv("EXECUTION_ROUTER_STATS_TTL", 600))           # seconds a silent worker's stats are kept
+
+# One hash per worker process ("exec_router:stats:<pid>", field per backend). Each publish refreshes
+# its expiry, so processes that restarted or died drop out on their own instead of piling up.
+STATS_KEY_PREFIX = "exec_router:stats:"
+
+
+class Backend:
+    """One routed executor plus its health numbers (per worker process)."""
+
+    def __init__(self, name, executor, weight=1.0, max_concurrency=8):
+        self.name = name
+        self.executor = executor
+        self.weight = max(float(weight), 0.01)
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.inflight = 0
+        self.latency = None        # EWMA seconds
+        self.error_rate = 0.0      # EWMA of failures (0..1)
+        self.samples = deque(maxlen=200)
+        self.calls = self.failures = 0
+        self.lock = threading.Lock()
+
+    def available(self, language_id):
+        return self.executor.supports(language_id) and self.executor.is_configured() and not self.executor.unavailable_reason()
+
+    def cost(self):
+        latency = self.latency if self.latency is not None else 0.5  # optimistic until measured
+        return latency * (1 + self.inflight / self.max_concurrency) * (1 + 10 * self.error_rate) / self.weight
+
+    def p95(self):
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def record(self, elapsed, failed):
+        with self.lock:
+            self.calls += 1
+            self.failures += int(failed)
+            self.error_rate = EWMA_ALPHA * float(failed) + (1 - EWMA_ALPHA) * self.error_rate
+            if not failed:
+                self.samples.append(elapsed)
+                self.latency = elapsed if self.latency is None else EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * self.latency
+
+    def snapshot(self):
+        return {
+            "weight": self.weight, "max_concurrency": self.max_concurrency, "inflight": self.inflight,
+            "latency_ewma_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_ewma": round(self.error_rate, 3), "p95_ms": round(self.p95() * 1000, 1) if self.p95() else None,
+            "calls": self.calls, "failures": self.failures,
+        }
+
+
+def _failed(result):
+    """Infrastructure failure (worth retrying elsewhere), as opposed to the program's own outcome."""
+    items = result if isinstance(result, list) else [result]
+    items = [r for r in items if r is not None]
+    if not items:
+        return True
+    return all(r.get("error") or r.get("status", {}).get("id") == STATUS_INTERNAL_ERROR["id"] for r in items)
+
+
+class ExecutionRouter(Executor):
+    name = "router"
+
+    def __init__(self, backends):
+        self.backends = backends
+        self.hedge_pool = ThreadPoolExecutor(max_workers=sum(b.max_concurrency for b in backends) or 1)
+
+    @classmethod
+    def from_env(cls):
+        backends = []
+        for spec in json.loads(BACKENDS_JSON):
+            kind = spec.get("type", "judge0")
+            if kind == "local":
+                executor = LocalExecutor(pool_size=int(spec.get("max_concurrency", 4)))
+            else:
+                governor = {k: float(spec[k]) for k in ("rate_per_sec", "burst") if k in spec}
+                primary = "url" not in spec and spec.get("host", API_HOST) == API_HOST
+                executor = Judge0Executor(
+                    host=spec.get("host", API_HOST),
+                    api_key=os.getenv(spec["api_key_env"]) if spec.get("api_key_env") else API_KEY,
+                    base_url=spec.get("url"),
+                    auth_token=spec.get("auth_token"),
+                    # The RapidAPI deployment keeps the default governor keys the API checks
+                    name=None if primary else spec["name"],
+                    governor_options=governor,
+                )
+            backends.append(Backend(spec["name"], executor, spec.get("weight", 1), spec.get("max_concurrency", 8)))
+        print(f"🔀 Execution router: {', '.join(b.name for b in backends)}")
+        return cls(backends)
+
+    # --- Executor interface ---
+    def is_configured(self):
+        return any(b.executor.is_configured() for b in self.backends)
+
+    def config_error(self):
+        return "Server Config Error: no execution backend is configured (EXECUTION_BACKENDS)."
+
+    def unavailable_reason(self):
+        reasons = [b.executor.unavailable_reason() for b in self.backends if b.executor.is_configured()]
+        if reasons and all(reasons):
+            return reasons[0]
+        return None
+
+    def supports(self, language_id):
+        return any(b.executor.supports(language_id) for b in self.backends)
+
+    def time_limit(self):
+        """A run may land on any backend: the tightest limit."""
+        limits = [b.executor.time_limit() for b in self.backends if b.executor.time_limit()]
+        return min(limits) if limits else None
+
+    def execute(self, source_code, language_id, stdin):
+        return self._route("execute", language_id, source_code, language_id, stdin)
+
+    def execute_batch(self, source_code, language_id, stdins):
+        return self._route("execute_batch", language_id, source_code, language_id, stdins)
+
+    def execute_many(self, source_code, language_id, stdins):
+        return self._route("execute_many", language_id, source_code, language_id, stdins)
+
+    # --- Routing ---
+    def _ranked(self, language_id, exclude=()):
+        candidates = [b for b in self.backends if b.name not in exclude and b.available(language_id)]
+        return sorted(candidates, key=lambda b: b.cost())
+
+    def _claim(self, language_id, exclude=()):
+        """Best backend with a free slot (slot taken). Waits up to SLOT_WAIT when all are busy."""
+        deadline = time.time() + SLOT_WAIT
+        while True:
+            ranked = self._ranked(language_id, exclude)
+            if not ranked:
+                return None
+            for backend in ranked:
+                if backend.slots.acquire(blocking=False):
+                    return backend
+            if time.time() >= deadline:
+                return None
+            if ranked[0].slots.acquire(timeout=min(0.5, max(0.0, deadline - time.time()))):
+                return ranked[0]
+
+    def _call(self, backend, op, args):
+        """Runs one call on a claimed backend and releases its slot."""
+        with backend.lock:
+            backend.inflight += 1
+        start = time.time()
+        try:
+            result = getattr(backend.executor, op)(*args)
+        except Exception as e:
+            result = {"error": str(e)}
+        finally:
+            with backend.lock:
+                backend.inflight -= 1
+            backend.slots.release()
+        failed = _failed(result)
+        backend.record(time.time() - start, failed)
+        self._publish_stats(backend)
+        return result, failed
+
+    def _route(self, op, language_id, *args):
+        tried, last = [], {"error": "No execution backend available for this language"}
+        for _ in range(max(1, MAX_ATTEMPTS)):
+            backend = self._claim(language_id, exclude=tried)
+            if backend is None:
+                break
+            tried.append(backend.name)
+            result, failed = self._hedged(backend, op, language_id, args, tried) if HEDGE_ENABLED else self._call(backend, op, args)
+            if not failed:
+                return result
+            print(f"⚠️ Backend {backend.name} failed ({op}), failing over")
+            last = result
+        if op != "execute" and not isinstance(last, list):
+            return [last] * len(args[2])
+        return last
+
+    def _hedged(self, backend, op, language_id, args, tried):
+        primary = self.hedge_pool.submit(self._call, backend, op, args)
+        threshold = backend.p95()
+        if threshold is None:
+            return primary.result()
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+
+        second = self._claim_now(language_id, exclude=tried)
+        if second is None:
+            return primary.result()
+        tried.append(second.name)
+        hedge = self.hedge_pool.submit(self._call, second, op, args)
+        pending = {primary, hedge}
+        outcome = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                outcome = fut.result()
+                if not outcome[1]:
+                    return outcome   # first good answer wins; the slower call finishes in the background
+        return outcome
+
+    def _claim_now(self, language_id, exclude=()):
+        for backend in self._ranked(language_id, exclude):
+            if backend.slots.acquire(blocking=False):
+                return backend
+        return None
+
+    def _publish_stats(self, backend):
+        try:
+            key = f"{STATS_KEY_PREFIX}{os.getpid()}"
+            pipe = redis_sync.pipeline()
+            pipe.hset(key, backend.name, json.dumps({**backend.snapshot(), "updated_at": time.time()}))
+            pipe.expire(key, STATS_TTL)
+            pipe.execute()
+        except Exception:
+            pass
+
+    def stats(self):
+        return {b.name: b.snapshot() for b in self.backends}
@@ -0,0 +1,669 @@
+# executors.py
+# Pluggable code execution backends used by worker.run_code_task.
+#
+# Every backend returns a Judge0-shaped response dict so the grading logic in
+# worker.py doesn't care where the code actually ran:
+#   {"status": {"id": 3, "description": "Accepted"}, "stdout": <b64>, "stderr": <b64>,
+#    "compile_output": <b64>, "time": "0.012", "memory": 1234}
+#
+# Pick the backend with EXECUTOR_BACKEND=judge0 (default), EXECUTOR_BACKEND=local, or
+# EXECUTOR_BACKEND=router to spread load over several of them (execution_router.py).
+import io
+import os
+import sys
+import json
+import time
+import queue
+import base64
+import shutil
+import zipfile
+import socket
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import http_client
+from celery_config import redis_sync
+from judge0_governor import Judge0Governor
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+EXECUTOR_BACKEND = os.getenv("EXECUTOR_BACKEND", "judge0").lower()
+# Bump whenever grading/driver behaviour changes so cached results (result_cache.py) are invalidated
+EXECUTOR_VERSION = "10"
+API_KEY = os.getenv("JUDGE0_API_KEY")
+API_HOST = os.getenv("JUDGE0_API_HOST", "judge0-ce.p.rapidapi.com")
+
+# Rate limit + circuit breaker (see judge0_governor.py)
+GOVERNOR_ENABLED = os.getenv("JUDGE0_GOVERNOR_ENABLED", "true").lower() == "true"
+
+# Batch mode (Judge0 /submissions/batch accepts at most 20 submissions per call by default)
+JUDGE0_BATCH_SIZE = int(os.getenv("JUDGE0_BATCH_SIZE", 20))
+JUDGE0_BATCH_CONCURRENCY = int(os.getenv("JUDGE0_BATCH_CONCURRENCY", 4))
+JUDGE0_POLL_INTERVAL = float(os.getenv("JUDGE0_POLL_INTERVAL", 0.5))
+JUDGE0_BATCH_TIMEOUT = float(os.getenv("JUDGE0_BATCH_TIMEOUT", 60))
+
+# Compile-once mode runs through Judge0's "Multi-file program" language with our own compile/run scripts
+JUDGE0_MULTIFILE_LANGUAGE_ID = int(os.getenv("JUDGE0_MULTIFILE_LANGUAGE_ID", 89))
+JUDGE0_CASE_TIME_LIMIT = float(os.getenv("JUDGE0_CASE_TIME_LIMIT", 5))
+JUDGE0_MAX_WALL_TIME = float(os.getenv("JUDGE0_MAX_WALL_TIME", 20))
+JUDGE0_MAX_CPU_TIME = float(os.getenv("JUDGE0_MAX_CPU_TIME", 15))     # the instance's max_cpu_time_limit
+JUDGE0_CPU_TIME_LIMIT = float(os.getenv("JUDGE0_CPU_TIME_LIMIT", 5))   # single submissions (Judge0 CE default)
+JUDGE0_WALL_TIME_LIMIT = float(os.getenv("JUDGE0_WALL_TIME_LIMIT", 10))
+
+LOCAL_POOL_SIZE = int(os.getenv("LOCAL_EXECUTOR_POOL_SIZE", 4))
+LOCAL_CPU_SECONDS = int(os.getenv("LOCAL_EXECUTOR_CPU_SECONDS", 5))
+LOCAL_WALL_SECONDS = float(os.getenv("LOCAL_EXECUTOR_WALL_SECONDS", 10))
+LOCAL_MEMORY_MB = int(os.getenv("LOCAL_EXECUTOR_MEMORY_MB", 256))
+LOCAL_MAX_PROCESSES = int(os.getenv("LOCAL_EXECUTOR_MAX_PROCESSES", 64))
+LOCAL_USE_NAMESPACES = os.getenv("LOCAL_EXECUTOR_NAMESPACES", "true").lower() == "true"
+# Python runs fork from a warm, pre-imported interpreter instead of starting one (python_forkserver.py)
+LOCAL_PYTHON_FORKSERVER = os.getenv("LOCAL_EXECUTOR_PYTHON_FORKSERVER", "true").lower() == "true"
+
+# Judge0 status ids we emulate
+STATUS_ACCEPTED = {"id": 3, "description": "Accepted"}
+STATUS_TLE = {"id": 5, "description": "Time Limit Exceeded"}
+STATUS_COMPILE_ERROR = {"id": 6, "description": "Compilation Error"}
+STATUS_RUNTIME_ERROR = {"id": 11, "description": "Runtime Error (NZEC)"}
+STATUS_SIGNAL = {"id": 7, "description": "Runtime Error (SIGSEGV)"}
+STATUS_INTERNAL_ERROR = {"id": 13, "description": "Internal Error"}
+COMPILATION_ERROR_ID = 6
+PENDING_STATUS_IDS = (1, 2)  # In Queue, Processing
+
+
+def encode_b64(text):
+    if not text: return ""
+    return base64.b64encode(text.encode('utf-8')).decode('utf-8')
+
+def decode_b64(text):
+    if not text: return ""
+    try:
+        return base64.b64decode(text).decode('utf-8')
+    except:
+        return text
+
+
+class Executor:
+    """Base interface. Subclasses implement execute(); everything else builds on it."""
+    name = "base"
+
+    def is_configured(self):
+        return True
+
+    def config_error(self):
+        return None
+
+    def unavailable_reason(self):
+        """Non-None while the backend is known to be down, so callers can fail fast."""
+        return None
+
+    def supports(self, language_id):
+        return True
+
+    def time_limit(self):
+        """Seconds one execution may run (CPU and wall), or None when unknown."""
+        return None
+
+    def execute(self, source_code, language_id, stdin):
+        raise NotImplementedError
+
+    def execute_batch(self, source_code, language_id, stdins):
+        """
+        Runs the same program once per stdin. Returns a list aligned with `stdins`.
+        Default: fan out execute() over a bounded thread pool. As soon as any run
+        reports a compilation error the remaining runs are cancelled and left as None.
+        """
+        results = [None] * len(stdins)
+        with ThreadPoolExecutor(max_workers=max(1, JUDGE0_BATCH_CONCURRENCY)) as pool:
+            futures = {pool.submit(self.execute, source_code, language_id, inp): i for i, inp in enumerate(stdins)}
+            for fut in as_completed(futures):
+                data = fut.result()
+                results[futures[fut]] = data
+                if data.get("status", {}).get("id") == COMPILATION_ERROR_ID:
+                    for f in futures: f.cancel()
+                    break
+        return results
+
+    def execute_many(self, source_code, language_id, stdins):
+        """
+        Compile-once, run-many: one sandbox invocation builds the program and runs
+        it against every stdin. Same return shape as execute_batch(). Backends
+        without a native implementation fall back to execute_batch().
+        """
+        return self.execute_batch(source_code, language_id, stdins)
+
+
+# ---------------------------------------------------------
+# BACKEND 1: JUDGE0 (RapidAPI / self-hosted)
+# ---------------------------------------------------------
+# Toolchain paths inside the Judge0 CE image, used by the compile-once scripts.
+JUDGE0_TOOLCHAINS = {
+    54: {"file": "main.cpp", "compile": "/usr/local/gcc-9.2.0/bin/g++ -O2 -std=c++17 -o main main.cpp", "run": "./main"},
+    62: {"file": "Main.java", "compile": "/usr/local/openjdk13/bin/javac Main.java", "run": "/usr/local/openjdk13/bin/java Main"},
+}
+
+# Runs the compiled program once per cases/<i>.in and prints, per case:
+#   ---CASE <i> <exit_code> <elapsed_ms>---
+#   <base64 stdout>
+#   <base64 stderr>
+RUN_MANY_SCRIPT = """#!/bin/bash
+for ((i=0; i<{count}; i++)); do
+  s=$(date +%s%N)
+  timeout {case_limit} {run} < cases/$i.in > out_$i 2> err_$i
+  code=$?
+  e=$(date +%s%N)
+  echo "---CASE $i $code $(( (e - s) / 1000000 ))---"
+  base64 -w0 out_$i; echo
+  base64 -w0 err_$i; echo
+done
+"""
+
+class Judge0Executor(Executor):
+    name = "judge0"
+
+    def __init__(self, host=API_HOST, api_key=API_KEY, base_url=None, auth_token=None, name=None, governor_options=None):
+        """
+        RapidAPI (default): host + api_key. Self-hosted: base_url (e.g. http://judge0:2358)
+        and optionally auth_token (Judge0 AUTHN_TOKEN). `name` namespaces the governor keys.
+        """
+        self.host = host
+        self.api_key = api_key
+        self.base_url = (base_url or f"https://{host}").rstrip("/")
+        self.auth_token = auth_token
+        self.self_hosted = base_url is not None
+        if name: self.name = name
+        # 🚦 Shared (Redis) rate limit + circuit breaker across all worker processes
+        namespace = "judge0" if not name else f"judge0:{name}"
+        self.governor = Judge0Governor(redis_sync, namespace=namespace, **(governor_options or {})) if GOVERNOR_ENABLED else None
+
+    def unavailable_reason(self):
+        if self.governor is None: return None
+        open_for = self.governor.open_for()
+        if open_for > 0:
+            return f"Code execution service is temporarily unavailable. Please retry in {int(open_for) + 1}s."
+        return None
+
+    def _send(self, send, cost=1):
+        """Every Judge0 HTTP call goes through here. Raises CircuitOpen/RateLimited when governed."""
+        if self.governor is None:
+            return send()
+        return self.governor.call(send, cost=cost)
+
+    def is_configured(self):
+        return self.self_hosted or bool(self.api_key)
+
+    def time_limit(self):
+        return min(JUDGE0_CPU_TIME_LIMIT, JUDGE0_WALL_TIME_LIMIT)
+
+    def config_error(self):
+        return "Server Config Error: JUDGE0_API_KEY is missing."
+
+    def headers(self):
+        if self.self_hosted:
+            headers = {"content-type": "application/json"}
+            if self.auth_token: headers["X-Auth-Token"] = self.auth_token
+            return headers
+        return {
+            "content-type": "application/json",
+            "X-RapidAPI-Key": self.api_key,
+            "X-RapidAPI-Host": self.host
+        }
+
+    # --- Request builders (shared with the asyncio worker, see async_worker.py) ---
+    def single_request(self, source_code, language_id, stdin):
+        url = f"{self.base_url}/submissions"
+        querystring = {"base64_encoded": "true", "wait": "true"}
+        payload = {
+            "source_code": encode_b64(source_code),
+            "language_id": language_id,
+            "stdin": encode_b64(stdin),
+            "cpu_time_limit": JUDGE0_CPU_TIME_LIMIT,
+            "wall_time_limit": JUDGE0_WALL_TIME_LIMIT,
+        }
+        return url, querystring, payload
+
+    def batch_submit_request(self, source_code, language_id, stdins):
+        url = f"{self.base_url}/submissions/batch"
+        encoded_source = encode_b64(source_code)
+        payload = {"submissions": [
+            {"source_code": encoded_source, "language_id": language_id, "stdin": encode_b64(inp)}
+            for inp in stdins
+        ]}
+        return url, {"base64_encoded": "true"}, payload
+
+    def batch_poll_request(self, tokens):
+        url = f"{self.base_url}/submissions/batch"
+        querystring = {
+            "tokens": ",".join(tokens),
+            "base64_encoded": "true",
+            "fields": "token,status,stdout,stderr,compile_output,time,memory",
+        }
+        return url, querystring
+
+    def many_request(self, source_code, language_id, stdins):
+        """Multi-file submission that compiles once and runs every case. None if not applicable."""
+        toolchain = JUDGE0_TOOLCHAINS.get(language_id)
+        if not toolchain or not stdins:
+            return None
+
+        # The limits cover all cases together: shrink the per-case limit so every case fits in them
+        count = len(stdins)
+        case_limit = max(0.1, min(JUDGE0_CASE_TIME_LIMIT, (JUDGE0_MAX_CPU_TIME - 1) / count, (JUDGE0_MAX_WALL_TIME - 5) / count))
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(toolchain["file"], source_code)
+            zf.writestr("compile", "#!/bin/bash\n" + toolchain["compile"] + "\n")
+            zf.writestr("run", RUN_MANY_SCRIPT.format(count=count, case_limit=round(case_limit, 2), run=toolchain["run"]))
+            for i, inp in enumerate(stdins):
+                zf.writestr(f"cases/{i}.in", str(inp) if inp is not None else "")
+
+        url = f"{self.base_url}/submissions"
+        payload = {
+            "language_id": JUDGE0_MULTIFILE_LANGUAGE_ID,
+            "additional_files": base64.b64encode(buf.getvalue()).decode("utf-8"),
+            "cpu_time_limit": min(JUDGE0_MAX_CPU_TIME, case_limit * count + 1),
+            "wall_time_limit": min(JUDGE0_MAX_WALL_TIME, case_limit * count + 5),
+        }
+        return url, {"base64_encoded": "true", "wait": "true"}, payload
+
+    @staticmethod
+    def parse_many(data, count):
+        """Splits the multi-file run output into per-case results. None = harness failed, use per-case path."""
+        status_id = data.get("status", {}).get("id")
+        if status_id == COMPILATION_ERROR_ID:
+            return [data] + [None] * (count - 1)
+        if status_id not in (3, 5):
+            return None
+
+        results = [None] * count
+        lines = decode_b64(data.get("stdout")).split("\n")
+        for idx, line in enumerate(lines):
+            if not (line.startswith("---CASE ") and line.endswith("---")) or idx + 2 >= len(lines):
+                continue
+            case_id, exit_code, elapsed_ms = (int(x) for x in line[8:-3].split())
+            if exit_code == 0: status = STATUS_ACCEPTED
+            elif exit_code == 124: status = STATUS_TLE      # killed by `timeout`
+            elif exit_code > 128: status = STATUS_SIGNAL
+            else: status = STATUS_RUNTIME_ERROR
+            results[case_id] = {
+                "status": status,
+                "stdout": lines[idx + 1],
+                "stderr": lines[idx + 2],
+                "time": str(elapsed_ms / 1000),
+            }
+
+        # Cases the script never reached (overall time limit hit) inherit the overall status, and say so
+        not_run = {"status": data.get("status"), "stderr": encode_b64("Not run: the overall time limit was reached before this case.")}
+        return [r if r is not None else dict(not_run) for r in results]
+
+    # --- Sync transport ---
+    def execute(self, source_code, language_id, stdin):
+        """
+        Helper to run a single execution on Judge0
+        """
+        url, querystring, payload = self.single_request(source_code, language_id, stdin)
+        try:
+            response = self._send(lambda: http_client.post(url, json=payload, headers=self.headers(), params=querystring))
+            return response.json()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def execute_many(self, source_code, language_id, stdins):
+        """
+        Compile-once, run-many on Judge0: ships source + cases + compile/run scripts
+        as one multi-file submission so the compiler runs once for all cases.
+        Falls back to execute_batch() for other languages or if the run itself fails.
+        """
+        request = self.many_request(source_code, language_id, stdins)
+        if request is None:
+            return self.execute_batch(source_code, language_id, stdins)
+
+        url, querystring, payload = request
+        try:
+            response = self._send(lambda: http_client.post(url, json=payload, headers=self.headers(), params=querystring, timeout=(http_client.CONNECT_TIMEOUT, JUDGE0_MAX_WALL_TIME + 10)))
+            data = response.json()
+        except Exception as e:
+            data = {"error": str(e)}
+
+        results = self.parse_many(data, len(stdins))
+        return results if results is not None else self.execute_batch(source_code, language_id, stdins)
+
+    def _submit_chunk(self, source_code, language_id, stdins):
+        """POST /submissions/batch -> list of tokens (or {"error": ...} per failed item)."""
+        url, querystring, payload = self.batch_submit_request(source_code, language_id, stdins)
+        try:
+            response = self._send(lambda: http_client.post(url, json=payload, headers=self.headers(), params=querystring), cost=len(stdins))
+            body = response.json()
+            if isinstance(body, list):
+                return body
+            return [{"error": str(body)}] * len(stdins)
+        except Exception as e:
+            return [{"error": str(e)}] * len(stdins)
+
+    def _poll_chunk(self, tokens):
+        """GET /submissions/batch?tokens=... -> list of submission dicts (same order)."""
+        url, querystring = self.batch_poll_request(tokens)
+        try:
+            response = self._send(lambda: http_client.get(url, headers=self.headers(), params=querystring))
+            return response.json().get("submissions", [])
+        except Exception:
+            return []
+
+    def execute_batch(self, source_code, language_id, stdins):
+        """
+        Batched Judge0 path: submit all cases via /submissions/batch (chunks of
+        JUDGE0_BATCH_SIZE, up to JUDGE0_BATCH_CONCURRENCY chunks in flight), then
+        poll every outstanding token together until done. Stops early on the first
+        compilation error. Returns a list aligned with `stdins`.
+        """
+        n = len(stdins)
+        results = [None] * n
+        tokens = [None] * n
+        chunk_ranges = [(i, min(i + JUDGE0_BATCH_SIZE, n)) for i in range(0, n, JUDGE0_BATCH_SIZE)]
+
+        # 1. Fan out submissions
+        with ThreadPoolExecutor(max_workers=max(1, JUDGE0_BATCH_CONCURRENCY)) as pool:
+            futures = {pool.submit(self._submit_chunk, source_code, language_id, stdins[a:b]): a for a, b in chunk_ranges}
+            for fut in as_completed(futures):
+                start = futures[fut]
+                for offset, item in enumerate(fut.result()):
+                    if item.get("token"):
+                        tokens[start + offset] = item["token"]
+                    else:
+                        results[start + offset] = {"error": item.get("error", "Submission rejected")}
+
+        # 2. Poll all outstanding tokens together
+        pending = {tok: i for i, tok in enumerate(tokens) if tok}
+        deadline = time.time() + JUDGE0_BATCH_TIMEOUT
+        while pending and time.time() < deadline:
+            time.sleep(JUDGE0_POLL_INTERVAL)
+            pending_tokens = list(pending)
+            token_chunks = [pending_tokens[i:i + JUDGE0_BATCH_SIZE] for i in range(0, len(pending_tokens), JUDGE0_BATCH_SIZE)]
+            with ThreadPoolExecutor(max_workers=max(1, JUDGE0_BATCH_CONCURRENCY)) as pool:
+                polled = [sub for subs in pool.map(self._poll_chunk, token_chunks) for sub in subs]
+
+            for sub in polled:
+                status_id = sub.get("status", {}).get("id", 0)
+                if sub.get("token") not in pending or status_id in PENDING_STATUS_IDS:
+                    continue
+                results[pending.pop(sub["token"])] = sub
+                # ⛔ Same source everywhere: one compile error means they all fail
+                if status_id == COMPILATION_ERROR_ID:
+                    return results
+
+        for i in pending.values():
+            results[i] = {"error": "Judge0 batch timed out"}
+        return results
+
+
+# ---------------------------------------------------------
+# BACKEND 2: LOCAL SANDBOX (pre-spawned runner pool)
+# ---------------------------------------------------------
+# Judge0 CE language ids the frontend sends -> how to build & run locally.
+# Java gets no address-space rlimit (the JVM reserves far more virtual memory
+# than it uses); its heap is capped with -Xmx instead.
+LOCAL_LANGUAGES = {
+    71: {"file": "main.py", "compile": None, "run": ["python3", "main.py"]},
+    62: {"file": "Main.java", "compile": ["javac", "Main.java"], "run": ["java", f"-Xmx{LOCAL_MEMORY_MB}m", "-Xss64m", "Main"], "rlimit_as": False, "max_processes": 512},
+    54: {"file": "main.cpp", "compile": ["g++", "-O2", "-std=c++17", "-o", "main", "main.cpp"], "run": ["./main"]},
+    63: {"file": "main.js", "compile": None, "run": ["node", "main.js"], "rlimit_as": False},
+}
+
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_runner.py")
+FORKSERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_forkserver.py")
+PYTHON_LANGUAGE_ID = 71
+
+
+class PythonForkServer:
+    """
+    Client for python_forkserver.py. The server is started on first use (scrubbed env, -I)
+    and restarted if it dies; `run` returns a sandbox_runner.run_process-shaped dict, or None
+    when the server can't be used (the caller falls back to the regular runner).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.proc = None
+        self.socket_dir = tempfile.mkdtemp(prefix="pyfork_")
+        self.socket_path = os.path.join(self.socket_dir, "server.sock")
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.proc is not None and self.proc.poll() is None:
+                return True
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            try:
+                self.proc = subprocess.Popen(
+                    [sys.executable, "-I", FORKSERVER_PATH, self.socket_path],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                    env={"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "LANG": "C.UTF-8"},
+                    cwd=self.socket_dir, text=True,
+                )
+                if self.proc.stdout.readline().strip() != "ready":
+                    raise RuntimeError("did not start")
+                return True
+            except Exception as e:
+                print(f"⚠️ Python fork server unavailable, using the regular runner: {e}")
+                self.proc = None
+                return False
+
+    def run(self, job, timeout):
+        if not self._ensure_started():
+            return None
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.settimeout(timeout)
+                conn.connect(self.socket_path)
+                conn.sendall((json.dumps(job) + "\n").encode("utf-8"))
+                data = b""
+                while not data.endswith(b"\n"):
+                    chunk = conn.recv(65536)
+                    if not chunk:
+                        break
+                    data += chunk
+        except socket.timeout:
+            return {"internal_error": "Fork server timed out"}
+        except OSError as e:
+            print(f"⚠️ Python fork server call failed: {e}")
+            return None
+        # No answer means the server/monitor died mid-job: let the caller run it the regular way
+        return json.loads(data) if data else None
+
+
+class LocalExecutor(Executor):
+    """
+    Runs code on this machine. Keeps `pool_size` sandbox_runner.py processes
+    pre-spawned and idle; each one handles exactly one job and is replaced,
+    so no state leaks between submissions and interpreter startup is off the
+    hot path. Python skips the interpreter start entirely: it is forked from a
+    warm PythonForkServer. Concurrency is bounded by the pool size.
+    """
+    name = "local"
+
+    def __init__(self, pool_size=LOCAL_POOL_SIZE):
+        self.pool_size = pool_size
+        self.idle = queue.Queue()
+        self.slots = threading.BoundedSemaphore(pool_size)
+        self.unshare = shutil.which("unshare") if LOCAL_USE_NAMESPACES else None
+        self.python_server = PythonForkServer() if LOCAL_PYTHON_FORKSERVER and PYTHON_LANGUAGE_ID in LOCAL_LANGUAGES else None
+        for _ in range(pool_size):
+            self.idle.put(self._spawn())
+
+    def supports(self, language_id):
+        return language_id in LOCAL_LANGUAGES
+
+    def time_limit(self):
+        return min(LOCAL_CPU_SECONDS, LOCAL_WALL_SECONDS)
+
+    def _spawn(self):
+        return subprocess.Popen(
+            [sys.executable, RUNNER_PATH],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True
+        )
+
+    def _acquire_runner(self):
+        runner = self.idle.get()
+        if runner.poll() is not None:  # died while idle, replace it
+            runner = self._spawn()
+        return runner
+
+    def build_job(self, source_code, language_id, stdin):
+        lang = LOCAL_LANGUAGES[language_id]
+        run_cmd = list(lang["run"])
+        # 🔒 Namespace isolation where the kernel allows unprivileged user namespaces
+        if self.unshare:
+            run_cmd = [self.unshare, "--user", "--map-root-user", "--net", "--ipc", "--uts", "--"] + run_cmd
+
+        limits = {
+            "cpu_seconds": LOCAL_CPU_SECONDS,
+            "wall_seconds": LOCAL_WALL_SECONDS,
+            "max_processes": lang.get("max_processes", LOCAL_MAX_PROCESSES),
+            "file_bytes": 16 * 1024 * 1024,
+        }
+        if lang.get("rlimit_as", True):
+            limits["memory_bytes"] = LOCAL_MEMORY_MB * 1024 * 1024
+
+        return {
+            "files": {lang["file"]: source_code},
+            "compile": lang["compile"],
+            "run": run_cmd,
+            "stdin": stdin or "",
+            "limits": limits,
+            "compile_limits": {"cpu_seconds": 30, "wall_seconds": 60, "file_bytes": 256 * 1024 * 1024},
+            "sandboxed": True,
+        }
+
+    def _dispatch(self, job):
+        """Hands one job to an idle runner and returns its raw JSON result."""
+        self.slots.acquire()
+        runner = self._acquire_runner()
+        try:
+            # Outer guard in case the runner itself hangs (compile + every run + margin)
+            runs = len(job["stdins"]) if "stdins" in job else 1
+            timeout = job["compile_limits"]["wall_seconds"] + job["limits"]["wall_seconds"] * runs + 5
+            out, _ = runner.communicate(json.dumps(job) + "\n", timeout=timeout)
+            return json.loads(out) if out else {"internal_error": "Sandbox runner returned no output"}
+        except subprocess.TimeoutExpired:
+            runner.kill()
+            runner.communicate()
+            return {"internal_error": "Sandbox runner timed out"}
+        except Exception as e:
+            runner.kill()
+            return {"internal_error": str(e)}
+        finally:
+            self.idle.put(self._spawn())
+            self.slots.release()
+
+    def _run_python(self, source_code, stdins):
+        """Fork-server path: one warm fork per stdin. Returns run dicts, or None to use the regular runner."""
+        job = self.build_job(source_code, PYTHON_LANGUAGE_ID, "")
+        fork_job = {
+            "source": source_code,
+            "filename": LOCAL_LANGUAGES[PYTHON_LANGUAGE_ID]["file"],
+            "limits": job["limits"],
+            "sandboxed": job["sandboxed"],
+            "namespaces": bool(self.unshare),
+        }
+        runs = []
+        with self.slots:
+            for stdin in stdins:
+                run = self.python_server.run({**fork_job, "stdin": stdin or ""}, timeout=job["limits"]["wall_seconds"] + 5)
+                if run is None:
+                    return None
+                runs.append(run)
+        return runs
+
+    @classmethod
+    def _fork_to_judge0(cls, run):
+        return cls.to_judge0(run) if "internal_error" in run else cls._run_to_judge0(run, None)
+
+    @staticmethod
+    def _compile_failed(raw):
+        comp = raw.get("compile")
+        if comp and (comp["timed_out"] or comp["exit_code"] != 0):
+            return {
+                "status": STATUS_COMPILE_ERROR,
+                "compile_output": encode_b64(comp["stderr"] or comp["stdout"] or "Compilation timed out"),
+            }
+        return None
+
+    @staticmethod
+    def _run_to_judge0(run, comp):
+        if run["timed_out"] or run["signal"] == 24:  # SIGXCPU
+            status = STATUS_TLE
+        elif run["signal"]:
+            status = STATUS_SIGNAL
+        elif run["exit_code"] != 0:
+            status = STATUS_RUNTIME_ERROR
+        else:
+            status = STATUS_ACCEPTED
+
+        return {
+            "status": status,
+            "stdout": encode_b64(run["stdout"]),
+            "stderr": encode_b64(run["stderr"]),
+            "compile_output": encode_b64(comp["stderr"]) if comp else "",
+            "time": str(run["time"]),
+            "wall_time": str(run["wall_time"]),
+            "memory": run["memory_kb"],
+        }
+
+    @classmethod
+    def to_judge0(cls, raw):
+        """Maps a sandbox_runner result onto the Judge0 response shape."""
+        if "internal_error" in raw:
+            return {"status": STATUS_INTERNAL_ERROR, "stderr": encode_b64(raw["internal_error"])}
+        return cls._compile_failed(raw) or cls._run_to_judge0(raw["run"], raw.get("compile"))
+
+    def execute(self, source_code, language_id, stdin):
+        if language_id not in LOCAL_LANGUAGES:
+            return {"status": STATUS_INTERNAL_ERROR, "stderr": encode_b64(f"Language {language_id} not supported by local executor")}
+        if language_id == PYTHON_LANGUAGE_ID and self.python_server:
+            runs = self._run_python(source_code, [stdin])
+            if runs is not None:
+                return self._fork_to_judge0(runs[0])
+        return self.to_judge0(self._dispatch(self.build_job(source_code, language_id, stdin)))
+
+    def execute_many(self, source_code, language_id, stdins):
+        """Compile once in one runner, then run the binary against every stdin."""
+        if language_id not in LOCAL_LANGUAGES:
+            return self.execute_batch(source_code, language_id, stdins)
+        if language_id == PYTHON_LANGUAGE_ID and self.python_server:
+            runs = self._run_python(source_code, stdins)
+            if runs is not None:
+                return [self._fork_to_judge0(run) for run in runs]
+
+        job = self.build_job(source_code, language_id, "")
+        del job["stdin"]
+        job["stdins"] = [inp or "" for inp in stdins]
+        raw = self._dispatch(job)
+
+        if "internal_error" in raw:
+            return [self.to_judge0(raw)] * len(stdins)
+        failed = self._compile_failed(raw)
+        if failed:
+            return [failed] + [None] * (len(stdins) - 1)
+        return [self._run_to_judge0(run, raw.get("compile")) for run in raw["runs"]]
+
+
+# ---------------------------------------------------------
+# FACTORY
+# ---------------------------------------------------------
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Returns the process-wide executor selected by EXECUTOR_BACKEND (created lazily)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if EXECUTOR_BACKEND == "router":
+                    from execution_router import ExecutionRouter  # builds on the classes above
+                    _executor = ExecutionRouter.from_env()
+                else:
+                    _executor = LocalExecutor() if EXECUTOR_BACKEND == "local" else Judge0Executor()
+    return _executor
@@ -0,0 +1,142 @@
+# fair_share.py
+# Fair-share dispatch of executions: pending runs are served round-robin across users
+# instead of FIFO, so one user with 200 queued runs delays everyone else by one run, not 200.
+#
+# The API no longer pushes run_code_task straight onto the Celery queue. It parks the call in
+# the requester's own list, and a dispatcher moves calls to the Celery queue one user at a time,
+# only while that queue holds fewer than DISPATCH_WINDOW messages (so the real backlog, and the
+# ordering decisions, stay here). Redis layout per lane:
+#   fair:<lane>:ring         LIST    requesters with pending runs, in round-robin order
+#   fair:<lane>:user:<who>   LIST    that requester's pending calls (JSON), oldest first
+#   fair:<lane>:pending      STRING  total pending calls in the lane
+# One dispatcher runs per deployment (inside the API processes, elected by a Redis lease).
+# The task id is generated up front, so /api/v1/result and /api/v1/stream work as before;
+# the task just reads PENDING a little longer.
+import os
+import json
+import socket
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+FAIR_SHARE_ENABLED = os.getenv("FAIR_SHARE_ENABLED", "true").lower() == "true"
+DISPATCH_WINDOW = int(os.getenv("FAIR_SHARE_DISPATCH_WINDOW", 40))        # Celery messages kept queued per lane
+MAX_PENDING_PER_USER = int(os.getenv("FAIR_SHARE_MAX_PENDING_PER_USER", 20))
+POLL_INTERVAL = float(os.getenv("FAIR_SHARE_POLL_INTERVAL", 0.05))        # seconds, when idle
+LEASE_TTL = int(os.getenv("FAIR_SHARE_LEASE_TTL", 10))
+
+PREFIX = "fair:"
+LEASE_KEY = f"{PREFIX}dispatcher"
+DISPATCHER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# KEYS: user list, ring, pending counter. ARGV: call, requester, per-user cap.
+# Returns the requester's pending count, or -1 when they are at the cap.
+ENQUEUE_LUA = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[3]) then return -1 end
+local n = redis.call('RPUSH', KEYS[1], ARGV[1])
+if n == 1 then redis.call('RPUSH', KEYS[2], ARGV[2]) end
+redis.call('INCR', KEYS[3])
+return n
+"""
+
+# KEYS: ring, pending counter. ARGV: user list key prefix.
+# Takes the next requester's oldest call; they go to the back of the ring if they have more.
+NEXT_LUA = """
+local who = redis.call('LPOP', KEYS[1])
+if not who then return false end
+local key = ARGV[1] .. who
+local call = redis.call('LPOP', key)
+if redis.call('LLEN', key) > 0 then redis.call('RPUSH', KEYS[1], who) end
+if call then redis.call('DECR', KEYS[2]) end
+return call
+"""
+
+# Puts a call that could not be sent back at the front (same KEYS/ARGV as ENQUEUE_LUA, no cap).
+REQUEUE_LUA = """
+local n = redis.call('LPUSH', KEYS[1], ARGV[1])
+if n == 1 then redis.call('LPUSH', KEYS[2], ARGV[2]) end
+redis.call('INCR', KEYS[3])
+return n
+"""
+
+
+def ring_key(lane): return f"{PREFIX}{lane}:ring"
+def user_prefix(lane): return f"{PREFIX}{lane}:user:"
+def pending_key(lane): return f"{PREFIX}{lane}:pending"
+
+
+class UserBacklogFull(Exception):
+    pass
+
+
+async def enqueue(redis_conn, lane, requester, task_id, args, kwargs, queue):
+    """Parks one run_code_task call. Raises UserBacklogFull when the requester already has too many pending."""
+    call = json.dumps({"task_id": task_id, "args": args, "kwargs": kwargs, "queue": queue, "requester": requester})
+    script = redis_conn.register_script(ENQUEUE_LUA)
+    n = await script(keys=[user_prefix(lane) + requester, ring_key(lane), pending_key(lane)], args=[call, requester, MAX_PENDING_PER_USER])
+    if int(n) < 0:
+        raise UserBacklogFull(f"You already have {MAX_PENDING_PER_USER} runs waiting. Please wait for them to finish.")
+
+
+async def pending(redis_conn, lane):
+    return int(await redis_conn.get(pending_key(lane)) or 0)
+
+
+# ---------------------------------------------------------
+# DISPATCHER
+# ---------------------------------------------------------
+async def _hold_lease(redis_conn):
+    if await redis_conn.set(LEASE_KEY, DISPATCHER_ID, nx=True, ex=LEASE_TTL):
+        return True
+    if await redis_conn.get(LEASE_KEY) == DISPATCHER_ID:
+        await redis_conn.expire(LEASE_KEY, LEASE_TTL)
+        return True
+    return False
+
+
+async def dispatch_once(redis_conn, queues, send):
+    """
+    Moves calls to Celery while each lane's queue has room, lanes in `queues` order (exam first).
+    `send(call)` publishes one call (blocking, run in a thread). Returns the number sent.
+    """
+    next_call = redis_conn.register_script(NEXT_LUA)
+    requeue = redis_conn.register_script(REQUEUE_LUA)
+    sent = 0
+    for lane, queue in queues.items():
+        room = DISPATCH_WINDOW - await redis_conn.llen(queue)
+        while room > 0:
+            raw = await next_call(keys=[ring_key(lane), pending_key(lane)], args=[user_prefix(lane)])
+            if not raw:
+                break
+            call = json.loads(raw)
+            try:
+                await asyncio.to_thread(send, call)
+            except Exception as e:
+                print(f"⚠️ Fair-share dispatch failed, requeued {call['task_id']}: {e}")
+                await requeue(keys=[user_prefix(lane) + call["requester"], ring_key(lane), pending_key(lane)], args=[raw, call["requester"]])
+                return sent
+            room -= 1
+            sent += 1
+    return sent
+
+
+async def run_dispatcher(redis_conn, queues, send):
+    """Background loop (API startup). Only the lease holder dispatches; the others stand by."""
+    print(f"⚖️ Fair-share dispatcher {DISPATCHER_ID} started (window={DISPATCH_WINDOW})")
+    loop = asyncio.get_running_loop()
+    lease_checked, leader = 0.0, False
+    while True:
+        try:
+            if loop.time() - lease_checked > LEASE_TTL / 3:
+                leader, lease_checked = await _hold_lease(redis_conn), loop.time()
+            if not leader:
+                await asyncio.sleep(LEASE_TTL / 3)
+                continue
+            if not await dispatch_once(redis_conn, queues, send):
+                await asyncio.sleep(POLL_INTERVAL)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Fair-share dispatcher error: {e}")
+            await asyncio.sleep(1)
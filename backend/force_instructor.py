@@ -13,6 +13,10 @@ if user:
     print(f"🧐 Current Role: {user.role}")
     user.role = "instructor"
     db.commit()
+    # Role is part of the cached identity (identity_cache.py): drop it so the API sees the change now
+    from celery_config import redis_sync
+    import identity_cache
+    identity_cache.invalidate_sync(redis_sync, user.email)
     print(f"✅ SUCCESS: {user.email} has been forcefully promoted to INSTRUCTOR.")
 else:
     print(f"❌ Error: User {email} not found. Did you delete the db again?")
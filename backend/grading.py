@@ -0,0 +1,440 @@
+# grading.py
+# Shared grading logic for code execution: builds the Python driver and turns
+# executor (Judge0-shaped) responses into the report the frontend renders.
+# Used by the Celery worker (worker.py) and the asyncio worker (async_worker.py);
+# neither side does any I/O in here.
+import os
+import json
+import time
+from executors import decode_b64
+from harnesses import CASE_MARK, NO_FUNCTION_MARK
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+PYTHON_CASE_TIMEOUT = float(os.getenv("PYTHON_CASE_TIMEOUT", 2))          # seconds per test case
+PYTHON_TRACK_MEMORY = os.getenv("PYTHON_TRACK_MEMORY", "true").lower() == "true"
+PYTHON_STARTUP_SECONDS = 0.5   # interpreter + driver, kept out of the cases' time budget
+
+PYTHON_LANGUAGE_ID = 71
+COMPILED_LANGUAGES = (54, 62)  # C++, Java
+
+
+def no_progress(stage, **fields):
+    pass
+
+
+def parse_test_cases(test_cases_json):
+    """Returns the list of cases, or None if the payload isn't valid JSON."""
+    try:
+        if isinstance(test_cases_json, str):
+            return json.loads(test_cases_json)
+        return test_cases_json
+    except:
+        return None
+
+
+def runtime_ms(data):
+    """Judge0 reports `time` in seconds (string). Returns ms or None."""
+    try:
+        return round(float(data.get("time")) * 1000, 2)
+    except (TypeError, ValueError):
+        return None
+
+
+# ---------------------------------------------------------
+# STRATEGY 1: PYTHON (Inject Driver Code - Fastest)
+# ---------------------------------------------------------
+def python_time_budget(time_limit):
+    """
+    Seconds the driver may spend on all cases together: the execution's own limit
+    (executor.time_limit()) minus startup, or None when the executor doesn't say.
+    """
+    if not time_limit:
+        return None
+    return round(max(0.1, time_limit - PYTHON_STARTUP_SECONDS), 3)
+
+
+def build_python_driver(source_code, case_timeout=PYTHON_CASE_TIMEOUT, time_budget=None, track_memory=PYTHON_TRACK_MEMORY):
+    """
+    The driver only embeds the user's code; the case inputs arrive on stdin (see cases_stdin) and
+    are all read before any user code runs. It reports what the function returned per case and
+    the server decides pass/fail (grade_python_result), so expected outputs never reach the run.
+
+    Each case is measured (wall ms, CPU ms) and cut off with SIGALRM after min(`case_timeout`,
+    time left of `time_budget`): a heavy case may use the full cap when the run has room, and the
+    run as a whole still ends before the executor kills it, so every case gets reported (cases
+    past the deadline are reported as not run).
+
+    Memory is measured outside the timed region. peak_memory_kb is the case's own peak above the
+    RSS it started from: the kernel's high-water mark (VmHWM) is reset before the case through
+    /proc/self/clear_refs. Where that isn't allowed, the report falls back to
+    process_peak_memory_kb, the process-wide ru_maxrss, which never goes down between cases.
+    """
+    return f"""
+import io
+import sys
+import json
+import time
+import signal
+import inspect
+import resource
+
+CASE_TIMEOUT = {case_timeout!r}
+TIME_BUDGET = {time_budget!r}
+TRACK_MEMORY = {track_memory!r}
+DRIVER_DEADLINE = time.perf_counter() + TIME_BUDGET if TIME_BUDGET else None
+
+# Every input is read before the user code runs; the user code then sees an empty stdin
+DRIVER_CASES = [json.loads(line) for line in sys.stdin.read().splitlines() if line.strip()]
+sys.stdin = io.StringIO("")
+
+class CaseTimeout(BaseException):
+    # BaseException so a bare `except Exception` in user code can't swallow it
+    pass
+
+# --- USER CODE START ---
+{source_code}
+# --- USER CODE END ---
+
+def get_user_function():
+    all_funcs = [
+        obj for name, obj in globals().items() 
+        if inspect.isfunction(obj) 
+        and name not in ['get_user_function', 'on_case_timeout', 'case_limit', 'reset_peak', 'vm_kb', 'run_case', 'run_tests', 'encode_b64', 'decode_b64']
+        and obj.__module__ == '__main__'
+    ]
+    if all_funcs: return all_funcs[-1]
+    return None
+
+def on_case_timeout(signum, frame):
+    raise CaseTimeout()
+
+def case_limit():
+    # Seconds this case may run: the per-case cap, or less when the run's budget is nearly spent
+    if DRIVER_DEADLINE is None: return CASE_TIMEOUT
+    left = DRIVER_DEADLINE - time.perf_counter()
+    return min(CASE_TIMEOUT, left) if CASE_TIMEOUT > 0 else left
+
+def reset_peak():
+    # True when the kernel's RSS high-water mark (VmHWM) could be reset for this process
+    try:
+        with open("/proc/self/clear_refs", "w") as f: f.write("5")
+        return True
+    except OSError:
+        return False
+
+def vm_kb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"): return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+def run_case(user_func, inp, limit, metrics):
+    # Calls the user function once, filling `metrics` even when it raises or times out.
+    per_case_memory = TRACK_MEMORY and reset_peak()
+    rss_before = vm_kb("VmRSS") if per_case_memory else None
+    use_alarm = limit > 0 and hasattr(signal, "setitimer")
+    if use_alarm: signal.setitimer(signal.ITIMER_REAL, limit)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        return user_func(inp)
+    finally:
+        wall_end, cpu_end = time.perf_counter(), time.process_time()
+        if use_alarm: signal.setitimer(signal.ITIMER_REAL, 0)
+        metrics["runtime_ms"] = round((wall_end - wall_start) * 1000, 2)
+        metrics["cpu_ms"] = round((cpu_end - cpu_start) * 1000, 2)
+        peak = vm_kb("VmHWM") if per_case_memory else None
+        if peak is not None and rss_before is not None:
+            metrics["peak_memory_kb"] = max(0, peak - rss_before)
+        elif TRACK_MEMORY:
+            metrics["process_peak_memory_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_tests():
+    results = []
+    if hasattr(signal, "SIGALRM"): signal.signal(signal.SIGALRM, on_case_timeout)
+    
+    user_func = get_user_function()
+    
+    if not user_func:
+        print("---JSON_START---")
+        print(json.dumps({{"error": "No function found.", "results": []}}))
+        print("---JSON_END---")
+        return
+
+    start_total = time.time()
+    
+    for i, case in enumerate(DRIVER_CASES):
+        inp = case.get("input")
+        
+        # Type Conversion Attempt
+        if isinstance(inp, str) and inp.isdigit(): inp = int(inp)
+        metrics = {{}}
+        limit = case_limit()
+        if DRIVER_DEADLINE is not None and limit <= 0:
+            results.append({{"id": i, "status": "Time Limit Exceeded", "error": "Not run: the run's overall time limit was reached."}})
+            continue
+
+        try:
+            actual = run_case(user_func, inp, limit, metrics)
+            results.append({{"id": i, "actual": str(actual), **metrics}})
+        except CaseTimeout:
+            results.append({{"id": i, "status": "Time Limit Exceeded", "error": f"Exceeded {{round(limit, 2)}}s", **metrics}})
+        except Exception as e:
+            results.append({{"id": i, "status": "Runtime Error", "error": str(e), **metrics}})
+            
+    end_total = time.time()
+    
+    report = {{
+        "runtime_ms": round((end_total - start_total) * 1000, 2),
+        "results": results
+    }}
+    
+    print("---JSON_START---")
+    print(json.dumps(report))
+    print("---JSON_END---")
+
+if __name__ == "__main__":
+    try: run_tests()
+    except Exception as e: print(f"Driver Error: {{e}}")
+"""
+
+
+def cases_stdin(test_cases):
+    """Compact JSON-lines stream of the case INPUTS for the driver's stdin (never the expected outputs)."""
+    return "\n".join(json.dumps({"input": case.get("input")}, separators=(",", ":")) for case in test_cases) + "\n"
+
+
+METRIC_FIELDS = ("runtime_ms", "cpu_ms", "peak_memory_kb", "process_peak_memory_kb")
+
+
+def grade_reported_cases(raw_results, test_cases, progress=no_progress):
+    """
+    Server-side verdicts from what a driver/harness reported per case ({"id", "actual"} or
+    {"id", "error"[, "status"]}), compared with the expected outputs here. A case without a
+    report is a Runtime Error, so the result always has one entry per test case.
+    """
+    reported = {r.get("id"): r for r in raw_results if isinstance(r, dict)}
+    results = []
+    for i, case in enumerate(test_cases):
+        raw, inp = reported.get(i), str(case.get("input"))
+        if raw is None:
+            results.append({"id": i, "status": "Runtime Error", "error": "No result reported for this case.", "input": inp})
+        else:
+            metrics = {k: raw[k] for k in METRIC_FIELDS if k in raw}
+            if "actual" in raw:
+                actual, expected = str(raw["actual"]), str(case.get("output"))
+                results.append({
+                    "id": i,
+                    "status": "Passed" if actual.strip() == expected.strip() else "Failed",
+                    "input": inp,
+                    "expected": expected,
+                    "actual": actual,
+                    **metrics
+                })
+            else:
+                status = "Time Limit Exceeded" if raw.get("status") == "Time Limit Exceeded" else "Runtime Error"
+                results.append({"id": i, "status": status, "error": raw.get("error"), "input": inp, **metrics})
+        progress("case", index=i + 1, total=len(test_cases), status=results[-1]["status"])
+    return results
+
+
+def grade_python_result(data, test_cases, progress=no_progress):
+    """Parses the driver's ---JSON_START--- report out of a single execution and grades it."""
+    status_id = data.get("status", {}).get("id", 0)
+    if status_id == 3:
+        raw_output = decode_b64(data.get("stdout"))
+        if raw_output.count("---JSON_START---") > 1:
+            # Only the driver reports; a second report means the submission printed one of its own
+            return {"status": "error", "output": "The program's output contained more than one result report."}
+        if "---JSON_START---" in raw_output:
+            json_str = raw_output.split("---JSON_START---")[1].split("---JSON_END---")[0]
+            try:
+                report = json.loads(json_str)
+            except ValueError:
+                return {"status": "error", "output": raw_output}
+            stats = {"total": len(test_cases), "passed": 0, "runtime_ms": report.get("runtime_ms")}
+            if report.get("error"):
+                return {"status": "success", "data": {"stats": stats, "error": report["error"], "results": []}}
+            results = grade_reported_cases(report.get("results") or [], test_cases, progress)
+            stats["passed"] = len([r for r in results if r["status"] == "Passed"])
+            return {"status": "success", "data": {"stats": stats, "results": results}}
+        return {"status": "error", "output": raw_output}
+    elif status_id == 6:
+        return {"status": "compilation_error", "output": decode_b64(data.get("compile_output"))}
+    else:
+        return {"status": "runtime_error", "output": decode_b64(data.get("stderr")) or data.get("error")}
+
+
+# ---------------------------------------------------------
+# STRATEGY 1b: JAVA / C++ FUNCTION HARNESS (one execution, see harnesses.py)
+# ---------------------------------------------------------
+HARNESS_STOPPED_STATUS_IDS = (5, 7, 8, 9, 10, 11, 12)   # TLE and the Runtime Error (SIG*/NZEC/Other) family
+
+
+def harness_case_reports(raw_output):
+    """The harness's ---CASE--- lines as dicts (in print order), or None if one isn't a JSON object."""
+    reports = []
+    for line in raw_output.splitlines():
+        if not line.startswith(CASE_MARK):
+            continue
+        try:
+            report = json.loads(line[len(CASE_MARK):])
+        except ValueError:
+            return None
+        if not isinstance(report, dict):
+            return None
+        reports.append(report)
+    return reports
+
+
+def _ms(value):
+    try:
+        return round(float(value or 0), 2)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def grade_harness_result(data, test_cases, progress=no_progress):
+    """
+    Turns the harness's per-case lines into the same report the Python driver produces.
+    A run cut short (TLE, crash) keeps the cases it finished; the rest get the run's status.
+    Returns None only when the harness itself didn't fit the submission (compile error, e.g.
+    a signature mismatch; function not found; ids that aren't exactly 0..n-1 in order), so
+    the caller can fall back to the per-case stdin path.
+    """
+    status = data.get("status") or {}
+    status_id = status.get("id")
+    raw_output = decode_b64(data.get("stdout"))
+    if status_id == 6 or NO_FUNCTION_MARK in raw_output:
+        return None
+    if status_id != 3 and status_id not in HARNESS_STOPPED_STATUS_IDS:
+        return {"status": "runtime_error", "output": decode_b64(data.get("stderr")) or data.get("error")}
+
+    raw_results = harness_case_reports(raw_output)
+    if raw_results is None:
+        return None
+    ids = [raw.get("id") for raw in raw_results]
+    expected_ids = list(range(len(test_cases)))
+    if ids != (expected_ids if status_id == 3 else expected_ids[:len(ids)]):
+        return None
+
+    for raw in raw_results:
+        raw["runtime_ms"] = _ms(raw.get("runtime_ms"))
+    if status_id != 3:
+        # The case after the last reported one is where the run stopped; later ones never ran
+        stopped = "Time Limit Exceeded" if status_id == 5 else "Runtime Error"
+        detail = decode_b64(data.get("stderr")).strip() or status.get("description") or stopped
+        finished = len(raw_results)
+        for i in range(finished, len(test_cases)):
+            error = detail if i == finished else f"Not run: the program stopped at case {finished + 1}."
+            raw_results.append({"id": i, "status": stopped, "error": error})
+    results = grade_reported_cases(raw_results, test_cases, progress)
+
+    report = {
+        "stats": {
+            "total": len(test_cases),
+            "passed": len([r for r in results if r["status"] == "Passed"]),
+            "runtime_ms": round(sum(r.get("runtime_ms") or 0 for r in results), 2)
+        },
+        "results": results
+    }
+    return {"status": "success", "data": report}
+
+
+# ---------------------------------------------------------
+# STRATEGY 2: JAVA / C++ (Server-Side Loop - Robust)
+# ---------------------------------------------------------
+def grade_case_results(test_cases, batch, total_start, progress=no_progress):
+    """
+    Compares one execution per test case (`batch`, aligned with `test_cases`)
+    against the expected outputs.
+    """
+    results = []
+    passed_count = 0
+
+    # Compilation Error (Fail immediately)
+    for data in batch:
+        if data and data.get("status", {}).get("id") == 6:
+            return {"status": "compilation_error", "output": decode_b64(data.get("compile_output"))}
+    progress("compiled")
+
+    for i, case in enumerate(test_cases):
+        inp = case.get("input")
+        expected = str(case.get("output")).strip()
+
+        data = batch[i] or {}
+
+        status_id = data.get("status", {}).get("id", 0)
+
+        if status_id == 3: # Accepted
+            actual = decode_b64(data.get("stdout")).strip()
+            passed = actual == expected
+            if passed: passed_count += 1
+
+            results.append({
+                "id": i,
+                "status": "Passed" if passed else "Failed",
+                "input": inp,
+                "expected": expected,
+                "actual": actual,
+                "runtime_ms": runtime_ms(data)
+            })
+
+        else: # Runtime Error
+            err_msg = decode_b64(data.get("stderr")) or data.get("status", {}).get("description") or data.get("error")
+            results.append({
+                "id": i,
+                "status": "Runtime Error",
+                "error": err_msg,
+                "input": inp,
+                "runtime_ms": runtime_ms(data)
+            })
+
+        progress("case", index=i + 1, total=len(test_cases), status=results[-1]["status"])
+
+    total_end = time.time()
+
+    # Construct JSON Report manually
+    report = {
+        "stats": {
+            "total": len(test_cases),
+            "passed": passed_count,
+            "runtime_ms": round((total_end - total_start) * 1000, 2)
+        },
+        "results": results
+    }
+
+    return {"status": "success", "data": report}
+
+
+# ---------------------------------------------------------
+# JUDGED SUBMISSIONS (/api/v1/challenges/{id}/submit)
+# ---------------------------------------------------------
+def is_accepted(result, test_cases):
+    """
+    Every case of `test_cases` ran and passed: one result per case, in case order, all Passed.
+    Checked against the cases themselves, not the stats, so a report that skips or reorders
+    cases can't be accepted.
+    """
+    if not test_cases or not isinstance(result, dict) or result.get("status") != "success":
+        return False
+    results = (result.get("data") or {}).get("results") or []
+    if len(results) != len(test_cases):
+        return False
+    return all(isinstance(r, dict) and r.get("id") == i and r.get("status") == "Passed" for i, r in enumerate(results))
+
+
+def redact_hidden(result, test_cases):
+    """Strips input/expected/actual of hidden cases so a submit verdict doesn't leak them."""
+    if not isinstance(result, dict) or result.get("status") != "success":
+        return result
+    hidden = {i for i, case in enumerate(test_cases) if case.get("hidden")}
+    results = [
+        {k: v for k, v in r.items() if k not in ("input", "expected", "actual")} if r.get("id") in hidden else r
+        for r in (result.get("data") or {}).get("results", [])
+    ]
+    return {**result, "data": {**result["data"], "results": results}}
@@ -0,0 +1,287 @@
+# harnesses.py
+# Function-call harnesses for Java and C++ (the compiled-language twin of the Python driver).
+#
+# When a challenge names the function to test (CourseChallenge.function_name) and the
+# submission has no main(), we append a small main() that calls that function once per
+# test case inside ONE execution and prints (and flushes) one line per finished case:
+#   ---CASE---{"id": 0, "runtime_ms": 0.01, "actual": "25"}
+#   ---CASE---{"id": 1, "runtime_ms": 0.02, "error": "..."}
+# Because every case is flushed as it finishes, a run that times out or crashes still tells
+# which cases completed. If the function isn't there (Java) the harness prints ---NO_FUNCTION---.
+# Expected outputs never leave the server; grading.grade_harness_result() compares them.
+#
+# Cases arrive on stdin, one base64-encoded input per line (no JSON parser needed in Java/C++).
+# Inputs are converted to the function's parameter type: numbers, bool, char, string,
+# and 1-D arrays / vectors of those ("[1, 2, 3]" or "1 2 3").
+import re
+import base64
+
+CPP_LANGUAGE_ID = 54
+JAVA_LANGUAGE_ID = 62
+
+CPP_MAIN_RE = re.compile(r"\bint\s+main\s*\(")
+JAVA_MAIN_RE = re.compile(r"\bstatic\s+void\s+main\s*\(")
+CLASS_RE = re.compile(r"\b(?:class|struct)\s+([A-Za-z_]\w*)")
+JAVA_PUBLIC_CLASS_RE = re.compile(r"^(\s*)public\s+((?:final\s+|abstract\s+)*class\s)", re.MULTILINE)
+IDENTIFIER_RE = re.compile(r"^[A-Za-z_]\w*$")
+
+CASE_MARK = "---CASE---"
+NO_FUNCTION_MARK = "---NO_FUNCTION---"
+
+
+def harness_stdin(test_cases):
+    lines = [base64.b64encode(str(case.get("input") if case.get("input") is not None else "").encode("utf-8")).decode("ascii") for case in test_cases]
+    return "\n".join(lines) + "\n"
+
+
+def build_function_harness(source_code, language_id, function_name):
+    """Returns the harness source, or None when this submission should run per case on stdin instead."""
+    if not function_name or not IDENTIFIER_RE.match(function_name):
+        return None
+    if language_id == CPP_LANGUAGE_ID and not CPP_MAIN_RE.search(source_code):
+        return build_cpp_harness(source_code, function_name)
+    if language_id == JAVA_LANGUAGE_ID and not JAVA_MAIN_RE.search(source_code):
+        return build_java_harness(source_code, function_name)
+    return None
+
+
+# ---------------------------------------------------------
+# C++: template deduction on the function pointer picks the parser for the argument type
+# ---------------------------------------------------------
+CPP_HARNESS = r"""
+// --- HARNESS START ---
+namespace harness {
+using namespace std;
+
+static string trim(const string& s) {
+    size_t a = s.find_first_not_of(" \t\r\n"), b = s.find_last_not_of(" \t\r\n");
+    return a == string::npos ? "" : s.substr(a, b - a + 1);
+}
+static string unquote(string s) {
+    s = trim(s);
+    if (s.size() >= 2 && (s[0] == '"' || s[0] == '\'') && s.back() == s[0]) return s.substr(1, s.size() - 2);
+    return s;
+}
+static vector<string> items(string s) {
+    s = trim(s);
+    if (!s.empty() && s[0] == '[' && s.back() == ']') s = s.substr(1, s.size() - 2);
+    vector<string> out; string cur; bool quoted = false;
+    for (char c : s) {
+        if (c == '"' || c == '\'') quoted = !quoted;
+        if (!quoted && (c == ',' || c == ' ' || c == '\n' || c == '\t')) { if (!trim(cur).empty()) out.push_back(trim(cur)); cur.clear(); }
+        else cur += c;
+    }
+    if (!trim(cur).empty()) out.push_back(trim(cur));
+    return out;
+}
+
+static void read(const string& s, int& v) { v = stoi(trim(s)); }
+static void read(const string& s, long& v) { v = stol(trim(s)); }
+static void read(const string& s, long long& v) { v = stoll(trim(s)); }
+static void read(const string& s, unsigned& v) { v = (unsigned) stoul(trim(s)); }
+static void read(const string& s, double& v) { v = stod(trim(s)); }
+static void read(const string& s, float& v) { v = stof(trim(s)); }
+static void read(const string& s, bool& v) { string t = trim(s); v = (t == "true" || t == "True" || t == "1"); }
+static void read(const string& s, char& v) { string t = unquote(s); v = t.empty() ? ' ' : t[0]; }
+static void read(const string& s, string& v) { v = unquote(s); }
+template <class T> static void read(const string& s, vector<T>& v) {
+    v.clear();
+    for (const string& item : items(s)) { T x; read(item, x); v.push_back(x); }
+}
+
+static string show(const string& v) { return v; }
+static string show(const char* v) { return v; }
+static string show(char v) { return string(1, v); }
+static string show(bool v) { return v ? "true" : "false"; }
+template <class T> static string show(const T& v) { ostringstream os; os << v; return os.str(); }
+template <class T> static string show(const vector<T>& v) {
+    string out = "[";
+    for (size_t i = 0; i < v.size(); i++) { if (i) out += ", "; out += show(v[i]); }
+    return out + "]";
+}
+
+template <class R, class A> static string call(R (*f)(A), const string& raw) {
+    typename decay<A>::type arg; read(raw, arg); return show(f(arg));
+}
+template <class C, class R, class A> static string call(R (C::*f)(A), const string& raw) {
+    typename decay<A>::type arg; read(raw, arg); C obj; return show((obj.*f)(arg));
+}
+
+static string quote(const string& s) {
+    string out = "\"";
+    for (unsigned char c : s) {
+        if (c == '"' || c == '\\') { out += '\\'; out += (char) c; }
+        else if (c == '\n') out += "\\n";
+        else if (c == '\r') out += "\\r";
+        else if (c == '\t') out += "\\t";
+        else if (c < 0x20) { char buf[8]; snprintf(buf, sizeof(buf), "\\u%04x", c); out += buf; }
+        else out += (char) c;
+    }
+    return out + "\"";
+}
+static string b64decode(const string& in) {
+    static const string chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+    string out; int val = 0, bits = -8;
+    for (char c : in) {
+        size_t pos = chars.find(c);
+        if (pos == string::npos) continue;
+        val = (val << 6) + (int) pos; bits += 6;
+        if (bits >= 0) { out += (char) ((val >> bits) & 0xFF); bits -= 8; }
+    }
+    return out;
+}
+}  // namespace harness
+
+int main() {
+    std::ios::sync_with_stdio(false);
+    std::string line;
+    int id = 0;
+    while (std::getline(std::cin, line)) {
+        if (harness::trim(line).empty()) continue;
+        std::string raw = harness::b64decode(harness::trim(line)), field;
+        auto t0 = std::chrono::steady_clock::now();
+        try { field = "\"actual\":" + harness::quote(harness::call(__TARGET__, raw)); }
+        catch (const std::exception& e) { field = "\"error\":" + harness::quote(e.what()); }
+        catch (...) { field = "\"error\":\"Unknown exception\""; }
+        double ms = std::chrono::duration<double, std::milli>(std::chrono::steady_clock::now() - t0).count();
+        std::cout << "---CASE---{\"id\":" << id++ << ",\"runtime_ms\":" << std::to_string(ms) << "," << field << "}" << std::endl;
+    }
+    return 0;
+}
+"""
+
+
+def build_cpp_harness(source_code, function_name):
+    # LeetCode style `class Solution { public: int fn(...) }` -> member pointer, otherwise a free function
+    target = f"&Solution::{function_name}" if "Solution" in CLASS_RE.findall(source_code) else f"&{function_name}"
+    return "#include <bits/stdc++.h>\n" + source_code + CPP_HARNESS.replace("__TARGET__", target)
+
+
+# ---------------------------------------------------------
+# JAVA: reflection finds the one-argument method named function_name
+# ---------------------------------------------------------
+JAVA_HARNESS = r"""
+// --- HARNESS START ---
+public class Main {
+    static final String FUNCTION = "__FUNCTION__";
+    static final String[] CANDIDATES = {__CANDIDATES__};
+
+    public static void main(String[] args) throws Exception {
+        java.lang.reflect.Method method = null;
+        Object target = null;
+        for (String name : CANDIDATES) {
+            Class<?> klass;
+            try { klass = Class.forName(name); } catch (ClassNotFoundException e) { continue; }
+            for (java.lang.reflect.Method m : klass.getDeclaredMethods()) {
+                if (m.getName().equals(FUNCTION) && m.getParameterCount() == 1) { method = m; break; }
+            }
+            if (method == null) continue;
+            if (!java.lang.reflect.Modifier.isStatic(method.getModifiers())) {
+                java.lang.reflect.Constructor<?> ctor = klass.getDeclaredConstructor();
+                ctor.setAccessible(true);
+                target = ctor.newInstance();
+            }
+            break;
+        }
+        if (method == null) {
+            System.out.println("---NO_FUNCTION---");
+            System.err.println("Function " + FUNCTION + " not found");
+            System.exit(1);
+        }
+        method.setAccessible(true);
+        Class<?> type = method.getParameterTypes()[0];
+
+        java.io.BufferedReader in = new java.io.BufferedReader(new java.io.InputStreamReader(System.in, "UTF-8"));
+        String line;
+        int id = 0;
+        while ((line = in.readLine()) != null) {
+            if (line.trim().isEmpty()) continue;
+            String raw = new String(java.util.Base64.getDecoder().decode(line.trim()), "UTF-8");
+            String field;
+            long t0 = System.nanoTime();
+            try { field = "\"actual\":" + quote(show(method.invoke(target, parse(raw, type)))); }
+            catch (java.lang.reflect.InvocationTargetException e) { field = "\"error\":" + quote(String.valueOf(e.getCause())); }
+            catch (Throwable e) { field = "\"error\":" + quote(String.valueOf(e)); }
+            double ms = (System.nanoTime() - t0) / 1e6;
+            System.out.println("---CASE---{\"id\":" + (id++) + ",\"runtime_ms\":" + ms + "," + field + "}");
+            System.out.flush();
+        }
+    }
+
+    static String unquote(String s) {
+        s = s.trim();
+        if (s.length() >= 2 && (s.charAt(0) == '"' || s.charAt(0) == '\'') && s.charAt(s.length() - 1) == s.charAt(0)) return s.substring(1, s.length() - 1);
+        return s;
+    }
+
+    static java.util.List<String> items(String s) {
+        s = s.trim();
+        if (s.startsWith("[") && s.endsWith("]")) s = s.substring(1, s.length() - 1);
+        java.util.List<String> out = new java.util.ArrayList<>();
+        StringBuilder cur = new StringBuilder();
+        boolean quoted = false;
+        for (char c : s.toCharArray()) {
+            if (c == '"' || c == '\'') quoted = !quoted;
+            if (!quoted && (c == ',' || Character.isWhitespace(c))) {
+                if (cur.toString().trim().length() > 0) out.add(cur.toString().trim());
+                cur.setLength(0);
+            } else cur.append(c);
+        }
+        if (cur.toString().trim().length() > 0) out.add(cur.toString().trim());
+        return out;
+    }
+
+    static Object parse(String s, Class<?> t) {
+        if (t == int.class || t == Integer.class) return Integer.parseInt(s.trim());
+        if (t == long.class || t == Long.class) return Long.parseLong(s.trim());
+        if (t == double.class || t == Double.class) return Double.parseDouble(s.trim());
+        if (t == float.class || t == Float.class) return Float.parseFloat(s.trim());
+        if (t == boolean.class || t == Boolean.class) return s.trim().equalsIgnoreCase("true") || s.trim().equals("1");
+        if (t == char.class || t == Character.class) { String u = unquote(s); return u.isEmpty() ? ' ' : u.charAt(0); }
+        if (t == String.class) return unquote(s);
+        if (t.isArray()) {
+            java.util.List<String> parts = items(s);
+            Object arr = java.lang.reflect.Array.newInstance(t.getComponentType(), parts.size());
+            for (int i = 0; i < parts.size(); i++) java.lang.reflect.Array.set(arr, i, parse(parts.get(i), t.getComponentType()));
+            return arr;
+        }
+        if (java.util.List.class.isAssignableFrom(t)) return new java.util.ArrayList<>(items(s));
+        throw new IllegalArgumentException("Unsupported parameter type " + t.getName());
+    }
+
+    static String show(Object o) {
+        if (o == null) return "null";
+        if (o instanceof Object[]) return java.util.Arrays.deepToString((Object[]) o);
+        if (o instanceof int[]) return java.util.Arrays.toString((int[]) o);
+        if (o instanceof long[]) return java.util.Arrays.toString((long[]) o);
+        if (o instanceof double[]) return java.util.Arrays.toString((double[]) o);
+        if (o instanceof float[]) return java.util.Arrays.toString((float[]) o);
+        if (o instanceof boolean[]) return java.util.Arrays.toString((boolean[]) o);
+        if (o instanceof char[]) return java.util.Arrays.toString((char[]) o);
+        return String.valueOf(o);
+    }
+
+    static String quote(String s) {
+        StringBuilder out = new StringBuilder("\"");
+        for (char c : s.toCharArray()) {
+            if (c == '"' || c == '\\') out.append('\\').append(c);
+            else if (c == '\n') out.append("\\n");
+            else if (c == '\r') out.append("\\r");
+            else if (c == '\t') out.append("\\t");
+            else if (c < 0x20) out.append(String.format("\\u%04x", (int) c));
+            else out.append(c);
+        }
+        return out.append('"').toString();
+    }
+}
+"""
+
+
+def build_java_harness(source_code, function_name):
+    classes = [name for name in dict.fromkeys(CLASS_RE.findall(source_code)) if name != "Main"]
+    if not classes or "Main" in CLASS_RE.findall(source_code):
+        return None
+    # The file is Main.java, so only our harness class may be public
+    body = JAVA_PUBLIC_CLASS_RE.sub(r"\1\2", source_code)
+    candidates = ", ".join(f'"{name}"' for name in classes)
+    return body + JAVA_HARNESS.replace("__FUNCTION__", function_name).replace("__CANDIDATES__", candidates)
@@ -0,0 +1,83 @@
+# http_client.py
+# Shared outbound HTTP layer (Judge0, Brevo, ...) for both the API and the Celery worker.
+#
+# One requests.Session per host, each with its own keep-alive connection pool,
+# so repeated calls reuse TCP+TLS connections instead of handshaking every time.
+# Transient failures (connect errors, 429/503) are retried with jittered
+# exponential backoff, honouring Retry-After.
+import os
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 4))    # distinct pools kept per session
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 32))           # keep-alive sockets per host
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 10))
+RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.3))
+BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", 0.3))
+RETRY_STATUSES = tuple(int(c) for c in os.getenv("HTTP_RETRY_STATUSES", "429,503").split(",") if c.strip())
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _retry_policy():
+    # Reads are never retried: a POST that reached the server may already have run.
+    # Connect errors and "try again" statuses (429/503) are safe to repeat.
+    options = dict(
+        total=RETRIES, connect=RETRIES, read=0, status=RETRIES,
+        status_forcelist=RETRY_STATUSES, allowed_methods=None,
+        backoff_factor=BACKOFF_FACTOR, respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=BACKOFF_JITTER, **options)
+    except TypeError:  # urllib3 < 2.0 has no jitter
+        return Retry(**options)
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=_retry_policy())
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(url):
+    """Returns the pooled session for the URL's host (created on first use)."""
+    host = urlparse(url).netloc
+    session = _sessions.get(host)
+    if session is None:
+        with _lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _sessions[host] = _build_session()
+    return session
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    return get_session(url).request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def close_all():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,168 @@
+# identity_cache.py
+# Two-tier cache for get_current_user: JWT subject (email) -> the user's row.
+#
+#   tier 1: in-process LRU, IDENTITY_LOCAL_TTL seconds
+#   tier 2: Redis "identity:<email>" (JSON), IDENTITY_REDIS_TTL seconds
+# A miss in both is loaded from the DB by the caller and stored with `put`. Hits come back as
+# a fresh, session-less models.User (no password hash is cached): fine for reading
+# id/role/email/..., but code that changes the user must load the row in its own session.
+#
+# Anything that changes a row auth depends on (deactivation, password reset/change, role change)
+# calls `invalidate`: it deletes the Redis entry and broadcasts the email on "identity:invalidate",
+# and every API process (see `listen`) drops its local copy. The short local TTL bounds the
+# staleness if a broadcast is missed. Redis errors fall through to the database.
+import os
+import json
+import time
+import asyncio
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from dotenv import load_dotenv
+import models
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+IDENTITY_CACHE_ENABLED = os.getenv("IDENTITY_CACHE_ENABLED", "true").lower() == "true"
+LOCAL_TTL = float(os.getenv("IDENTITY_LOCAL_TTL", 30))
+LOCAL_SIZE = int(os.getenv("IDENTITY_LOCAL_SIZE", 10000))
+REDIS_TTL = int(os.getenv("IDENTITY_REDIS_TTL", 300))
+
+PREFIX = "identity:"
+CHANNEL = "identity:invalidate"
+FIELDS = [c.name for c in models.User.__table__.columns if c.name != "hashed_password"]
+DATETIME_FIELDS = {c.name for c in models.User.__table__.columns if c.type.python_type is datetime}
+
+_local = OrderedDict()   # email -> (expires_at, fields)
+_local_lock = threading.Lock()
+
+
+def _key(email):
+    return PREFIX + email
+
+
+def _fields(user):
+    return {name: getattr(user, name) for name in FIELDS}
+
+
+def _user(fields):
+    return models.User(**fields)
+
+
+def _encode(fields):
+    return json.dumps({k: v.isoformat() if isinstance(v, datetime) else v for k, v in fields.items()})
+
+
+def _decode(blob):
+    fields = json.loads(blob)
+    for name in DATETIME_FIELDS:
+        if fields.get(name):
+            fields[name] = datetime.fromisoformat(fields[name])
+    return fields
+
+
+def _remember(email, fields):
+    with _local_lock:
+        _local[email] = (time.monotonic() + LOCAL_TTL, fields)
+        _local.move_to_end(email)
+        while len(_local) > LOCAL_SIZE:
+            _local.popitem(last=False)
+
+
+def _local_get(email):
+    with _local_lock:
+        entry = _local.get(email)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _local[email]
+            return None
+        _local.move_to_end(email)
+        return entry[1]
+
+
+def forget_local(email):
+    with _local_lock:
+        _local.pop(email, None)
+
+
+# --- 🚀 API SIDE (async redis) ---
+async def get(redis_conn, email):
+    """Cached user for `email` (session-less models.User) or None."""
+    if not IDENTITY_CACHE_ENABLED:
+        return None
+    fields = _local_get(email)
+    if fields is None:
+        try:
+            blob = await redis_conn.get(_key(email))
+        except Exception as e:
+            print(f"Identity cache lookup failed (ignored): {e}")
+            return None
+        if not blob:
+            return None
+        fields = _decode(blob)
+        _remember(email, fields)
+    return _user(fields)
+
+
+async def put(redis_conn, user):
+    if not IDENTITY_CACHE_ENABLED:
+        return
+    fields = _fields(user)
+    _remember(user.email, fields)
+    try:
+        await redis_conn.set(_key(user.email), _encode(fields), ex=REDIS_TTL)
+    except Exception as e:
+        print(f"Identity cache store failed (ignored): {e}")
+
+
+async def invalidate(redis_conn, email):
+    forget_local(email)
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.delete(_key(email))
+        pipe.publish(CHANNEL, email)
+        await pipe.execute()
+    except Exception as e:
+        print(f"Identity cache invalidation failed: {e}")
+
+
+async def listen(redis_conn):
+    """Background task (API startup): drops local entries invalidated by other processes."""
+    while True:
+        pubsub = redis_conn.pubsub()
+        try:
+            await pubsub.subscribe(CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    forget_local(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Identity cache listener error (reconnecting): {e}")
+            with _local_lock:
+                _local.clear()  # may have missed broadcasts
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
+
+
+# --- 🔄 SCRIPTS / WORKERS (sync redis) ---
+def invalidate_sync(redis_conn, email):
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.delete(_key(email))
+        pipe.publish(CHANNEL, email)
+        pipe.execute()
+    except Exception as e:
+        print(f"Identity cache invalidation failed: {e}")
+
+
+# Out-of-band changes (SQL console, force_instructor.py): python identity_cache.py <email> [...]
+if __name__ == "__main__":
+    import sys
+    from celery_config import redis_sync
+
+    for email in sys.argv[1:]:
+        invalidate_sync(redis_sync, email)
+        print(f"Invalidated cached identity for {email}")
@@ -0,0 +1,228 @@
+# judge0_governor.py
+# Keeps every worker process inside our Judge0 plan limits and stops hammering
+# the provider while it is down.
+#
+# 1. Token bucket (shared in Redis, atomic via Lua): JUDGE0_RATE_PER_SEC refill, JUDGE0_BURST capacity.
+#    Callers wait up to JUDGE0_MAX_TOKEN_WAIT seconds for capacity, then give up.
+# 2. Circuit breaker: JUDGE0_CB_FAILURES failures inside JUDGE0_CB_WINDOW seconds opens the
+#    circuit for JUDGE0_CB_COOLDOWN seconds (calls fail fast). After that a single probe
+#    call is let through; success closes the circuit, failure re-opens it.
+#
+# Redis errors never block execution: the governor fails open.
+import os
+import time
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+RATE_PER_SEC = float(os.getenv("JUDGE0_RATE_PER_SEC", 5))
+BURST = float(os.getenv("JUDGE0_BURST", 10))
+MAX_TOKEN_WAIT = float(os.getenv("JUDGE0_MAX_TOKEN_WAIT", 15))
+CB_FAILURES = int(os.getenv("JUDGE0_CB_FAILURES", 5))
+CB_WINDOW = int(os.getenv("JUDGE0_CB_WINDOW", 30))
+CB_COOLDOWN = int(os.getenv("JUDGE0_CB_COOLDOWN", 30))
+
+BUCKET_KEY = "judge0:bucket"
+CB_FAILURES_KEY = "judge0:cb:failures"
+CB_OPEN_UNTIL_KEY = "judge0:cb:open_until"
+CB_PROBE_KEY = "judge0:cb:probe"
+
+# Returns the seconds the caller must wait (0 = tokens taken).
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return tostring(wait)
+"""
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class RateLimited(Exception):
+    pass
+
+
+class Judge0Governor:
+    def __init__(self, redis_conn, namespace="judge0", rate_per_sec=RATE_PER_SEC, burst=BURST):
+        """`namespace` separates the bucket/breaker of each Judge0 deployment (see execution_router.py)."""
+        self.redis = redis_conn
+        self._bucket = redis_conn.register_script(TOKEN_BUCKET_LUA)
+        self.rate_per_sec, self.burst = rate_per_sec, burst
+        self.bucket_key = f"{namespace}:bucket"
+        self.failures_key = f"{namespace}:cb:failures"
+        self.open_until_key = f"{namespace}:cb:open_until"
+        self.probe_key = f"{namespace}:cb:probe"
+
+    # --- Token bucket ---
+    def acquire(self, cost=1, max_wait=MAX_TOKEN_WAIT):
+        """Blocks until `cost` tokens are available. Returns False if that would take longer than max_wait."""
+        cost = min(cost, self.burst)
+        deadline = time.time() + max_wait
+        while True:
+            try:
+                wait = float(self._bucket(keys=[self.bucket_key], args=[self.rate_per_sec, self.burst, cost]))
+            except Exception as e:
+                print(f"Judge0 governor unavailable (allowing call): {e}")
+                return True
+            if wait <= 0:
+                return True
+            if time.time() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    # --- Circuit breaker ---
+    def open_for(self):
+        """Seconds left while the circuit is open (0 when closed)."""
+        try:
+            until = float(self.redis.get(self.open_until_key) or 0)
+        except Exception:
+            return 0
+        return max(0, until - time.time())
+
+    def allow(self):
+        if self.open_for() > 0:
+            return False
+        try:
+            if self.redis.exists(self.open_until_key):
+                # Cool-down over: half-open, exactly one caller gets to probe
+                return bool(self.redis.set(self.probe_key, 1, nx=True, ex=CB_COOLDOWN))
+        except Exception:
+            pass
+        return True
+
+    def record_success(self):
+        try:
+            self.redis.delete(self.failures_key, self.open_until_key, self.probe_key)
+        except Exception:
+            pass
+
+    def record_failure(self):
+        try:
+            pipe = self.redis.pipeline()
+            pipe.incr(self.failures_key)
+            pipe.expire(self.failures_key, CB_WINDOW)
+            failures = pipe.execute()[0]
+            if failures >= CB_FAILURES or self.redis.exists(self.probe_key):
+                self.redis.set(self.open_until_key, time.time() + CB_COOLDOWN, ex=CB_COOLDOWN * 10)
+                self.redis.delete(self.probe_key)
+                print(f"⛔ Judge0 circuit OPEN for {CB_COOLDOWN}s ({failures} recent failures)")
+        except Exception:
+            pass
+
+    def call(self, send, cost=1):
+        """
+        Runs `send()` (an HTTP call returning a requests.Response) under the bucket + breaker.
+        Raises CircuitOpen / RateLimited instead of calling when there's no point.
+        """
+        if not self.allow():
+            raise CircuitOpen(f"Judge0 temporarily unavailable, retry in {int(self.open_for()) or CB_COOLDOWN}s")
+        if not self.acquire(cost):
+            raise RateLimited("Judge0 rate limit reached, no capacity within the wait budget")
+        try:
+            response = send()
+        except Exception:
+            self.record_failure()
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+        return response
+
+
+class AsyncJudge0Governor:
+    """Same bucket + breaker (same Redis keys) for asyncio callers (async_worker.py)."""
+
+    def __init__(self, redis_conn):
+        self.redis = redis_conn
+        self._bucket = redis_conn.register_script(TOKEN_BUCKET_LUA)
+
+    async def acquire(self, cost=1, max_wait=MAX_TOKEN_WAIT):
+        cost = min(cost, BURST)
+        deadline = time.time() + max_wait
+        while True:
+            try:
+                wait = float(await self._bucket(keys=[BUCKET_KEY], args=[RATE_PER_SEC, BURST, cost]))
+            except Exception as e:
+                print(f"Judge0 governor unavailable (allowing call): {e}")
+                return True
+            if wait <= 0:
+                return True
+            if time.time() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    async def open_for(self):
+        return await circuit_open_for(self.redis)
+
+    async def allow(self):
+        if await self.open_for() > 0:
+            return False
+        try:
+            if await self.redis.exists(CB_OPEN_UNTIL_KEY):
+                return bool(await self.redis.set(CB_PROBE_KEY, 1, nx=True, ex=CB_COOLDOWN))
+        except Exception:
+            pass
+        return True
+
+    async def record_success(self):
+        try:
+            await self.redis.delete(CB_FAILURES_KEY, CB_OPEN_UNTIL_KEY, CB_PROBE_KEY)
+        except Exception:
+            pass
+
+    async def record_failure(self):
+        try:
+            pipe = self.redis.pipeline()
+            pipe.incr(CB_FAILURES_KEY)
+            pipe.expire(CB_FAILURES_KEY, CB_WINDOW)
+            failures = (await pipe.execute())[0]
+            if failures >= CB_FAILURES or await self.redis.exists(CB_PROBE_KEY):
+                await self.redis.set(CB_OPEN_UNTIL_KEY, time.time() + CB_COOLDOWN, ex=CB_COOLDOWN * 10)
+                await self.redis.delete(CB_PROBE_KEY)
+                print(f"⛔ Judge0 circuit OPEN for {CB_COOLDOWN}s ({failures} recent failures)")
+        except Exception:
+            pass
+
+    async def call(self, send, cost=1):
+        """Async twin of Judge0Governor.call(): `send()` returns an awaitable httpx.Response."""
+        if not await self.allow():
+            raise CircuitOpen(f"Judge0 temporarily unavailable, retry in {int(await self.open_for()) or CB_COOLDOWN}s")
+        if not await self.acquire(cost):
+            raise RateLimited("Judge0 rate limit reached, no capacity within the wait budget")
+        try:
+            response = await send()
+        except Exception:
+            await self.record_failure()
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            await self.record_failure()
+        else:
+            await self.record_success()
+        return response
+
+
+# --- 🚀 API SIDE (async redis) ---
+async def circuit_open_for(redis_conn):
+    try:
+        until = float(await redis_conn.get(CB_OPEN_UNTIL_KEY) or 0)
+    except Exception:
+        return 0
+    return max(0, until - time.time())
@@ -3,16 +3,15 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload 
-from sqlalchemy import delete
+from sqlalchemy import delete, and_
 from pydantic import BaseModel
-import bcrypt 
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 import models
 from database import engine, get_db # Importing the Async engine and dependency
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
 from celery_config import celery_app        # <--- Ensure this is here
 from celery.result import AsyncResult
 import requests
@@ -22,7 +21,6 @@ import os
 import smtplib
 import random
 import string
-import pandas as pd     
 import requests 
 import razorpay
 import google.generativeai as genai 
@@ -55,6 +53,26 @@ from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
 from sqlalchemy import text
 from token_manager import TokenManager
+import result_cache
+import http_client
+import threading
+import time
+import execution_events
+import challenge_cases
+import regrade
+import similarity
+import single_flight
+import execution_lanes
+import execution_quotas
+import fair_share
+import result_storage
+import identity_cache
+import password_hashing
+import bulk_admit
+import admission_files
+from executors import EXECUTOR_BACKEND
+import judge0_governor
+import uuid
 
 
 
@@ -82,6 +100,8 @@ async def init_models():
             
             # 🆕 FIX FOR YOUR ERROR: Add last_login column
             await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS last_login TIMESTAMP;"))
+            await conn.execute(text("ALTER TABLE course_challenges ADD COLUMN IF NOT EXISTS test_case_version INTEGER DEFAULT 1;"))
+            await conn.execute(text("ALTER TABLE challenge_progress ADD COLUMN IF NOT EXISTS language_id INTEGER;"))
             
             print("✅ Database Migrations Applied Successfully!")
         except Exception as e:
@@ -93,6 +113,10 @@ limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+@app.exception_handler(password_hashing.HashingBusy)
+async def hashing_busy_handler(request: Request, exc: password_hashing.HashingBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
 # Initialize Auto-Refresh Service
 token_manager = TokenManager()
 
@@ -101,10 +125,22 @@ token_manager = TokenManager()
 async def on_startup():
     await init_models()
     token_manager.start()
+    password_hashing.start()
+    app.state.identity_listener = asyncio.create_task(identity_cache.listen(redis_client))
+    # ⚖️ Round-robin executions across users (only the lease holder among API processes dispatches)
+    if fair_share.FAIR_SHARE_ENABLED:
+        app.state.fair_share_dispatcher = asyncio.create_task(
+            fair_share.run_dispatcher(redis_client, execution_lanes.QUEUES, send_execution)
+        )
 
 @app.on_event("shutdown")
 async def on_shutdown():
     token_manager.stop()
+    password_hashing.shutdown()
+    for name in ("fair_share_dispatcher", "identity_listener"):
+        background = getattr(app.state, name, None)
+        if background:
+            background.cancel()
 
 # 2. CONFIG: CORS POLICY (Restricted for Security in Prod)
 app.add_middleware(
@@ -215,7 +251,14 @@ class CodePayload(BaseModel):
     language_id: int
     # ✅ NEW: Accepts a list of test cases (Batch Execution)
     # Example: [{"input": "5", "output": "25"}, {"input": "10", "output": "100"}]
-    test_cases: List[Dict[str, Any]]
+    test_cases: List[Dict[str, Any]] = []
+    # Java/C++: call this function for every case in one run (CourseChallenge.function_name)
+    function_name: Optional[str] = None
+    # Challenge runs: the worker loads the challenge's own cases, `test_cases` is ignored
+    challenge_id: Optional[int] = None
+    # Exam runs (CodeTest problem / scheduled ContentItem) go to the priority lane, see execution_lanes.py
+    code_test_id: Optional[int] = None
+    content_item_id: Optional[int] = None
 
 class OTPLoginRequest(BaseModel):
     phone_number: str
@@ -236,6 +279,10 @@ class NotificationResponse(BaseModel):
     is_read: bool
     created_at: datetime
         
+class ChallengeSubmission(BaseModel):
+    source_code: str
+    language_id: int
+
 class ChallengeUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -243,12 +290,12 @@ class ChallengeUpdate(BaseModel):
     test_cases: Optional[str] = None
         
 # --- 🔑 AUTH LOGIC ---
-def verify_password(plain_password, hashed_password):
-    if isinstance(hashed_password, str): hashed_password = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password)
+# bcrypt runs in password_hashing's process pool; HashingBusy becomes a 503 (see hashing_busy_handler)
+async def verify_password(plain_password, hashed_password):
+    return await password_hashing.verify_password(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def get_password_hash(password):
+    return await password_hashing.hash_password(password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -264,10 +311,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         if email is None: raise HTTPException(status_code=401, detail="Invalid session")
     except JWTError: raise HTTPException(status_code=401, detail="Session expired")
     
+    # ⚡ Identity cache (process LRU + Redis): most requests skip the users query entirely
+    user = await identity_cache.get(redis_client, email)
+    if user is not None:
+        return user
+
     result = await db.execute(select(models.User).where(models.User.email == email))
     user = result.scalars().first()
     
     if user is None: raise HTTPException(status_code=401, detail="User not found")
+    await identity_cache.put(redis_client, user)
     return user
 
 async def require_instructor(current_user: models.User = Depends(get_current_user)):
@@ -340,7 +393,7 @@ def send_credentials_email(to_email: str, name: str, password: str = None, subje
 
     # 5. Send Request
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = http_client.post(url, json=payload, headers=headers)
         
         if response.status_code == 201:
             print(f"✅ [BREVO API] SUCCESS: Email sent! ID: {response.json().get('messageId')}")
@@ -352,6 +405,18 @@ def send_credentials_email(to_email: str, name: str, password: str = None, subje
     except Exception as e:
         print(f"❌ [BREVO API] NETWORK ERROR: {str(e)}")
         raise e  
+# ♻️ Drive client reuse: building the service is expensive and its httplib2 transport
+# (with its open connection) isn't thread-safe, so keep one per worker thread.
+_drive_local = threading.local()
+
+def get_drive_service(creds):
+    cached = getattr(_drive_local, "service", None)
+    if cached is None or _drive_local.token != creds.token:
+        cached = build('drive', 'v3', credentials=creds, cache_discovery=False)
+        _drive_local.service = cached
+        _drive_local.token = creds.token
+    return cached
+
 def upload_file_to_drive(file_obj, filename, folder_link):
     # (Drive logic remains mostly same, executed in thread pool usually by FastAPI)
     try:
@@ -371,7 +436,7 @@ def upload_file_to_drive(file_obj, filename, folder_link):
                print("❌ Creds invalid and no refresh token")
                return None
 
-        service = build('drive', 'v3', credentials=creds)
+        service = get_drive_service(creds)
         file_metadata = { 'name': filename, 'parents': [folder_id] }
         media = MediaIoBaseUpload(file_obj, mimetype='application/pdf', resumable=True)
         uploaded_file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
@@ -460,7 +525,7 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # 2. Create User
     new_user = models.User(
         email=user.email, 
-        hashed_password=get_password_hash(user.password), 
+        hashed_password=await get_password_hash(user.password), 
         full_name=user.name, 
         role=user.role,
         phone_number=user.phone_number
@@ -495,11 +560,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSessi
     result = await db.execute(select(models.User).where(models.User.email == form_data.username))
     user = result.scalars().first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=401, detail="Incorrect email or password")
-    
     # ✅ CHECK 1: Password Verification
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     
     # ✅ CHECK 2: Is the User Active? (Soft Delete Check)
@@ -539,7 +601,7 @@ async def admit_single_student(req: AdmitStudentRequest, db: AsyncSession = Depe
         student = models.User(
             email=req.email, 
             full_name=req.full_name, 
-            hashed_password=get_password_hash(final_password), 
+            hashed_password=await get_password_hash(final_password), 
             role="student",
         )
         db.add(student)
@@ -563,68 +625,47 @@ async def admit_single_student(req: AdmitStudentRequest, db: AsyncSession = Depe
     
 @app.post("/api/v1/admin/bulk-admit")
 async def bulk_admit_students(file: UploadFile = File(...), course_id: int = Form(...), db: AsyncSession = Depends(get_db), current_user: models.User = Depends(require_instructor)):
-    contents = await file.read()
-    try:
-        df = pd.read_csv(io.BytesIO(contents)) if file.filename.endswith('.csv') else pd.read_excel(io.BytesIO(contents))
-    except: 
-        raise HTTPException(status_code=400, detail="Invalid file format. Please upload CSV or Excel.")
-    
-    # Normalize headers
-    df.columns = [c.lower().strip() for c in df.columns]
-    if "email" not in df.columns: 
-        raise HTTPException(status_code=400, detail="Missing 'email' column in file.")
-    
-    count = 0
-    email_tasks = [] # Store email tasks to run later
-
-    for _, row in df.iterrows():
-        email = str(row["email"]).strip()
-        name = str(row.get("name", "Student"))
-        
-        if not email or email.lower() == "nan": continue
-        
-        # 1. Check if user exists
-        res = await db.execute(select(models.User).where(models.User.email == email))
-        student = res.scalars().first()
-        
-        if not student:
-            # Create new student
-            bulk_password = generate_random_password()
-            student = models.User(
-                email=email, 
-                full_name=name, 
-                hashed_password=get_password_hash(bulk_password), 
-                role="student"
-            )
-            db.add(student)
-            await db.commit()
-            await db.refresh(student)
-            
-            # ✅ OPTIMIZATION: Add email to a task list (don't block the loop)
-            email_tasks.append((email, name, bulk_password))
-        
-        # 2. Enroll in Course
-        enrol_check = await db.execute(select(models.Enrollment).where(
-            models.Enrollment.user_id == student.id, 
-            models.Enrollment.course_id == course_id
-        ))
-        
-        if not enrol_check.scalars().first():
-            db.add(models.Enrollment(user_id=student.id, course_id=course_id))
-            count += 1
-    
-    await db.commit()
-
-    # 3. 🚀 Send Emails in Background (Non-blocking)
-    # This prevents the request from timing out if you upload 100 students
-    for email, name, password in email_tasks:
-        try:
-            # Run each email in a thread
-            await asyncio.to_thread(send_credentials_email, email, name, password)
-        except Exception as e:
-            print(f"Failed to email {email}: {e}")
+    course = await db.execute(select(models.Course.id).where(models.Course.id == course_id))
+    if not course.first():
+        raise HTTPException(status_code=404, detail="Course not found")
 
-    return {"message": f"Successfully enrolled {count} students. Emails are being sent."}
+    # 📄 Spool to disk and check the header; rows are streamed by the job (admission_files.py)
+    try:
+        kind = admission_files.kind_for(file.filename)
+        path = await admission_files.spool(file)
+    except admission_files.RosterError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    try:
+        await asyncio.to_thread(admission_files.check, path, kind)
+    except admission_files.RosterError as e:
+        os.unlink(path)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    # 👥 Set-based admission in the background (bulk_admit.py); small files finish within the request
+    job_id = await bulk_admit.create(redis_client, course_id, current_user.id)
+    task = bulk_admit.start(redis_client, job_id, course_id, path, kind, generate_random_password, send_credentials_email)
+    await asyncio.wait({task}, timeout=bulk_admit.SYNC_WAIT)
+
+    job = await bulk_admit.get(redis_client, job_id)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Bulk admission failed: {job.get('error')}")
+    if job["status"] == "completed":
+        message = f"Successfully enrolled {job['enrolled']} students. {job['emailed']} credential emails sent."
+    else:
+        message = f"Admitting students in the background. Track progress at /api/v1/admin/bulk-admit/{job_id}."
+    return {"message": message, "job_id": job_id, "job": job}
+
+@app.get("/api/v1/admin/bulk-admit/{job_id}")
+async def get_bulk_admit_job(job_id: str, db: AsyncSession = Depends(get_db), current_user: models.User = Depends(require_instructor)):
+    job = await bulk_admit.get(redis_client, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Bulk admission job not found")
+    # 🔒 Only whoever started the job or the course's instructor (same 404, so job ids can't be probed)
+    if str(job.get("requested_by")) != str(current_user.id):
+        owner = await db.execute(select(models.Course.instructor_id).where(models.Course.id == job["course_id"]))
+        if owner.scalar() != current_user.id:
+            raise HTTPException(status_code=404, detail="Bulk admission job not found")
+    return job
 
 @app.post("/api/v1/ai/generate-challenge") # 👈 Changed from "/generate" to match Frontend
 async def generate_problem_content(req: AIGenerateRequest):
@@ -710,6 +751,8 @@ async def start_code_test(test_id: int, pass_key: str = Form(...), db: AsyncSess
     if not test: raise HTTPException(status_code=404)
     if test.pass_key != pass_key: raise HTTPException(status_code=403, detail="Invalid Key")
     
+    # 🚦 Runs for this test go to the exam lane while the attempt is open (execution_lanes.py)
+    await execution_lanes.open_attempt(redis_client, test.id, current_user.email, test.time_limit)
     return { "id": test.id, "title": test.title, "time_limit": test.time_limit, "problems": [{"id": p.id, "title": p.title, "description": p.description, "test_cases": p.test_cases} for p in test.problems] }
 
 @app.post("/api/v1/code-tests/submit")
@@ -717,6 +760,7 @@ async def submit_test_result(sub: TestSubmission, db: AsyncSession = Depends(get
     result = models.TestResult(test_id=sub.test_id, user_id=current_user.id, score=sub.score, problems_solved=sub.problems_solved, time_taken=sub.time_taken)
     db.add(result)
     await db.commit()
+    await execution_lanes.close_attempt(redis_client, sub.test_id, current_user.email)
     return {"message": "Submitted"}
 
 @app.get("/api/v1/code-tests/{test_id}/results")
@@ -981,8 +1025,11 @@ async def get_my_courses(db: AsyncSession = Depends(get_db), current_user: model
 
 @app.post("/api/v1/user/change-password")
 async def change_password(req: PasswordChange, db: AsyncSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    current_user.hashed_password = get_password_hash(req.new_password)
+    # current_user may come from the identity cache (no session), so update the row itself
+    user = await db.get(models.User, current_user.id)
+    user.hashed_password = await get_password_hash(req.new_password)
     await db.commit()
+    await identity_cache.invalidate(redis_client, user.email)
     return {"message": "Password updated"}
 
 # In backend/main.py
@@ -1167,6 +1214,7 @@ async def delete_student(user_id: int, db: AsyncSession = Depends(get_db), curre
     # student.email = f"archived_{student.id}_{student.email}"
 
     await db.commit()
+    await identity_cache.invalidate(redis_client, student.email)
     
     return {"message": "Student deactivated successfully. Data has been archived safely."}
 
@@ -1181,8 +1229,9 @@ async def reset_student_password(user_id: int, req: PasswordChange, db: AsyncSes
         raise HTTPException(status_code=404, detail="Student not found")
     
     # 2. Reset Password
-    student.hashed_password = get_password_hash(req.new_password)
+    student.hashed_password = await get_password_hash(req.new_password)
     await db.commit()
+    await identity_cache.invalidate(redis_client, student.email)
     
     return {"message": f"Password for {student.full_name} has been reset."}
 
@@ -1318,18 +1367,211 @@ async def verify_assignment(submission_id: int, db: AsyncSession = Depends(get_d
     # ✅ Removed certificate logic.
     return {"message": "Verified"}
 
+EXEC_RETRY_AFTER = int(os.getenv("EXEC_RETRY_AFTER", 5))
+# Coarse per-IP backstop (slowapi). A whole campus can sit behind one NAT address, so this is
+# set far above any one user's quota; per-user limits are execution_quotas' job.
+EXEC_IP_RATE_LIMIT = os.getenv("EXEC_IP_RATE_LIMIT", "2000/minute")
+
+async def check_execution_capacity(lane=execution_lanes.PRACTICE):
+    """Raises 429 while the lane's backlog is too deep (practice sheds first), 503 while Judge0 is known to be down."""
+    busy = await execution_lanes.admission_error(redis_client, lane)
+    if busy:
+        raise HTTPException(status_code=429, detail=busy, headers={"Retry-After": str(EXEC_RETRY_AFTER)})
+    # With the multi-backend router one open circuit just means failover, not an outage
+    open_for = await judge0_governor.circuit_open_for(redis_client) if EXECUTOR_BACKEND != "router" else 0
+    if open_for > 0:
+        raise HTTPException(status_code=503, detail="Code execution service is temporarily unavailable.", headers={"Retry-After": str(int(open_for) + 1)})
+
+async def challenge_case_version(db: AsyncSession, challenge_id: int):
+    """
+    Current test-case version of a challenge, publishing its cases to Redis if needed.
+    Returns (version, None), or (None, test_cases) when Redis can't hold the snapshot, or (None, None) if not found.
+    """
+    version = await challenge_cases.current_version(redis_client, challenge_id)
+    if version is not None:
+        return version, None
+
+    res = await db.execute(select(models.CourseChallenge).where(models.CourseChallenge.id == challenge_id))
+    challenge = res.scalars().first()
+    if not challenge:
+        return None, None
+    version = challenge.test_case_version or 1
+    if await challenge_cases.publish(redis_client, challenge.id, version, challenge.test_cases, challenge.function_name):
+        return version, None
+    return None, challenge.test_cases
+
+def requester_identity(request: Request):
+    """
+    Who is asking, without a DB hit: (identity, role) from the JWT when a valid token is sent,
+    else the client IP with role None.
+    """
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        try:
+            claims = jwt.decode(auth[7:], SECRET_KEY, algorithms=[ALGORITHM])
+            if claims.get("sub"): return f"user:{claims['sub']}", claims.get("role")
+        except JWTError:
+            pass
+    return f"ip:{get_remote_address(request)}", None
+
+async def execution_course_id(db: AsyncSession, challenge_id: Optional[int] = None, content_item_id: Optional[int] = None):
+    """Course a run belongs to, only looked up when some course has its own quota."""
+    if not execution_quotas.has_course_quotas():
+        return None
+    if challenge_id is not None:
+        res = await db.execute(select(models.CourseChallenge.course_id).where(models.CourseChallenge.id == challenge_id))
+        return res.scalar()
+    if content_item_id is not None:
+        res = await db.execute(select(models.Module.course_id).join(models.ContentItem, models.ContentItem.module_id == models.Module.id).where(models.ContentItem.id == content_item_id))
+        return res.scalar()
+    return None
+
+async def check_execution_quota(requester: str, role: Optional[str], course_id: Optional[int] = None):
+    """Raises 429 once the requester's token bucket (role / course quota) is empty."""
+    retry_after = await execution_quotas.take(redis_client, requester, role, course_id)
+    if retry_after:
+        raise HTTPException(status_code=429, detail="You are running code too often. Please wait a moment.", headers={"Retry-After": str(retry_after)})
+
+def send_execution(call: dict):
+    """Publishes one run_code_task call (directly, or from the fair-share dispatcher)."""
+    celery_app.send_task("worker.run_code_task", args=call["args"], kwargs=call["kwargs"], queue=call["queue"], task_id=call["task_id"])
+
+async def scheduled_item_access(db: AsyncSession, item_id: int, email: str):
+    """
+    (start_time, end_time, progress) of a ContentItem for a student enrolled in its course,
+    progress being (id, is_terminated) of their LessonProgress row or None; None if not enrolled.
+    """
+    res = await db.execute(
+        select(models.ContentItem.start_time, models.ContentItem.end_time, models.LessonProgress.id, models.LessonProgress.is_terminated)
+        .join(models.Module, models.Module.id == models.ContentItem.module_id)
+        .join(models.Enrollment, models.Enrollment.course_id == models.Module.course_id)
+        .join(models.User, models.User.id == models.Enrollment.user_id)
+        .outerjoin(models.LessonProgress, and_(models.LessonProgress.content_item_id == models.ContentItem.id, models.LessonProgress.user_id == models.User.id))
+        .where(models.ContentItem.id == item_id, models.User.email == email)
+        .limit(1)
+    )
+    row = res.first()
+    if row is None:
+        return None
+    start_time, end_time, progress_id, terminated = row
+    return start_time, end_time, (progress_id, bool(terminated)) if progress_id is not None else None
+
+def in_window(start_time, end_time):
+    return bool(start_time and end_time and start_time <= datetime.utcnow() <= end_time)
+
+async def execution_lane(db: AsyncSession, payload: CodePayload, requester: str):
+    """
+    Exam lane for runs inside an open CodeTest attempt, and for a scheduled ContentItem inside its
+    window when the requester is enrolled, not terminated, and opened it (attempt) or has progress on it.
+    Anonymous runs are always practice.
+    """
+    if not requester.startswith("user:"):
+        return execution_lanes.PRACTICE
+    email = requester[len("user:"):]
+    if payload.code_test_id is not None:
+        if await execution_lanes.has_open_attempt(redis_client, payload.code_test_id, email):
+            return execution_lanes.EXAM
+    if payload.content_item_id is not None:
+        access = await scheduled_item_access(db, payload.content_item_id, email)
+        if access and in_window(access[0], access[1]):
+            progress = access[2]
+            if progress is not None and progress[1]:
+                return execution_lanes.PRACTICE   # terminated by proctoring
+            if progress is not None or await execution_lanes.has_open_attempt(redis_client, payload.content_item_id, email, kind=execution_lanes.ITEM_ATTEMPT):
+                return execution_lanes.EXAM
+    return execution_lanes.PRACTICE
+
 @app.post("/api/v1/execute")
-async def execute_code(payload: CodePayload):
+@limiter.limit(EXEC_IP_RATE_LIMIT)
+async def execute_code(payload: CodePayload, request: Request, db: AsyncSession = Depends(get_db)):
     
     # ✅ FIX: Use json.dumps() to ensure double quotes (Valid JSON)
     test_cases_str = json.dumps(payload.test_cases)
+    task_kwargs = {"function_name": payload.function_name} if payload.function_name else {}
+    cache_cases = payload.test_cases
+
+    # 📚 Challenge run: enqueue a reference (challenge_id, version), the worker resolves the cases
+    if payload.challenge_id is not None:
+        version, inline_cases = await challenge_case_version(db, payload.challenge_id)
+        if version is not None:
+            task_kwargs.update(challenge_id=payload.challenge_id, test_case_version=version)
+            cache_cases, test_cases_str = challenge_cases.cache_ref(payload.challenge_id, version), ""
+        elif inline_cases is not None:
+            cache_cases = test_cases_str = inline_cases
+        else:
+            raise HTTPException(status_code=404, detail="Challenge not found")
+
+    # ⚡ Result cache: identical code + cases already graded -> hand back a finished task
+    cache_key = result_cache.cache_key(payload.source_code, payload.language_id, cache_cases, payload.function_name)
+    cached = await result_cache.lookup(redis_client, cache_key)
+    if cached is not None:
+        task_id = str(uuid.uuid4())
+        await asyncio.to_thread(celery_app.backend.store_result, task_id, result_storage.pack(cached), "SUCCESS")
+        return {"task_id": task_id, "message": "Served from cache", "cached": True}
+
+    # 🔁 Single-flight: the same request from the same person is already queued/running -> same task
+    requester, role = requester_identity(request)
+    flight_key = single_flight.flight_key(requester, cache_key)
+    in_flight = await single_flight.existing_task(redis_client, flight_key)
+    if in_flight:
+        return {"task_id": in_flight, "message": "Batch Execution Queued", "deduplicated": True}
+
+    # 🪣 Per-user quota: cached and deduplicated runs above are free, real runs cost a token
+    await check_execution_quota(requester, role, await execution_course_id(db, payload.challenge_id, payload.content_item_id))
+
+    # 🚦 Backpressure: refuse new work while the backlog is too deep or Judge0 is down
+    lane = await execution_lane(db, payload, requester)
+    await check_execution_capacity(lane)
+
+    task_id = str(uuid.uuid4())
+    winner = await single_flight.reserve(redis_client, flight_key, task_id)
+    if winner:
+        return {"task_id": winner, "message": "Batch Execution Queued", "deduplicated": True}
+
+    call = {
+        "task_id": task_id,
+        "args": [payload.source_code, payload.language_id, test_cases_str],
+        "kwargs": {**task_kwargs, "lane": lane, "enqueued_at": time.time()},
+        "queue": execution_lanes.queue_for(lane),
+    }
+    try:
+        # ⚖️ Fair share: park the run in the requester's own line, the dispatcher round-robins users
+        if fair_share.FAIR_SHARE_ENABLED:
+            await fair_share.enqueue(redis_client, lane, requester, **call)
+        else:
+            send_execution(call)
+    except fair_share.UserBacklogFull as e:
+        await single_flight.release(redis_client, flight_key, task_id)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(EXEC_RETRY_AFTER)})
+    except Exception:
+        await single_flight.release(redis_client, flight_key, task_id)
+        raise
+    
+    return {"task_id": task_id, "message": "Batch Execution Queued"}
+@app.get("/api/v1/admin/execution-cache/stats")
+async def execution_cache_stats(current_user: models.User = Depends(require_instructor)):
+    return await result_cache.stats(redis_client)
+
+@app.get("/api/v1/admin/execution-lanes/stats")
+async def execution_lane_stats(current_user: models.User = Depends(require_instructor)):
+    """Depth and wait time (enqueue -> worker pickup) of the exam and practice lanes."""
+    return await execution_lanes.stats(redis_client)
+
+@app.get("/api/v1/admin/execution-router/stats")
+async def execution_router_stats(current_user: models.User = Depends(require_instructor)):
+    """Per worker process + backend health as last reported by the router (execution_router.py)."""
+    workers = {}
+    async for key in redis_client.scan_iter(match="exec_router:stats:*"):
+        pid = key.rsplit(":", 1)[-1]
+        for name, value in (await redis_client.hgetall(key)).items():
+            workers[f"{pid}:{name}"] = json.loads(value)
+    return {"backend": EXECUTOR_BACKEND, "workers": workers}
+
+@app.get("/api/v1/admin/password-hashing/stats")
+async def password_hashing_stats(current_user: models.User = Depends(require_instructor)):
+    """bcrypt pool load of the API process that answers (password_hashing.py)."""
+    return password_hashing.stats()
 
-    task = celery_app.send_task(
-        "worker.run_code_task", 
-        args=[payload.source_code, payload.language_id, test_cases_str]
-    )
-    
-    return {"task_id": task.id, "message": "Batch Execution Queued"}
 # --- ✅ COMPLETION LOGIC ENDPOINTS ---
 
 # 1. Toggle Item Completion (The Green Tick)
@@ -1404,9 +1646,64 @@ async def get_result(task_id: str):
     if task_result.state == 'PENDING':
         return {"status": "processing"}
     elif task_result.state == 'SUCCESS':
-        return {"status": "completed", "data": task_result.result}
+        return {"status": "completed", "data": result_storage.unpack(task_result.result)}
     elif task_result.state == 'FAILURE':
         return {"status": "failed", "error": str(task_result.result)}
+
+# 3. PUSH ENDPOINT (Server-Sent Events) - polling above stays as the fallback
+EXEC_STREAM_TIMEOUT = int(os.getenv("EXEC_STREAM_TIMEOUT", 120))
+
+def _final_event(task_id: str):
+    """Sync helper (run in a thread): the finished result as a stream event, or None while still running."""
+    task_result = AsyncResult(task_id)
+    if task_result.state == 'SUCCESS':
+        return execution_events.result_event(result_storage.unpack(task_result.result))
+    if task_result.state == 'FAILURE':
+        return {"type": "result", "status": "failed", "error": str(task_result.result)}
+    return None
+
+@app.get("/api/v1/stream/{task_id}")
+async def stream_result(task_id: str):
+    async def event_stream():
+        pubsub = redis_client.pubsub()
+        await pubsub.subscribe(execution_events.channel(task_id))
+        try:
+            # Subscribed first, THEN check the backend, so a result landing in between isn't lost
+            final = await asyncio.to_thread(_final_event, task_id)
+            if final:
+                yield execution_events.sse(final, event="result"); return
+            # Where the task is now, so a late subscriber isn't left blank until the next event
+            yield execution_events.sse({"type": "progress", "stage": await execution_events.current_stage(redis_client, task_id)}, event="progress")
+
+            deadline = asyncio.get_running_loop().time() + EXEC_STREAM_TIMEOUT
+            idle_ticks = 0
+            while asyncio.get_running_loop().time() < deadline:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=2.0)
+                if message is None:
+                    idle_ticks += 1
+                    # Missed the publish (e.g. reconnect)? The result backend still has it.
+                    final = await asyncio.to_thread(_final_event, task_id)
+                    if final:
+                        yield execution_events.sse(final, event="result"); return
+                    if idle_ticks % 7 == 0:
+                        yield ": keep-alive\n\n"
+                    continue
+
+                event = json.loads(message["data"])
+                yield execution_events.sse(event, event=event.get("type"))
+                if event.get("type") == "result":
+                    return
+
+            yield execution_events.sse({"type": "timeout", "message": "Still running. Fall back to polling /api/v1/result."}, event="timeout")
+        finally:
+            await pubsub.unsubscribe(execution_events.channel(task_id))
+            await pubsub.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
  
 @app.get("/api/v1/courses/{course_id}/challenges")
 async def get_course_challenges(course_id: int, db: AsyncSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -1532,6 +1829,12 @@ async def get_lesson_status(lesson_id: int, db: AsyncSession = Depends(get_db),
     ))
     progress = res.scalars().first()
     
+    # 🚦 Opening a scheduled test inside its window opens an exam-lane attempt (execution_lanes.py)
+    access = await scheduled_item_access(db, lesson_id, current_user.email)
+    if access and in_window(access[0], access[1]) and not (progress and progress.is_terminated):
+        minutes_left = (access[1] - datetime.utcnow()).total_seconds() / 60
+        await execution_lanes.open_attempt(redis_client, lesson_id, current_user.email, minutes_left, kind=execution_lanes.ITEM_ATTEMPT)
+
     if not progress:
         return {"is_terminated": False, "violation_count": 0}
         
@@ -1674,33 +1977,30 @@ async def manual_backup(db: AsyncSession = Depends(get_db), current_user: models
         return {"message": "Backup triggered successfully!"}
     return {"message": "Backup failed."}
 
-@app.post("/api/v1/challenges/{challenge_id}/solve")
-async def mark_challenge_solved(challenge_id: int, db: AsyncSession = Depends(get_db), current_user: models.User = Depends(require_student)):
-    # 1. Check if challenge exists
-    res = await db.execute(select(models.CourseChallenge).where(models.CourseChallenge.id == challenge_id))
-    challenge = res.scalars().first()
-    if not challenge:
-        raise HTTPException(status_code=404, detail="Challenge not found")
+# Judged submit: the server runs every case (hidden included) and records the solve itself.
+# Listen on /api/v1/stream/{task_id} for the verdict (or poll /api/v1/result/{task_id}).
+@app.post("/api/v1/challenges/{challenge_id}/submit")
+async def submit_challenge(challenge_id: int, submission: ChallengeSubmission, db: AsyncSession = Depends(get_db), current_user: models.User = Depends(require_student)):
+    version, inline_cases = await challenge_case_version(db, challenge_id)
+    if version is None:
+        if inline_cases is None:
+            raise HTTPException(status_code=404, detail="Challenge not found")
+        raise HTTPException(status_code=503, detail="Judging is temporarily unavailable.", headers={"Retry-After": str(EXEC_RETRY_AFTER)})
 
-    # 2. Insert into Progress Table (Idempotent)
-    try:
-        # We use ON CONFLICT DO NOTHING to avoid errors if they solve it twice
-        # Note: Ensure your DB has a UNIQUE constraint on (user_id, challenge_id)
-        # If not, use a SELECT check first.
-        
-        # Safe check logic just in case unique constraint isn't set:
-        check_res = await db.execute(text("SELECT 1 FROM challenge_progress WHERE user_id=:uid AND challenge_id=:cid"), {"uid": current_user.id, "cid": challenge_id})
-        if not check_res.first():
-            await db.execute(
-                text("INSERT INTO challenge_progress (user_id, challenge_id, is_solved, solved_at) VALUES (:uid, :cid, :solved, :time)"),
-                {"uid": current_user.id, "cid": challenge_id, "solved": True, "time": datetime.utcnow()}
-            )
-            await db.commit()
-    except Exception as e:
-        print(f"Error saving progress: {e}")
-        pass
+    await check_execution_quota(f"user:{current_user.email}", current_user.role, await execution_course_id(db, challenge_id=challenge_id))
+    await check_execution_capacity()
 
-    return {"status": "success", "message": "Challenge marked as solved"}
+    task = celery_app.send_task(
+        "worker.submit_challenge_task",
+        kwargs={
+            "source_code": submission.source_code,
+            "language_id": submission.language_id,
+            "challenge_id": challenge_id,
+            "test_case_version": version,
+            "user_id": current_user.id,
+        }
+    )
+    return {"task_id": task.id, "message": "Submission queued", "stream": f"/api/v1/stream/{task.id}"}
 
 @app.patch("/api/v1/challenges/{challenge_id}")
 async def update_challenge(challenge_id: int, update: ChallengeUpdate, db: AsyncSession = Depends(get_db), current_user: models.User = Depends(require_instructor)):
@@ -1713,16 +2013,58 @@ async def update_challenge(challenge_id: int, update: ChallengeUpdate, db: Async
     if update.title: challenge.title = update.title
     if update.description: challenge.description = update.description
     if update.difficulty: challenge.difficulty = update.difficulty
-    if update.test_cases: challenge.test_cases = update.test_cases
+    if update.test_cases and update.test_cases != challenge.test_cases:
+        challenge.test_cases = update.test_cases
+        challenge.test_case_version = (challenge.test_case_version or 1) + 1
     
     await db.commit()
     
     # Clear Cache
     cache_key = f"course_{challenge.course_id}_challenges"
     await redis_client.delete(cache_key)
+    await challenge_cases.invalidate(redis_client, challenge_id, challenge.test_case_version or 1)
     
     return {"message": "Challenge updated successfully"}
 
+# 🔁 Re-run every stored solution against the current test cases (e.g. after editing them)
+@app.post("/api/v1/challenges/{challenge_id}/regrade")
+async def regrade_challenge(challenge_id: int, db: AsyncSession = Depends(get_db), current_user: models.User = Depends(require_instructor)):
+    res = await db.execute(select(models.CourseChallenge.id).where(models.CourseChallenge.id == challenge_id))
+    if not res.first():
+        raise HTTPException(status_code=404, detail="Challenge not found")
+
+    job_id, created = await regrade.create(redis_client, challenge_id, current_user.id)
+    if created:
+        celery_app.send_task("worker.regrade_challenge_task", args=[job_id])
+    return {"job_id": job_id, "created": created, "job": await regrade.get(redis_client, job_id)}
+
+@app.get("/api/v1/regrade-jobs/{job_id}")
+async def get_regrade_job(job_id: str, current_user: models.User = Depends(require_instructor)):
+    job = await regrade.get(redis_client, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Regrade job not found")
+    return job
+
+# 🔍 Near-duplicate solutions (MinHash/LSH index, see similarity.py)
+@app.get("/api/v1/challenges/{challenge_id}/similarity")
+async def challenge_similarity(challenge_id: int, threshold: float = similarity.DEFAULT_THRESHOLD, db: AsyncSession = Depends(get_db), current_user: models.User = Depends(require_instructor)):
+    report = await similarity.find_clusters(redis_client, similarity.scope_for_challenge(challenge_id), threshold)
+
+    # Attach names so instructors don't have to look up ids
+    user_ids = {int(m) for c in report["clusters"] for m in c["members"]}
+    names = {}
+    if user_ids:
+        res = await db.execute(select(models.User.id, models.User.full_name, models.User.email).where(models.User.id.in_(user_ids)))
+        names = {str(uid): {"user_id": uid, "name": name, "email": email} for uid, name, email in res.all()}
+    for cluster in report["clusters"]:
+        cluster["students"] = [names.get(m, {"user_id": int(m)}) for m in cluster["members"]]
+    return {"challenge_id": challenge_id, "threshold": threshold, **report}
+
+@app.post("/api/v1/challenges/{challenge_id}/similarity/rebuild")
+async def rebuild_challenge_similarity(challenge_id: int, current_user: models.User = Depends(require_instructor)):
+    task = celery_app.send_task("worker.rebuild_similarity_task", args=[challenge_id])
+    return {"task_id": task.id, "message": "Similarity index rebuild queued"}
+
 @app.delete("/api/v1/challenges/{challenge_id}")
 async def delete_challenge(challenge_id: int, db: AsyncSession = Depends(get_db), current_user: models.User = Depends(require_instructor)):
     res = await db.execute(select(models.CourseChallenge).where(models.CourseChallenge.id == challenge_id))
@@ -1742,6 +2084,7 @@ async def delete_challenge(challenge_id: int, db: AsyncSession = Depends(get_db)
     # Clear Cache
     cache_key = f"course_{course_id}_challenges"
     await redis_client.delete(cache_key)
+    await challenge_cases.invalidate(redis_client, challenge_id)
     
     return {"message": "Challenge deleted"}
 
@@ -148,6 +148,7 @@ class CourseChallenge(Base):
     difficulty = Column(String) # "Easy", "Medium", "Hard"
     test_cases = Column(Text) # JSON String: [{"input": "...", "output": "...", "hidden": false}]
     function_name = Column(String, default="solution") # For function wrapping if needed
+    test_case_version = Column(Integer, default=1) # Bumped whenever test_cases change (see challenge_cases.py)
     
     course = relationship("Course", back_populates="challenges")
     progress = relationship("ChallengeProgress", back_populates="challenge")
@@ -160,6 +161,7 @@ class ChallengeProgress(Base):
     is_solved = Column(Boolean, default=False)
     solved_at = Column(DateTime, default=datetime.utcnow)
     user_code = Column(Text, nullable=True) # Save their last successful code
+    language_id = Column(Integer, nullable=True) # Judge0 language of user_code (needed to regrade it)
 
     challenge = relationship("CourseChallenge", back_populates="progress")    
     
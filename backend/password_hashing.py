@@ -0,0 +1,130 @@
+# password_hashing.py
+# bcrypt off the event loop. One bcrypt call is 100-300 ms of pure CPU; run inline it froze every
+# request in the API process (a 500-row bulk admit froze it for minutes).
+#
+# Hashing and verification run in a small process pool (PASSWORD_HASH_WORKERS processes per API
+# process), so the loop only awaits a future. Guard rails:
+#   - at most PASSWORD_HASH_MAX_PENDING calls queued or running; past that HashingBusy is raised
+#     and the API answers 503 instead of piling up minutes of work
+#   - bulk callers (`hash_many`) hold at most one batch (= the number of workers) in the pool,
+#     so a login arriving during a bulk admit waits for one batch, not the whole file
+# Metrics per operation (this process): calls, rejected, in flight, queue wait and run time.
+# A worker crash breaks a ProcessPoolExecutor for good, so the pool is rebuilt on the next call.
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+WORKERS = max(1, int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))))
+MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", 12))
+
+_pool = None
+_pending = 0
+_stats = {
+    op: {"calls": 0, "rejected": 0, "errors": 0, "wait_ms": 0.0, "run_ms": 0.0, "max_ms": 0.0}
+    for op in ("hash", "verify")
+}
+
+
+class HashingBusy(Exception):
+    pass
+
+
+# --- 🔧 POOL PROCESSES ---
+def _hash(password):
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("utf-8")
+    return hashed, time.perf_counter() - started
+
+
+def _verify(password, hashed):
+    started = time.perf_counter()
+    if isinstance(hashed, str): hashed = hashed.encode("utf-8")
+    try:
+        ok = bcrypt.checkpw(password.encode("utf-8"), hashed)
+    except ValueError:  # malformed stored hash
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+# --- 🚀 API SIDE ---
+def start():
+    """Creates the pool and starts its processes (API startup), so the first login doesn't pay for it."""
+    global _pool
+    if _pool is None:
+        # spawn: the API process has threads (token manager, Redis), forking it is not safe
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        for _ in range(WORKERS):
+            _pool.submit(time.sleep, 0)
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _run(op, fn, *args):
+    global _pending, _pool
+    stats = _stats[op]
+    if _pending >= MAX_PENDING:
+        stats["rejected"] += 1
+        raise HashingBusy("Too many sign-ins are being processed. Please retry in a few seconds.")
+    _pending += 1
+    queued = time.perf_counter()
+    try:
+        result, run_seconds = await asyncio.get_running_loop().run_in_executor(start(), fn, *args)
+    except BrokenProcessPool:
+        stats["errors"] += 1
+        _pool = None
+        raise
+    finally:
+        _pending -= 1
+    total_ms = (time.perf_counter() - queued) * 1000
+    stats["calls"] += 1
+    stats["run_ms"] += run_seconds * 1000
+    stats["wait_ms"] += max(0.0, total_ms - run_seconds * 1000)
+    stats["max_ms"] = max(stats["max_ms"], total_ms)
+    return result
+
+
+async def hash_password(password):
+    return await _run("hash", _hash, password)
+
+
+async def verify_password(password, hashed):
+    return await _run("verify", _verify, password, hashed)
+
+
+async def hash_many(passwords, progress=None):
+    """Hashes for `passwords`, in order, one pool-sized batch at a time. `progress(done)` after each batch."""
+    hashes = []
+    for i in range(0, len(passwords), WORKERS):
+        hashes += await asyncio.gather(*(hash_password(p) for p in passwords[i:i + WORKERS]))
+        if progress:
+            await progress(len(hashes))
+    return hashes
+
+
+def stats():
+    out = {"pid": os.getpid(), "workers": WORKERS, "max_pending": MAX_PENDING, "in_flight": _pending, "rounds": BCRYPT_ROUNDS}
+    for op, s in _stats.items():
+        calls = s["calls"]
+        out[op] = {
+            "calls": calls,
+            "rejected": s["rejected"],
+            "errors": s["errors"],
+            "avg_wait_ms": round(s["wait_ms"] / calls, 1) if calls else None,
+            "avg_run_ms": round(s["run_ms"] / calls, 1) if calls else None,
+            "max_ms": round(s["max_ms"], 1),
+        }
+    return out
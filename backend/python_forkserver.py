@@ -0,0 +1,304 @@
+# python_forkserver.py
+# Warm fork server for Python submissions on the local executor (see executors.LocalExecutor).
+#
+# Starting a fresh interpreter and importing json/inspect/resource costs tens of ms per
+# submission. This server pays that once: it pre-imports what the grading driver needs, then
+# listens on a Unix socket. Per job (one JSON line: source, stdin, limits, sandboxed) it forks:
+#
+#   server ── fork ──> monitor ── fork ──> runner
+#                      (reads the runner's pipes, enforces the wall clock, wait4 for rusage,
+#                       writes ONE JSON result line back, same shape as sandbox_runner.run_process)
+#                                          (setsid, rlimits, no_new_privs/seccomp, fresh temp dir,
+#                                           stdin/stdout/stderr on pipes, runs the source as
+#                                           __main__ in a fresh namespace)
+#
+# The runner never holds the client socket, so user code can only speak through stdout,
+# exactly like a `python3 main.py` run; the driver's ---JSON_START--- report is unchanged.
+# The server is started with a scrubbed environment and in isolated mode (-I), so nothing of
+# the worker's configuration or secrets is in the memory the runner inherits.
+# It exits when its stdin (a pipe from the executor) closes.
+#
+# Run by the executor:  python -I python_forkserver.py <socket path>
+import os
+import sys
+import json
+import time
+import socket
+import select
+import signal
+import resource
+import tempfile
+import shutil
+import types
+
+# Pre-imported for the submissions (the driver's imports + common stdlib picks)
+import io, re, math, string, inspect, resource, collections, itertools, functools, heapq, bisect  # noqa: F401
+
+# -I leaves the script's directory off sys.path; add it just long enough to share the sandbox
+# helpers, so submissions can't import backend modules from here
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sandbox_runner import MAX_OUTPUT_BYTES, _apply_seccomp
+sys.path.pop(0)
+
+# Loaded once here: importing ctypes / probing for seccomp in every fork would cost more than the fork
+try:
+    import ctypes
+    LIBC = ctypes.CDLL(None, use_errno=True)
+except Exception:
+    LIBC = None
+try:
+    import seccomp  # noqa: F401
+    HAS_SECCOMP = True
+except ImportError:
+    HAS_SECCOMP = False
+
+PR_SET_NO_NEW_PRIVS = 38
+CLONE_NEWUTS, CLONE_NEWIPC, CLONE_NEWUSER, CLONE_NEWNET = 0x04000000, 0x08000000, 0x10000000, 0x40000000
+
+
+def _unshare():
+    """Best effort: own user/net/ipc/uts namespaces (like `unshare --user --net` on the exec path)."""
+    if LIBC is not None:
+        LIBC.unshare(CLONE_NEWUSER | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS)
+
+
+def _sandbox():
+    """Same hardening as sandbox_runner's preexec: no_new_privs, then seccomp when available."""
+    if LIBC is not None:
+        LIBC.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0)
+    if HAS_SECCOMP:
+        _apply_seccomp()
+
+
+def _apply_limits(limits):
+    cpu = limits.get("cpu_seconds")
+    if cpu:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    mem = limits.get("memory_bytes")
+    if mem:
+        resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+    nproc = limits.get("max_processes")
+    if nproc:
+        resource.setrlimit(resource.RLIMIT_NPROC, (nproc, nproc))
+    fsize = limits.get("file_bytes")
+    if fsize:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def _run_user_code(job, workdir, stdin_r, stdout_w, stderr_w):
+    """Runner process body. Never returns."""
+    code = 1
+    try:
+        os.setsid()
+        os.dup2(stdin_r, 0)
+        os.dup2(stdout_w, 1)
+        os.dup2(stderr_w, 2)
+        for fd in (stdin_r, stdout_w, stderr_w):
+            os.close(fd)
+        os.chdir(workdir)
+        os.environ.clear()
+        os.environ.update({"PATH": "/usr/bin:/bin", "HOME": workdir, "LANG": "C.UTF-8"})
+        if job.get("namespaces"):
+            _unshare()
+        _apply_limits(job.get("limits", {}))
+        if job.get("sandboxed", True):
+            _sandbox()
+
+        sys.stdin = io.TextIOWrapper(io.FileIO(0, "r", closefd=False), encoding="utf-8")
+        sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), encoding="utf-8", write_through=False)
+        sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), encoding="utf-8", write_through=True)
+        sys.argv = [job["filename"]]
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+        main = types.ModuleType("__main__")
+        main.__file__ = job["filename"]
+        sys.modules["__main__"] = main
+        try:
+            exec(compile(job["source"], job["filename"], "exec"), main.__dict__)
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            if e.code is not None and not isinstance(e.code, int):
+                print(e.code, file=sys.stderr)
+        except BaseException as e:
+            import traceback
+            traceback.print_exception(type(e), e, e.__traceback__.tb_next)  # user frames only
+            code = 1
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+    finally:
+        os._exit(code)
+
+
+def _kill_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _read_until_done(pid, out_r, err_r, deadline):
+    """Drains the runner's stdout/stderr (capped) until both close or the wall clock runs out."""
+    buffers = {out_r: [], err_r: []}
+    sizes = {out_r: 0, err_r: 0}
+    open_fds = [out_r, err_r]
+    timed_out = False
+    while open_fds:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            timed_out = True
+            _kill_group(pid)
+            break
+        ready, _, _ = select.select(open_fds, [], [], remaining)
+        for fd in ready:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                open_fds.remove(fd)
+                continue
+            if sizes[fd] < MAX_OUTPUT_BYTES:
+                buffers[fd].append(chunk[:MAX_OUTPUT_BYTES - sizes[fd]])
+                sizes[fd] += len(chunk)
+    return b"".join(buffers[out_r]), b"".join(buffers[err_r]), timed_out
+
+
+def _wait_exit(pid, deadline):
+    """(status, rusage, timed_out). Sleeps on a pidfd where the kernel has them, instead of polling."""
+    pidfd = None
+    if hasattr(os, "pidfd_open"):
+        try:
+            pidfd = os.pidfd_open(pid)
+        except OSError:
+            pass
+    try:
+        while True:
+            done, status, usage = os.wait4(pid, os.WNOHANG)
+            if done:
+                return status, usage, False
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                _kill_group(pid)
+                _, status, usage = os.wait4(pid, 0)
+                return status, usage, True
+            if pidfd is not None:
+                select.select([pidfd], [], [], remaining)
+            else:
+                time.sleep(min(0.002, remaining))
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def _monitor(conn, job):
+    """Monitor process body: runs one job and answers on `conn`. Never returns."""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    workdir = tempfile.mkdtemp(prefix="sbx_")
+    try:
+        with open(os.path.join(workdir, job["filename"]), "w", encoding="utf-8") as f:
+            f.write(job["source"])  # for tracebacks (linecache) and code that reads its own file
+
+        stdin_r, stdin_w = os.pipe()
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        started = time.time()
+        pid = os.fork()
+        if pid == 0:
+            conn.close()
+            for fd in (stdin_w, out_r, err_r):
+                os.close(fd)
+            _run_user_code(job, workdir, stdin_r, out_w, err_w)
+        for fd in (stdin_r, out_w, err_w):
+            os.close(fd)
+
+        # Feed stdin from a thread-free writer: small inputs fit the pipe, big ones go via a child
+        data = (job.get("stdin") or "").encode("utf-8")
+        if len(data) <= 65536:
+            try:
+                os.write(stdin_w, data)
+            except OSError:
+                pass
+            os.close(stdin_w)
+        elif os.fork() == 0:
+            try:
+                with os.fdopen(stdin_w, "wb") as f:
+                    f.write(data)
+            except OSError:
+                pass
+            os._exit(0)
+        else:
+            os.close(stdin_w)
+
+        deadline = started + job.get("limits", {}).get("wall_seconds", 10)
+        stdout, stderr, timed_out = _read_until_done(pid, out_r, err_r, deadline)
+        # Pipes closed doesn't mean exited: keep the wall clock on the process itself
+        status, usage, killed = _wait_exit(pid, deadline)
+        timed_out = timed_out or killed
+        _kill_group(pid)  # stragglers in the runner's group
+        code = os.waitstatus_to_exitcode(status)
+        result = {
+            "exit_code": code if code >= 0 else None,
+            "signal": -code if code < 0 else None,
+            "stdout": stdout.decode("utf-8", "replace"),
+            "stderr": stderr.decode("utf-8", "replace"),
+            "timed_out": timed_out,
+            "time": round(usage.ru_utime + usage.ru_stime, 3),
+            "wall_time": round(time.time() - started, 3),
+            "memory_kb": usage.ru_maxrss,
+        }
+    except Exception as e:
+        result = {"internal_error": f"Fork server: {e}"}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    try:
+        conn.sendall((json.dumps(result) + "\n").encode("utf-8"))
+    finally:
+        os._exit(0)
+
+
+def _read_job(conn):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data)
+
+
+def serve(path):
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    os.chmod(path, 0o600)
+    listener.listen(128)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # monitors are reaped automatically
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+
+    while True:
+        ready, _, _ = select.select([listener, sys.stdin], [], [])
+        if sys.stdin in ready and not os.read(sys.stdin.fileno(), 1024):
+            break  # executor went away
+        if listener not in ready:
+            continue
+        conn, _ = listener.accept()
+        try:
+            conn.settimeout(10)
+            job = _read_job(conn)
+            conn.settimeout(None)
+        except Exception as e:
+            conn.close()
+            print(f"Fork server: bad job ({e})", file=sys.stderr)
+            continue
+        if os.fork() == 0:
+            listener.close()
+            _monitor(conn, job)
+        conn.close()
+    listener.close()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1])
@@ -0,0 +1,159 @@
+# regrade.py
+# Job state for bulk challenge regrades (worker.regrade_challenge_task).
+#
+# A job re-runs every stored ChallengeProgress.user_code of one challenge against the
+# challenge's current test cases and rewrites is_solved. State lives in one Redis hash
+# per job ("regrade_job:<job_id>"):
+#   challenge_id, status (queued|running|completed|failed), total, processed, solved,
+#   unsolved, errors, cursor (last challenge_progress.id done), started_at, finished_at
+# The cursor is saved after every page, so a redelivered task (worker restart) resumes
+# where the previous run stopped instead of starting over.
+#
+# A long job can outlive the broker's visibility timeout and be redelivered while it is still
+# running. The running task holds a per-job lock ("regrade_job:<job_id>:lock", owner token,
+# LOCK_TTL) that a heartbeat thread keeps alive; a second delivery that can't take it backs off
+# instead of grading the same rows twice. If the owner dies the lock expires and the retry resumes.
+import os
+import time
+import uuid
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+JOB_TTL = int(os.getenv("REGRADE_JOB_TTL", 7 * 24 * 3600))
+LOCK_TTL = int(os.getenv("REGRADE_LOCK_TTL", 60))   # seconds a dead owner keeps the job locked
+
+PREFIX = "regrade_job:"
+COUNTERS = ("total", "processed", "solved", "unsolved", "errors", "cursor")
+
+
+def job_key(job_id):
+    return PREFIX + job_id
+
+
+def active_key(challenge_id):
+    return f"{PREFIX}challenge:{challenge_id}"
+
+
+def lock_key(job_id):
+    return f"{PREFIX}{job_id}:lock"
+
+
+# KEYS: lock   ARGV: owner, ttl (0 = release)
+REFRESH_LUA = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if tonumber(ARGV[2]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+else
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+
+def _decode(raw):
+    if not raw:
+        return None
+    job = dict(raw)
+    for field in COUNTERS:
+        job[field] = int(job.get(field) or 0)
+    job["challenge_id"] = int(job["challenge_id"])
+    return job
+
+
+# --- 🚀 API SIDE (async redis) ---
+async def create(redis_conn, challenge_id, requested_by):
+    """Returns (job_id, created). An unfinished job for the same challenge is reused."""
+    active = await redis_conn.get(active_key(challenge_id))
+    if active:
+        job = _decode(await redis_conn.hgetall(job_key(active)))
+        if job and job["status"] in ("queued", "running"):
+            return active, False
+
+    job_id = uuid.uuid4().hex
+    pipe = redis_conn.pipeline()
+    pipe.hset(job_key(job_id), mapping={
+        "job_id": job_id, "challenge_id": challenge_id, "status": "queued", "requested_by": requested_by,
+        "total": 0, "processed": 0, "solved": 0, "unsolved": 0, "errors": 0, "cursor": 0,
+        "created_at": time.time(),
+    })
+    pipe.expire(job_key(job_id), JOB_TTL)
+    pipe.set(active_key(challenge_id), job_id, ex=JOB_TTL)
+    await pipe.execute()
+    return job_id, True
+
+
+async def get(redis_conn, job_id):
+    job = _decode(await redis_conn.hgetall(job_key(job_id)))
+    if job and job["total"]:
+        job["percent"] = round(job["processed"] * 100 / job["total"], 1)
+    return job
+
+
+# --- 🔄 WORKER SIDE (sync redis) ---
+def load(redis_conn, job_id):
+    return _decode(redis_conn.hgetall(job_key(job_id)))
+
+
+def update(redis_conn, job_id, **fields):
+    redis_conn.hset(job_key(job_id), mapping=fields)
+
+
+def checkpoint(redis_conn, job_id, cursor, solved, unsolved, errors):
+    """Counters and cursor move together, so a resumed job never double counts a page."""
+    pipe = redis_conn.pipeline()
+    pipe.hincrby(job_key(job_id), "processed", solved + unsolved + errors)
+    pipe.hincrby(job_key(job_id), "solved", solved)
+    pipe.hincrby(job_key(job_id), "unsolved", unsolved)
+    pipe.hincrby(job_key(job_id), "errors", errors)
+    pipe.hset(job_key(job_id), "cursor", cursor)
+    pipe.execute()
+
+
+class JobLock:
+    """
+    The per-job lock, refreshed every LOCK_TTL / 3 by a daemon thread while held.
+    `lost` is set when the refresh finds another owner (we stalled past LOCK_TTL).
+    """
+    def __init__(self, redis_conn, job_id):
+        self.redis = redis_conn
+        self.key = lock_key(job_id)
+        self.owner = uuid.uuid4().hex
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._refresh = redis_conn.register_script(REFRESH_LUA)
+
+    def acquire(self):
+        if not self.redis.set(self.key, self.owner, nx=True, ex=LOCK_TTL):
+            return False
+        threading.Thread(target=self._heartbeat, daemon=True).start()
+        return True
+
+    def _heartbeat(self):
+        while not self._stop.wait(LOCK_TTL / 3):
+            try:
+                if not self._refresh(keys=[self.key], args=[self.owner, LOCK_TTL]):
+                    self.lost.set()
+                    return
+            except Exception as e:
+                print(f"Regrade lock heartbeat failed: {e}")
+
+    def release(self):
+        self._stop.set()
+        try:
+            self._refresh(keys=[self.key], args=[self.owner, 0])
+        except Exception as e:
+            print(f"Regrade lock release failed: {e}")
+
+
+def finish(redis_conn, job_id, challenge_id, status="completed", error=None):
+    fields = {"status": status, "finished_at": time.time()}
+    if error:
+        fields["error"] = error
+    pipe = redis_conn.pipeline()
+    pipe.hset(job_key(job_id), mapping=fields)
+    pipe.delete(active_key(challenge_id))
+    pipe.execute()
@@ -0,0 +1,143 @@
+# result_cache.py
+# Content-addressed cache for code execution results.
+#
+# Key = sha256(normalized source, language_id, canonical test-case JSON, function name, executor version).
+# The worker writes finished, deterministic reports (sync Redis); /api/v1/execute
+# looks them up (async Redis) and answers a hit without queueing a task.
+#
+# Memory is bounded two ways: every entry has a TTL, and a running byte counter
+# evicts the oldest entries once EXEC_CACHE_MAX_BYTES is exceeded.
+import os
+import json
+import time
+import hashlib
+from dotenv import load_dotenv
+from executors import EXECUTOR_BACKEND, EXECUTOR_VERSION
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+CACHE_ENABLED = os.getenv("EXEC_CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL = int(os.getenv("EXEC_CACHE_TTL", 3600))                              # seconds
+CACHE_MAX_BYTES = int(os.getenv("EXEC_CACHE_MAX_BYTES", 64 * 1024 * 1024))      # whole cache
+CACHE_MAX_ENTRY_BYTES = int(os.getenv("EXEC_CACHE_MAX_ENTRY_BYTES", 256 * 1024)) # single report
+
+PREFIX = "exec_cache:"
+INDEX_KEY = PREFIX + "index"    # ZSET  key -> stored_at
+SIZES_KEY = PREFIX + "sizes"    # HASH  key -> bytes
+BYTES_KEY = PREFIX + "bytes"    # INT   total bytes tracked
+HITS_KEY = PREFIX + "hits"
+MISSES_KEY = PREFIX + "misses"
+
+
+def normalize_source(source_code):
+    """Line endings + trailing whitespace don't change behaviour, so they don't change the key."""
+    lines = (source_code or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def cache_key(source_code, language_id, test_cases, function_name=None):
+    if isinstance(test_cases, str):
+        try: test_cases = json.loads(test_cases)
+        except ValueError: pass
+    material = json.dumps({
+        "src": normalize_source(source_code),
+        "lang": int(language_id),
+        "cases": test_cases,
+        "executor": f"{EXECUTOR_BACKEND}:{EXECUTOR_VERSION}",
+        "fn": function_name,
+    }, sort_keys=True, separators=(",", ":"))
+    return PREFIX + hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(result):
+    """Only cache outcomes that are a pure function of the code: full pass/fail reports and compile errors.
+    Runtime errors / timeouts can be infrastructure flakes, so they are always re-run."""
+    if not isinstance(result, dict):
+        return False
+    if result.get("status") == "compilation_error":
+        return True
+    if result.get("status") != "success":
+        return False
+    report = result.get("data") or {}
+    if report.get("error"):
+        return False
+    return all(r.get("status") in ("Passed", "Failed") for r in report.get("results", []))
+
+
+# --- 🔄 WORKER SIDE (sync redis) ---
+def store(redis_conn, key, result):
+    if not CACHE_ENABLED or not is_cacheable(result):
+        return False
+    blob = json.dumps(result)
+    size = len(blob)
+    if size > CACHE_MAX_ENTRY_BYTES:
+        return False
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.set(key, blob, ex=CACHE_TTL)
+        pipe.zadd(INDEX_KEY, {key: time.time()})
+        pipe.hset(SIZES_KEY, key, size)
+        pipe.incrby(BYTES_KEY, size)
+        pipe.execute()
+        evict(redis_conn)
+        return True
+    except Exception as e:
+        print(f"Exec cache store failed (ignored): {e}")
+        return False
+
+
+def _forget(redis_conn, keys):
+    if not keys: return
+    sizes = redis_conn.hmget(SIZES_KEY, keys)
+    pipe = redis_conn.pipeline()
+    pipe.delete(*keys)
+    pipe.zrem(INDEX_KEY, *keys)
+    pipe.hdel(SIZES_KEY, *keys)
+    pipe.decrby(BYTES_KEY, sum(int(s or 0) for s in sizes))
+    pipe.execute()
+
+
+def evict(redis_conn):
+    """Drops accounting for TTL-expired entries, then oldest entries until under the byte cap."""
+    expired = redis_conn.zrangebyscore(INDEX_KEY, "-inf", time.time() - CACHE_TTL)
+    _forget(redis_conn, expired)
+    while int(redis_conn.get(BYTES_KEY) or 0) > CACHE_MAX_BYTES:
+        oldest = [k for k, _ in redis_conn.zpopmin(INDEX_KEY, 16)]
+        if not oldest:
+            redis_conn.set(BYTES_KEY, 0)
+            break
+        _forget(redis_conn, oldest)
+
+
+# --- 🚀 API SIDE (async redis) ---
+async def lookup(redis_conn, key):
+    """Returns the cached result dict or None. Counts hits/misses."""
+    if not CACHE_ENABLED:
+        return None
+    try:
+        blob = await redis_conn.get(key)
+        await redis_conn.incr(HITS_KEY if blob else MISSES_KEY)
+        return json.loads(blob) if blob else None
+    except Exception as e:
+        print(f"Exec cache lookup failed (ignored): {e}")
+        return None
+
+
+async def stats(redis_conn):
+    hits, misses, total_bytes, entries = (
+        int(await redis_conn.get(HITS_KEY) or 0),
+        int(await redis_conn.get(MISSES_KEY) or 0),
+        int(await redis_conn.get(BYTES_KEY) or 0),
+        await redis_conn.zcard(INDEX_KEY),
+    )
+    lookups = hits + misses
+    return {
+        "enabled": CACHE_ENABLED,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "entries": entries,
+        "bytes": total_bytes,
+        "max_bytes": CACHE_MAX_BYTES,
+        "ttl_seconds": CACHE_TTL,
+    }
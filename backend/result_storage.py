@@ -0,0 +1,131 @@
+# result_storage.py
+# Keeps execution results in the Celery result backend small and short-lived.
+#
+# 1. Compaction: every input/expected/actual/error string in a report (and a compile error's
+#    output) is cut to RESULT_MAX_FIELD_CHARS. The case gets a "truncated" entry with the full
+#    value's length and sha256, so two long outputs can still be told apart. Grading always
+#    runs on the full strings; only what is stored/returned is cut.
+# 2. Compression: a compacted result whose JSON is larger than RESULT_COMPRESS_MIN_BYTES is stored
+#    as {"status": ..., "encoding": "zlib+base64", "payload": ...}. Top-level fields other than
+#    the report stay readable (single_flight.py checks "status"); `unpack` restores the report.
+# 3. Expiry: results live RESULT_TTL seconds (celery_config.result_expires, async_worker).
+# 4. Eviction (worker.evict_results_task, Celery beat): results stored without a TTL get one,
+#    and while results use more than RESULT_MAX_TOTAL_BYTES the ones closest to expiry go first.
+import os
+import json
+import zlib
+import base64
+import hashlib
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+MAX_FIELD_CHARS = int(os.getenv("RESULT_MAX_FIELD_CHARS", 4096))
+COMPRESS_MIN_BYTES = int(os.getenv("RESULT_COMPRESS_MIN_BYTES", 16 * 1024))
+RESULT_TTL = int(os.getenv("RESULT_TTL", 6 * 3600))                               # seconds
+MAX_TOTAL_BYTES = int(os.getenv("RESULT_MAX_TOTAL_BYTES", 256 * 1024 * 1024))     # all stored results
+EVICT_INTERVAL = int(os.getenv("RESULT_EVICT_INTERVAL", 600))                      # seconds between eviction runs
+
+CELERY_RESULT_PREFIX = "celery-task-meta-"
+ENCODING = "zlib+base64"
+CASE_FIELDS = ("input", "expected", "actual", "error")
+SCAN_BATCH = 1000
+
+
+def _cut(value):
+    """(shown value, None) or (head, {"length", "sha256"}) for strings over the limit."""
+    if not isinstance(value, str) or len(value) <= MAX_FIELD_CHARS:
+        return value, None
+    full = {"length": len(value), "sha256": hashlib.sha256(value.encode("utf-8", "replace")).hexdigest()}
+    return value[:MAX_FIELD_CHARS], full
+
+
+def compact(result):
+    """Copy of `result` with long strings cut (see the notes at the top). Non-report results pass through."""
+    if not isinstance(result, dict):
+        return result
+    out = dict(result)
+    if isinstance(out.get("output"), str):
+        out["output"], full = _cut(out["output"])
+        if full: out["truncated"] = {"output": full}
+
+    data = out.get("data")
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        cases = []
+        for case in data["results"]:
+            case, cut = dict(case), {}
+            for field in CASE_FIELDS:
+                if field in case:
+                    case[field], full = _cut(case[field])
+                    if full: cut[field] = full
+            if cut:
+                case["truncated"] = cut
+            cases.append(case)
+        out["data"] = {**data, "results": cases}
+    return out
+
+
+def pack(result):
+    """Compacts, then compresses when still large. This is what tasks return / store."""
+    result = compact(result)
+    if not isinstance(result, dict):
+        return result
+    blob = json.dumps(result, separators=(",", ":")).encode("utf-8")
+    if len(blob) < COMPRESS_MIN_BYTES:
+        return result
+    envelope = {k: v for k, v in result.items() if k not in ("data", "output", "truncated")}
+    envelope.update(encoding=ENCODING, payload=base64.b64encode(zlib.compress(blob, 6)).decode("ascii"))
+    return envelope
+
+
+def unpack(result):
+    """Inverse of `pack` (plain results are returned unchanged)."""
+    if isinstance(result, dict) and result.get("encoding") == ENCODING:
+        return json.loads(zlib.decompress(base64.b64decode(result["payload"])))
+    return result
+
+
+# --- 🔄 WORKER SIDE (sync redis) ---
+def evict(redis_conn):
+    """
+    One eviction pass over stored Celery results. Returns {"scanned", "expiry_set", "evicted", "bytes"}.
+    """
+    entries, expiry_set = [], 0
+    batch = []
+
+    def flush():
+        nonlocal expiry_set
+        pipe = redis_conn.pipeline()
+        for key in batch:
+            pipe.ttl(key)
+            pipe.strlen(key)
+        raw = pipe.execute()
+        fix = redis_conn.pipeline()
+        for i, key in enumerate(batch):
+            ttl, size = raw[2 * i], raw[2 * i + 1]
+            if ttl == -1:
+                fix.expire(key, RESULT_TTL)
+                ttl, expiry_set = RESULT_TTL, expiry_set + 1
+            if ttl >= 0:
+                entries.append((ttl, size, key))
+        fix.execute()
+        batch.clear()
+
+    for key in redis_conn.scan_iter(match=CELERY_RESULT_PREFIX + "*", count=SCAN_BATCH):
+        batch.append(key)
+        if len(batch) >= SCAN_BATCH:
+            flush()
+    if batch:
+        flush()
+
+    total = sum(size for _, size, _ in entries)
+    evicted = []
+    if total > MAX_TOTAL_BYTES:
+        for ttl, size, key in sorted(entries):
+            if total <= MAX_TOTAL_BYTES:
+                break
+            evicted.append(key)
+            total -= size
+        for i in range(0, len(evicted), 500):
+            redis_conn.delete(*evicted[i:i + 500])
+    return {"scanned": len(entries), "expiry_set": expiry_set, "evicted": len(evicted), "bytes": total}
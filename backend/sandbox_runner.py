@@ -0,0 +1,205 @@
+# sandbox_runner.py
+# Single-use job runner for the local executor (see executors.LocalExecutor).
+#
+# The executor pre-spawns a handful of these processes so the interpreter is
+# already warm when a submission arrives. Each runner blocks on stdin for ONE
+# JSON job, compiles/runs it under rlimits in a throwaway directory, prints ONE
+# JSON result line and exits. A fresh runner is spawned to replace it.
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import resource
+import tempfile
+import threading
+import subprocess
+
+# Hard cap on captured stdout/stderr per process (bytes). Anything above is dropped.
+MAX_OUTPUT_BYTES = 1024 * 1024
+
+
+def _set_no_new_privs():
+    """PR_SET_NO_NEW_PRIVS so setuid binaries can't escalate (Linux only)."""
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        PR_SET_NO_NEW_PRIVS = 38
+        libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0)
+    except Exception:
+        pass
+
+
+def _apply_seccomp():
+    """Optional seccomp filter: allow everything except networking / tracing / mounts.
+    Only active when the `seccomp` (libseccomp) Python binding is installed."""
+    try:
+        import seccomp
+    except ImportError:
+        return
+    try:
+        f = seccomp.SyscallFilter(defaction=seccomp.ALLOW)
+        for name in ("socket", "socketpair", "connect", "bind", "listen", "accept", "accept4",
+                     "ptrace", "mount", "umount2", "setns", "reboot", "kexec_load"):
+            try:
+                f.add_rule(seccomp.ERRNO(1), name)
+            except Exception:
+                pass
+        f.load()
+    except Exception:
+        pass
+
+
+def _make_preexec(limits, sandboxed):
+    """Builds the preexec_fn that runs in the child between fork() and exec()."""
+    def preexec():
+        os.setsid()  # own process group so wall-clock kill takes out grandchildren too
+        cpu = limits.get("cpu_seconds")
+        if cpu:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        mem = limits.get("memory_bytes")
+        if mem:
+            resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+        nproc = limits.get("max_processes")
+        if nproc:
+            resource.setrlimit(resource.RLIMIT_NPROC, (nproc, nproc))
+        fsize = limits.get("file_bytes")
+        if fsize:
+            resource.setrlimit(resource.RLIMIT_FSIZE, (fsize, fsize))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        if sandboxed:
+            _set_no_new_privs()
+            _apply_seccomp()
+    return preexec
+
+
+def _drain(stream, sink):
+    """Reads a pipe to EOF, keeping at most MAX_OUTPUT_BYTES."""
+    size = 0
+    while True:
+        chunk = stream.read(65536)
+        if not chunk:
+            break
+        if size < MAX_OUTPUT_BYTES:
+            sink.append(chunk[:MAX_OUTPUT_BYTES - size])
+            size += len(chunk)
+    stream.close()
+
+
+def run_process(cmd, cwd, stdin_text, limits, sandboxed):
+    """
+    Runs one command with rlimits + wall-clock kill.
+    Returns dict(exit_code, signal, stdout, stderr, timed_out, time, memory_kb).
+    """
+    wall = limits.get("wall_seconds", 10)
+    started = time.time()
+
+    proc = subprocess.Popen(
+        cmd, cwd=cwd,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        preexec_fn=_make_preexec(limits, sandboxed),
+        env={"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "HOME": cwd, "LANG": "C.UTF-8"},
+    )
+
+    timed_out = threading.Event()
+
+    def _kill():
+        timed_out.set()
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    timer = threading.Timer(wall, _kill)
+    timer.start()
+
+    out, err = [], []
+    readers = [
+        threading.Thread(target=_drain, args=(proc.stdout, out), daemon=True),
+        threading.Thread(target=_drain, args=(proc.stderr, err), daemon=True),
+    ]
+    for r in readers: r.start()
+
+    try:
+        if stdin_text:
+            proc.stdin.write(stdin_text.encode("utf-8"))
+        proc.stdin.close()
+    except (BrokenPipeError, OSError):
+        pass
+
+    # wait4 gives us the child's own rusage (CPU + peak RSS), not the runner's.
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    timer.cancel()
+    for r in readers: r.join(timeout=1)
+
+    # Sweep any stragglers left in the process group.
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+    return {
+        "exit_code": proc.returncode if proc.returncode >= 0 else None,
+        "signal": -proc.returncode if proc.returncode < 0 else None,
+        "stdout": b"".join(out).decode("utf-8", "replace"),
+        "stderr": b"".join(err).decode("utf-8", "replace"),
+        "timed_out": timed_out.is_set(),
+        "time": round(usage.ru_utime + usage.ru_stime, 3),
+        "wall_time": round(time.time() - started, 3),
+        "memory_kb": usage.ru_maxrss,
+    }
+
+
+def run_job(job):
+    """
+    job = {
+        "files": {"main.cpp": "..."},
+        "compile": ["g++", ...] | None,
+        "run": ["./main"],
+        "stdin": "...",               # or "stdins": [...] to run the compiled program once per input
+        "limits": {...}, "compile_limits": {...},
+        "sandboxed": true
+    }
+    """
+    workdir = tempfile.mkdtemp(prefix="sbx_")
+    try:
+        for name, content in job.get("files", {}).items():
+            with open(os.path.join(workdir, name), "w", encoding="utf-8") as f:
+                f.write(content)
+
+        sandboxed = job.get("sandboxed", True)
+        result = {"compile": None}
+
+        if job.get("compile"):
+            comp = run_process(job["compile"], workdir, "", job.get("compile_limits", {}), sandboxed=False)
+            result["compile"] = comp
+            if comp["timed_out"] or comp["exit_code"] != 0:
+                return result
+
+        # Compile-once, run-many: same binary against every stdin in "stdins"
+        if "stdins" in job:
+            result["runs"] = [run_process(job["run"], workdir, inp, job.get("limits", {}), sandboxed) for inp in job["stdins"]]
+            return result
+
+        result["run"] = run_process(job["run"], workdir, job.get("stdin", ""), job.get("limits", {}), sandboxed)
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    line = sys.stdin.readline()
+    if not line:
+        return
+    try:
+        result = run_job(json.loads(line))
+    except Exception as e:
+        result = {"internal_error": str(e)}
+    sys.stdout.write(json.dumps(result) + "\n")
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
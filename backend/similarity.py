@@ -0,0 +1,210 @@
+# similarity.py
+# Near-duplicate detection over saved solutions (ChallengeProgress.user_code).
+#
+# Every solution is reduced to a MinHash signature of its normalized token shingles
+# (comments dropped, identifiers/strings/numbers collapsed, so renaming variables doesn't help),
+# and the signature is split into LSH bands. Two solutions sharing any band bucket are
+# candidates; only candidates are compared, so finding clusters is ~linear in the number of
+# solutions instead of O(n^2) source comparisons.
+#
+# Redis layout per scope (e.g. "challenge:12"):
+#   simidx:<scope>:sig               HASH   member -> comma-separated signature
+#   simidx:<scope>:band:<b>:<hash>   SET    members in that bucket
+#   simidx:<scope>:buckets           SET    bucket keys (to enumerate them)
+# Solutions are indexed as they are saved (worker.record_solution); `python similarity.py`
+# or worker.rebuild_similarity_task rebuilds a scope from the database.
+import os
+import re
+import sys
+import random
+import hashlib
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+SHINGLE_SIZE = int(os.getenv("SIMILARITY_SHINGLE_SIZE", 5))   # tokens per shingle
+BANDS = int(os.getenv("SIMILARITY_BANDS", 16))
+ROWS = int(os.getenv("SIMILARITY_ROWS", 4))                   # BANDS * ROWS = signature length
+DEFAULT_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", 0.8))
+MAX_PAIRS = int(os.getenv("SIMILARITY_MAX_PAIRS", 50))        # most similar pairs listed per cluster
+
+NUM_PERM = BANDS * ROWS
+PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1729)  # fixed seed: signatures must be comparable across processes/restarts
+PERMUTATIONS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(NUM_PERM)]
+
+PREFIX = "simidx:"
+
+KEYWORDS = set("""
+and as assert async await break case catch char class const continue def default del do double elif else
+enum except extends false final finally float for from function global if implements import in instanceof
+int interface is lambda let long new none nonlocal not null or pass private protected public raise return
+short static string struct super switch this throw throws true try var vector void while with yield
+include using namespace std cout cin endl auto bool print println system out len range self
+""".split())
+
+COMMENT_RE = re.compile(r"/\*.*?\*/|//[^\n]*|#[^\n]*", re.DOTALL)
+TOKEN_RE = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|[A-Za-z_]\w*|\d+(?:\.\d+)?|[^\s\w]")
+
+
+def scope_for_challenge(challenge_id):
+    return f"challenge:{challenge_id}"
+
+
+def tokens(source_code):
+    """Comment-free token stream with identifiers -> I, literals -> S/N; keywords and operators kept."""
+    out = []
+    for tok in TOKEN_RE.findall(COMMENT_RE.sub(" ", source_code or "")):
+        if tok[0] in "\"'":
+            out.append("S")
+        elif tok[0].isdigit():
+            out.append("N")
+        elif tok[0].isalpha() or tok[0] == "_":
+            out.append(tok.lower() if tok.lower() in KEYWORDS else "I")
+        else:
+            out.append(tok)
+    return out
+
+
+def shingles(source_code):
+    toks = tokens(source_code)
+    if len(toks) < SHINGLE_SIZE:
+        toks = toks + [""] * (SHINGLE_SIZE - len(toks))
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(toks[i:i + SHINGLE_SIZE]).encode(), digest_size=4).digest(), "big")
+        for i in range(len(toks) - SHINGLE_SIZE + 1)
+    }
+
+
+def signature(source_code):
+    hashes = shingles(source_code)
+    return [min(((a * h + b) % PRIME) & MAX_HASH for h in hashes) for a, b in PERMUTATIONS]
+
+
+def estimate(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def band_keys(scope, sig):
+    keys = []
+    for b in range(BANDS):
+        band = ",".join(str(v) for v in sig[b * ROWS:(b + 1) * ROWS])
+        keys.append(f"{PREFIX}{scope}:band:{b}:{hashlib.blake2b(band.encode(), digest_size=8).hexdigest()}")
+    return keys
+
+
+# KEYS: buckets set, then the member's old band keys   ARGV: member
+# Leaves the member's old buckets; a bucket left empty also leaves the :buckets set
+UNINDEX_LUA = """
+for i = 2, #KEYS do
+    redis.call('SREM', KEYS[i], ARGV[1])
+    if redis.call('SCARD', KEYS[i]) == 0 then
+        redis.call('SREM', KEYS[1], KEYS[i])
+    end
+end
+return 1
+"""
+
+
+def _sig_key(scope): return f"{PREFIX}{scope}:sig"
+def _buckets_key(scope): return f"{PREFIX}{scope}:buckets"
+def _encode(sig): return ",".join(str(v) for v in sig)
+def _decode(raw): return [int(v) for v in raw.split(",")]
+
+
+def clusters(signatures, buckets, threshold=DEFAULT_THRESHOLD):
+    """
+    Groups members whose estimated similarity >= threshold (union-find over LSH candidate pairs).
+    `signatures`: {member: sig}, `buckets`: iterable of member lists. Largest clusters first.
+    """
+    parent = {}
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    scores, seen = {}, set()
+    for members in buckets:
+        members = sorted(m for m in members if m in signatures)
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if (a, b) in seen: continue
+                seen.add((a, b))
+                score = estimate(signatures[a], signatures[b])
+                if score >= threshold:
+                    scores[(a, b)] = score
+                    parent[find(a)] = find(b)
+
+    groups = {}
+    for a, b in scores:
+        groups.setdefault(find(a), set()).update((a, b))
+    result = []
+    for members in groups.values():
+        pairs = sorted(({"a": a, "b": b, "similarity": round(s, 3)} for (a, b), s in scores.items() if a in members), key=lambda p: -p["similarity"])
+        result.append({"members": sorted(members), "max_similarity": pairs[0]["similarity"], "pairs": pairs[:MAX_PAIRS]})
+    return sorted(result, key=lambda c: (-len(c["members"]), -c["max_similarity"]))
+
+
+# --- 🔄 WORKER SIDE (sync redis) ---
+def index(redis_conn, scope, member, source_code):
+    """(Re)indexes one member's solution; its previous buckets are dropped first."""
+    member = str(member)
+    old = redis_conn.hget(_sig_key(scope), member)
+    sig = signature(source_code)
+    new_keys = band_keys(scope, sig)
+    if old:
+        stale = [key for key in band_keys(scope, _decode(old)) if key not in new_keys]
+        if stale:
+            redis_conn.register_script(UNINDEX_LUA)(keys=[_buckets_key(scope), *stale], args=[member])
+    pipe = redis_conn.pipeline()
+    pipe.hset(_sig_key(scope), member, _encode(sig))
+    for key in new_keys:
+        pipe.sadd(key, member)
+    pipe.sadd(_buckets_key(scope), *new_keys)
+    pipe.execute()
+
+
+def clear(redis_conn, scope):
+    bucket_keys = list(redis_conn.smembers(_buckets_key(scope)))
+    for i in range(0, len(bucket_keys), 500):
+        redis_conn.delete(*bucket_keys[i:i + 500])
+    redis_conn.delete(_sig_key(scope), _buckets_key(scope))
+
+
+def rebuild(redis_conn, scope, rows):
+    """Offline rebuild from (member, source_code) rows. Returns the number indexed."""
+    clear(redis_conn, scope)
+    count = 0
+    for member, source_code in rows:
+        if source_code:
+            index(redis_conn, scope, member, source_code)
+            count += 1
+    return count
+
+
+# --- 🚀 API SIDE (async redis) ---
+async def find_clusters(redis_conn, scope, threshold=DEFAULT_THRESHOLD):
+    raw = await redis_conn.hgetall(_sig_key(scope))
+    signatures = {member: _decode(sig) for member, sig in raw.items()}
+    bucket_keys = list(await redis_conn.smembers(_buckets_key(scope)))
+    pipe = redis_conn.pipeline()
+    for key in bucket_keys:
+        pipe.smembers(key)
+    buckets = [m for m in await pipe.execute() if len(m) > 1]
+    return {"indexed": len(signatures), "clusters": clusters(signatures, buckets, threshold)}
+
+
+# Offline batch: python similarity.py [challenge_id ...]   (all challenges when none given)
+if __name__ == "__main__":
+    from sqlalchemy import text
+    from database import get_sync_engine
+    from celery_config import redis_sync
+
+    with get_sync_engine().connect() as conn:
+        ids = [int(a) for a in sys.argv[1:]] or [r[0] for r in conn.execute(text("SELECT id FROM course_challenges"))]
+        for cid in ids:
+            rows = conn.execute(text("SELECT user_id, user_code FROM challenge_progress WHERE challenge_id = :cid AND user_code IS NOT NULL"), {"cid": cid}).fetchall()
+            print(f"Challenge {cid}: indexed {rebuild(redis_sync, scope_for_challenge(cid), rows)} solutions")
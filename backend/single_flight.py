@@ -0,0 +1,80 @@
+# single_flight.py
+# Coalesces identical /api/v1/execute calls (double clicks, client retries) onto one task.
+#
+# Key = requester + result_cache key (source, language, cases, function, executor version).
+# The first caller reserves the key with SET NX for EXEC_DEDUPE_TTL seconds and queues the
+# task under a pre-generated id; everyone else with the same key gets that task id back.
+# A finished task that didn't produce a gradeable report (error, failure) is not reused,
+# so a deliberate retry after an infrastructure error still runs again.
+import os
+import json
+import hashlib
+from dotenv import load_dotenv
+load_dotenv()
+
+# ✅ LOAD CONFIGURATION
+DEDUPE_ENABLED = os.getenv("EXEC_DEDUPE_ENABLED", "true").lower() == "true"
+DEDUPE_TTL = int(os.getenv("EXEC_DEDUPE_TTL", 30))   # seconds
+
+PREFIX = "exec_inflight:"
+CELERY_RESULT_PREFIX = "celery-task-meta-"
+REUSABLE_RESULT_STATUSES = ("success", "compilation_error")
+
+
+def flight_key(requester, cache_key):
+    return PREFIX + hashlib.sha256(f"{requester}|{cache_key}".encode("utf-8")).hexdigest()
+
+
+async def _reusable(redis_conn, task_id):
+    """Queued/running tasks and tasks with a real report can be shared; failed ones can't."""
+    meta = await redis_conn.get(CELERY_RESULT_PREFIX + task_id)
+    if not meta:
+        return True
+    meta = json.loads(meta)
+    if meta.get("status") != "SUCCESS":
+        return meta.get("status") in ("PENDING", "STARTED", "RETRY")
+    return (meta.get("result") or {}).get("status") in REUSABLE_RESULT_STATUSES
+
+
+async def existing_task(redis_conn, key):
+    """Task id already handling this exact request, or None."""
+    if not DEDUPE_ENABLED:
+        return None
+    try:
+        task_id = await redis_conn.get(key)
+        if task_id and await _reusable(redis_conn, task_id):
+            return task_id
+    except Exception as e:
+        print(f"Single-flight lookup failed (ignored): {e}")
+    return None
+
+
+async def reserve(redis_conn, key, task_id):
+    """
+    Claims the key for `task_id`. Returns None when we own it (go ahead and queue),
+    otherwise the id of the task that won the race.
+    """
+    if not DEDUPE_ENABLED:
+        return None
+    try:
+        if await redis_conn.set(key, task_id, nx=True, ex=DEDUPE_TTL):
+            return None
+        winner = await redis_conn.get(key)
+        if winner and await _reusable(redis_conn, winner):
+            return winner
+        # Stale claim from a failed task: take it over
+        await redis_conn.set(key, task_id, ex=DEDUPE_TTL)
+    except Exception as e:
+        print(f"Single-flight reserve failed (ignored): {e}")
+    return None
+
+
+async def release(redis_conn, key, task_id):
+    """Drops our claim (e.g. the task could not be queued)."""
+    if not DEDUPE_ENABLED:
+        return
+    try:
+        if await redis_conn.get(key) == task_id:
+            await redis_conn.delete(key)
+    except Exception:
+        pass
@@ -2,7 +2,16 @@
 
 # 1. Start the Celery Worker in the background (&)
 # We use 'nohup' to keep it running
-nohup celery -A main.celery_app worker --pool=gevent --concurrency=20 --loglevel=info &
+# Shared worker: exam lane first, then practice (queue_order_strategy=priority in celery_config)
+nohup celery -A main.celery_app worker --pool=gevent --concurrency=20 -Q execution_exam,celery,execution --loglevel=info -n shared@%h &
+
+# Reserved exam capacity: only ever takes exam runs, so practice floods can't starve it
+nohup celery -A main.celery_app worker --pool=gevent --concurrency=${EXAM_WORKER_CONCURRENCY:-10} -Q execution_exam --loglevel=info -n exam@%h &
+
+# (Optional) asyncio execution worker: many hundreds of concurrent Judge0 waits in one process.
+# It reads the same 'execution' queue, so it can run next to (or instead of) the Celery worker.
+# nohup python async_worker.py &
+# ASYNC_WORKER_QUEUE=execution_exam nohup python async_worker.py &   # async worker for the exam lane
 
 # 2. Start a dummy web server to satisfy Render's port requirement
 # This simply listens on the port Render assigns ($PORT)
@@ -0,0 +1,6 @@
+# Backend modules are flat (imported as `import grading`), so make backend/ importable
+# whichever directory pytest is started from.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
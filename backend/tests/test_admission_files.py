@@ -0,0 +1,49 @@
+import pytest
+
+import admission_files
+from admission_files import CSV, RosterError
+
+
+def roster(tmp_path, text):
+    path = tmp_path / "roster.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_kind_for():
+    assert admission_files.kind_for("Class.CSV") == CSV
+    assert admission_files.kind_for("class.xlsx") == admission_files.XLSX
+    with pytest.raises(RosterError):
+        admission_files.kind_for("class.pdf")
+
+
+def test_header_needs_an_email_column(tmp_path):
+    with pytest.raises(RosterError):
+        admission_files.check(roster(tmp_path, "name\nAda\n"), CSV)
+    admission_files.check(roster(tmp_path, "\ufeffName, EMAIL \nAda,ada@x.io\n"), CSV)
+
+
+def test_batches_dedupe_skip_and_ignore_blank_lines(tmp_path):
+    path = roster(tmp_path, "email,name\n"
+                            "ada@x.io,Ada\n"
+                            "ada@x.io,Second Ada\n"
+                            "\n"
+                            ",,\n"
+                            "not an email,Bob\n"
+                            " grace@x.io ,\n")
+    assert list(admission_files.batches(path, CSV)) == [
+        ([("ada@x.io", "Ada"), ("grace@x.io", admission_files.DEFAULT_NAME)], 1)
+    ]
+
+
+def test_batches_split_every_batch_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(admission_files, "BATCH_ROWS", 2)
+    path = roster(tmp_path, "email\na@x.io\nb@x.io\nc@x.io\n")
+    assert list(admission_files.batches(path, CSV)) == [
+        ([("a@x.io", "Student"), ("b@x.io", "Student")], 0),
+        ([("c@x.io", "Student")], 0),
+    ]
+
+
+def test_header_only_file_yields_nothing(tmp_path):
+    assert list(admission_files.batches(roster(tmp_path, "email,name\n"), CSV)) == []
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import pytest
+
+import challenge_cases
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")   # fakeredis needs it for the publish script
+
+
+@pytest.fixture
+def redis_conn():
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_publish_points_current_at_the_snapshot(redis_conn):
+    async def scenario():
+        assert await challenge_cases.publish(redis_conn, 7, 1, "[]", "solve")
+        assert await challenge_cases.current_version(redis_conn, 7) == 1
+        return json.loads(await redis_conn.get(challenge_cases.snapshot_key(7, 1)))
+    assert run(scenario()) == {"test_cases": "[]", "function_name": "solve"}
+
+
+def test_publish_older_than_the_invalidation_is_refused(redis_conn):
+    async def scenario():
+        await challenge_cases.publish(redis_conn, 7, 1, "[1]")
+        await challenge_cases.invalidate(redis_conn, 7, version=2)
+        assert await challenge_cases.current_version(redis_conn, 7) is None
+        # A request that read v1 before the update committed
+        assert not await challenge_cases.publish(redis_conn, 7, 1, "[1]")
+        assert await challenge_cases.current_version(redis_conn, 7) is None
+        assert await challenge_cases.publish(redis_conn, 7, 2, "[2]")
+        return await challenge_cases.current_version(redis_conn, 7)
+    assert run(scenario()) == 2
+
+
+def test_resolve_prefers_redis_then_the_lru(redis_conn, monkeypatch):
+    monkeypatch.setattr(challenge_cases, "_lru", type(challenge_cases._lru)())
+    async def scenario():
+        await challenge_cases.publish(redis_conn, 9, 3, "[3]")
+        first = await challenge_cases.resolve_async(redis_conn, 9, 3)
+        await redis_conn.delete(challenge_cases.snapshot_key(9, 3))
+        return first, await challenge_cases.resolve_async(redis_conn, 9, 3)
+    first, cached = run(scenario())
+    assert first == cached == {"test_cases": "[3]", "function_name": None}
+
+
+def test_resolve_falls_back_to_the_database(redis_conn, monkeypatch):
+    monkeypatch.setattr(challenge_cases, "_lru", type(challenge_cases._lru)())
+    calls = []
+    def load_from_db(challenge_id, version):
+        calls.append((challenge_id, version))
+        return {"test_cases": "[db]", "function_name": None}
+    monkeypatch.setattr(challenge_cases, "load_from_db", load_from_db)
+    assert run(challenge_cases.resolve_async(redis_conn, 11, 4)) == {"test_cases": "[db]", "function_name": None}
+    assert calls == [(11, 4)]
@@ -0,0 +1,128 @@
+import base64
+import json
+import subprocess
+import sys
+
+import pytest
+
+from grading import (
+    PYTHON_STARTUP_SECONDS, build_python_driver, cases_stdin, grade_harness_result,
+    grade_python_result, grade_reported_cases, is_accepted, python_time_budget,
+)
+from harnesses import CASE_MARK, NO_FUNCTION_MARK
+
+
+def b64(text):
+    return base64.b64encode(text.encode()).decode()
+
+
+def harness_run(status_id, lines, stderr="", description=None):
+    return {
+        "status": {"id": status_id, "description": description},
+        "stdout": b64("".join(f"{CASE_MARK}{json.dumps(line)}\n" for line in lines)),
+        "stderr": b64(stderr) if stderr else None,
+    }
+
+
+CASES = [{"input": "1", "output": "1"}, {"input": "2", "output": "4"}, {"input": "3", "output": "9"}]
+
+
+# --- python_time_budget / driver ---
+def test_time_budget_leaves_startup_out():
+    assert python_time_budget(5) == round(5 - PYTHON_STARTUP_SECONDS, 3)
+    assert python_time_budget(0.2) == 0.1
+    assert python_time_budget(None) is None
+    assert python_time_budget(0) is None
+
+
+def run_driver(source, cases, **kwargs):
+    driver = build_python_driver(source, track_memory=False, **kwargs)
+    proc = subprocess.run([sys.executable, "-c", driver], input=cases_stdin(cases), capture_output=True, text=True, timeout=30)
+    return grade_python_result({"status": {"id": 3}, "stdout": b64(proc.stdout)}, cases)
+
+
+def test_driver_grades_on_the_server_side():
+    report = run_driver("def square(x):\n    return x * x if x != 3 else 0\n", CASES)
+    assert [r["status"] for r in report["data"]["results"]] == ["Passed", "Passed", "Failed"]
+    assert report["data"]["stats"]["passed"] == 2
+
+
+def test_driver_cuts_a_slow_case_at_the_cap():
+    source = "import time\ndef f(x):\n    if x == 2:\n        while True: pass\n    return x * x\n"
+    report = run_driver(source, CASES, case_timeout=0.3)
+    assert [r["status"] for r in report["data"]["results"]] == ["Passed", "Time Limit Exceeded", "Passed"]
+
+
+def test_driver_reports_cases_past_the_deadline_as_not_run():
+    source = "import time\ndef f(x):\n    time.sleep(0.4)\n    return x * x\n"
+    cases = [{"input": str(i), "output": str(i * i)} for i in range(1, 7)]
+    results = run_driver(source, cases, case_timeout=2, time_budget=1.0)["data"]["results"]
+    assert len(results) == len(cases)
+    assert results[0]["status"] == "Passed"
+    assert results[-1]["status"] == "Time Limit Exceeded"
+    assert results[-1]["error"].startswith("Not run")
+
+
+def test_second_result_report_is_rejected():
+    stdout = "---JSON_START---\n{}\n---JSON_END---\n" * 2
+    assert grade_python_result({"status": {"id": 3}, "stdout": b64(stdout)}, CASES)["status"] == "error"
+
+
+# --- grade_reported_cases ---
+def test_reported_cases_one_entry_per_case():
+    results = grade_reported_cases([{"id": 0, "actual": "1"}, {"id": 2, "error": "boom"}], CASES)
+    assert [r["status"] for r in results] == ["Passed", "Runtime Error", "Runtime Error"]
+    assert results[1]["error"] == "No result reported for this case."
+
+
+def test_reported_cases_keep_timeouts_and_metrics():
+    raw = [{"id": 0, "actual": "1", "runtime_ms": 1.5, "peak_memory_kb": 12},
+           {"id": 1, "status": "Time Limit Exceeded", "error": "Exceeded 2s"},
+           {"id": 2, "actual": " 9\n"}]
+    results = grade_reported_cases(raw, CASES)
+    assert results[0]["peak_memory_kb"] == 12 and results[0]["runtime_ms"] == 1.5
+    assert [r["status"] for r in results] == ["Passed", "Time Limit Exceeded", "Passed"]
+
+
+# --- grade_harness_result ---
+def test_harness_all_cases_accepted():
+    lines = [{"id": i, "actual": c["output"], "runtime_ms": 2} for i, c in enumerate(CASES)]
+    report = grade_harness_result(harness_run(3, lines), CASES)
+    assert report["status"] == "success"
+    assert report["data"]["stats"] == {"total": 3, "passed": 3, "runtime_ms": 6}
+    assert is_accepted(report, CASES)
+
+
+@pytest.mark.parametrize("status_id, verdict", [(5, "Time Limit Exceeded"), (11, "Runtime Error")])
+def test_harness_stopped_run_keeps_finished_cases(status_id, verdict):
+    report = grade_harness_result(harness_run(status_id, [{"id": 0, "actual": "1"}], stderr="Segmentation fault"), CASES)
+    results = report["data"]["results"]
+    assert [r["status"] for r in results] == ["Passed", verdict, verdict]
+    assert results[1]["error"] == "Segmentation fault"
+    assert results[2]["error"] == "Not run: the program stopped at case 2."
+    assert not is_accepted(report, CASES)
+
+
+def test_harness_stopped_before_any_case_uses_the_status_description():
+    results = grade_harness_result(harness_run(5, [], description="Time Limit Exceeded"), CASES)["data"]["results"]
+    assert [r["error"] for r in results] == ["Time Limit Exceeded"] + ["Not run: the program stopped at case 1."] * 2
+
+
+def test_harness_falls_back_when_it_does_not_fit():
+    assert grade_harness_result({"status": {"id": 6}, "compile_output": b64("no matching function")}, CASES) is None
+    assert grade_harness_result({"status": {"id": 3}, "stdout": b64(NO_FUNCTION_MARK + "\n")}, CASES) is None
+
+
+@pytest.mark.parametrize("ids", [[0, 1], [0, 0, 1], [0, 2, 1], [1, 2, 3], [None, 1, 2]])
+def test_harness_rejects_missing_duplicate_or_foreign_ids(ids):
+    assert grade_harness_result(harness_run(3, [{"id": i, "actual": "1"} for i in ids]), CASES) is None
+
+
+def test_harness_internal_error_is_a_runtime_error():
+    report = grade_harness_result({"status": {"id": 13}, "error": "sandbox down"}, CASES)
+    assert report == {"status": "runtime_error", "output": "sandbox down"}
+
+
+def test_harness_bad_runtime_values_count_as_zero():
+    lines = [{"id": 0, "actual": "1", "runtime_ms": "x"}, {"id": 1, "actual": "4"}, {"id": 2, "actual": "9", "runtime_ms": 1.25}]
+    assert grade_harness_result(harness_run(3, lines), CASES)["data"]["stats"]["runtime_ms"] == 1.25
@@ -0,0 +1,56 @@
+import base64
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from harnesses import CASE_MARK, CPP_LANGUAGE_ID, JAVA_LANGUAGE_ID, build_function_harness, harness_stdin
+
+CPP_FUNCTION = "int sq(int x) { return x * x; }\n"
+
+
+def test_no_harness_without_a_usable_function_name():
+    assert build_function_harness(CPP_FUNCTION, CPP_LANGUAGE_ID, None) is None
+    assert build_function_harness(CPP_FUNCTION, CPP_LANGUAGE_ID, "sq(); system") is None
+
+
+def test_no_harness_when_the_submission_has_its_own_main():
+    assert build_function_harness(CPP_FUNCTION + "int main() { return 0; }", CPP_LANGUAGE_ID, "sq") is None
+    java = "class Solution { public static void main(String[] a) {} }"
+    assert build_function_harness(java, JAVA_LANGUAGE_ID, "sq") is None
+
+
+def test_no_harness_for_other_languages():
+    assert build_function_harness("def sq(x): return x * x", 71, "sq") is None
+
+
+def test_cpp_targets_free_function_or_solution_member():
+    assert "&sq" in build_function_harness(CPP_FUNCTION, CPP_LANGUAGE_ID, "sq")
+    member = build_function_harness("class Solution { public: int sq(int x) { return x * x; } };", CPP_LANGUAGE_ID, "sq")
+    assert "&Solution::sq" in member
+
+
+def test_java_harness_owns_the_only_public_class():
+    source = "public class Solution {\n    public int sq(int x) { return x * x; }\n}\n"
+    harness = build_function_harness(source, JAVA_LANGUAGE_ID, "sq")
+    assert "public class Solution" not in harness
+    assert "public class Main" in harness
+    assert '"Solution"' in harness
+    assert build_function_harness("class Main { int sq(int x) { return x; } }", JAVA_LANGUAGE_ID, "sq") is None
+
+
+def test_stdin_is_one_base64_line_per_case():
+    lines = harness_stdin([{"input": "1 2"}, {"input": None}]).splitlines()
+    assert [base64.b64decode(line).decode() for line in lines] == ["1 2", ""]
+
+
+@pytest.mark.skipif(shutil.which("g++") is None, reason="g++ not installed")
+def test_cpp_harness_prints_one_line_per_case(tmp_path):
+    source = tmp_path / "main.cpp"
+    source.write_text(build_function_harness(CPP_FUNCTION, CPP_LANGUAGE_ID, "sq"))
+    binary = tmp_path / "main"
+    subprocess.run(["g++", "-O0", "-o", str(binary), str(source)], check=True, timeout=120)
+    out = subprocess.run([str(binary)], input=harness_stdin([{"input": "3"}, {"input": "-4"}]), capture_output=True, text=True, timeout=30).stdout
+    reports = [json.loads(line[len(CASE_MARK):]) for line in out.splitlines() if line.startswith(CASE_MARK)]
+    assert [(r["id"], r["actual"]) for r in reports] == [(0, "9"), (1, "16")]
@@ -0,0 +1,46 @@
+import hashlib
+
+import result_storage
+
+
+def report(actual, cases=1):
+    return {"status": "success", "data": {"stats": {"total": cases}, "results": [
+        {"id": i, "status": "Failed", "input": "1", "expected": "2", "actual": actual} for i in range(cases)
+    ]}}
+
+
+def test_compact_cuts_long_fields_and_fingerprints_them(monkeypatch):
+    monkeypatch.setattr(result_storage, "MAX_FIELD_CHARS", 8)
+    long = "x" * 20
+    case = result_storage.compact(report(long))["data"]["results"][0]
+    assert case["actual"] == "x" * 8 and case["expected"] == "2"
+    assert case["truncated"] == {"actual": {"length": 20, "sha256": hashlib.sha256(long.encode()).hexdigest()}}
+
+
+def test_compact_leaves_the_original_alone(monkeypatch):
+    monkeypatch.setattr(result_storage, "MAX_FIELD_CHARS", 8)
+    original = report("y" * 20)
+    result_storage.compact(original)
+    assert original["data"]["results"][0]["actual"] == "y" * 20
+
+
+def test_compact_cuts_compile_output(monkeypatch):
+    monkeypatch.setattr(result_storage, "MAX_FIELD_CHARS", 4)
+    out = result_storage.compact({"status": "compilation_error", "output": "error: boom"})
+    assert out["output"] == "erro" and out["truncated"]["output"]["length"] == 11
+    assert result_storage.compact("plain") == "plain"
+
+
+def test_small_results_are_stored_as_is():
+    small = report("3")
+    assert result_storage.pack(small) == small
+    assert result_storage.unpack(small) == small
+
+
+def test_large_results_round_trip_compressed(monkeypatch):
+    monkeypatch.setattr(result_storage, "COMPRESS_MIN_BYTES", 256)
+    big = report("z" * 100, cases=10)
+    packed = result_storage.pack(big)
+    assert packed["status"] == "success" and packed["encoding"] == result_storage.ENCODING
+    assert "data" not in packed
+    assert result_storage.unpack(packed) == big
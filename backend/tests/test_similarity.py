@@ -0,0 +1,69 @@
+import similarity
+
+BASE = """
+def total(values):
+    result = 0
+    for v in values:
+        if v > 0:
+            result += v * 2
+    return result
+"""
+RENAMED = """
+# same thing, other names
+def sum_up(items):
+    acc = 0
+    for item in items:
+        if item > 0:
+            acc += item * 2
+    return acc
+"""
+OTHER = """
+def search(arr, target):
+    lo, hi = 0, len(arr) - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if arr[mid] == target: return mid
+        if arr[mid] < target: lo = mid + 1
+        else: hi = mid - 1
+    return -1
+"""
+
+
+def test_signature_ignores_names_comments_and_literals():
+    assert similarity.signature(BASE) == similarity.signature(RENAMED)
+    assert similarity.signature('x = "a"  // note') == similarity.signature("y = 'bbb'")
+    assert len(similarity.signature(BASE)) == similarity.NUM_PERM
+
+
+def test_signature_handles_tiny_and_empty_sources():
+    assert len(similarity.signature("")) == similarity.NUM_PERM
+    assert len(similarity.signature("x")) == similarity.NUM_PERM
+
+
+def test_estimate_tells_unrelated_code_apart():
+    base, other = similarity.signature(BASE), similarity.signature(OTHER)
+    assert similarity.estimate(base, base) == 1.0
+    assert similarity.estimate(base, other) < 0.5
+
+
+def test_clusters_join_candidates_above_the_threshold():
+    sigs = {"a": [1, 2, 3, 4], "b": [1, 2, 3, 4], "c": [1, 2, 3, 9], "d": [7, 7, 7, 7]}
+    result = similarity.clusters(sigs, [["a", "b"], ["b", "c"], ["c", "d"]], threshold=0.75)
+    assert result == [{
+        "members": ["a", "b", "c"],
+        "max_similarity": 1.0,
+        "pairs": [{"a": "a", "b": "b", "similarity": 1.0}, {"a": "b", "b": "c", "similarity": 0.75}],
+    }]
+
+
+def test_clusters_only_compare_members_sharing_a_bucket():
+    sigs = {"a": [1, 1], "b": [1, 1]}
+    assert similarity.clusters(sigs, [["a"], ["b"]]) == []
+    # Members without a signature (removed since the bucket was read) are ignored
+    assert similarity.clusters(sigs, [["a", "gone"]]) == []
+
+
+def test_clusters_largest_first():
+    sigs = {m: [1] for m in "abc"} | {m: [2] for m in "xy"}
+    result = similarity.clusters(sigs, [["x", "y"], ["a", "b", "c"]])
+    assert [c["members"] for c in result] == [["a", "b", "c"], ["x", "y"]]
@@ -1,225 +1,318 @@
 # worker.py
 import os
-import requests
-import base64
 import json
 import time
-from celery_config import celery_app
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from celery_config import celery_app, redis_sync
 from dotenv import load_dotenv
 import backup_manager
+from executors import get_executor
+from grading import (
+    COMPILED_LANGUAGES, PYTHON_LANGUAGE_ID, no_progress, parse_test_cases,
+    build_python_driver, python_time_budget, cases_stdin, grade_python_result, grade_harness_result, grade_case_results,
+    is_accepted, redact_hidden,
+)
+from database import get_sync_engine
+from harnesses import build_function_harness, harness_stdin
+import result_cache
+import execution_events
+import challenge_cases
+import regrade
+import similarity
+import execution_lanes
+import result_storage
 load_dotenv()
 
 # ✅ LOAD CONFIGURATION
-API_KEY = os.getenv("JUDGE0_API_KEY")
-API_HOST = os.getenv("JUDGE0_API_HOST", "judge0-ce.p.rapidapi.com")
+BATCH_MODE = os.getenv("EXECUTION_BATCH_MODE", "true").lower() == "true"
+COMPILE_ONCE = os.getenv("EXECUTION_COMPILE_ONCE", "true").lower() == "true"
+REGRADE_CONCURRENCY = int(os.getenv("REGRADE_CONCURRENCY", 4))   # solutions graded at once per job
+REGRADE_PAGE_SIZE = int(os.getenv("REGRADE_PAGE_SIZE", 50))      # rows per checkpoint
 
-def encode_b64(text):
-    if not text: return ""
-    return base64.b64encode(text.encode('utf-8')).decode('utf-8')
+def execute_judge0(source_code, language_id, stdin):
+    """
+    Helper to run a single execution on the configured backend (Judge0 or local sandbox).
+    Always returns a Judge0-shaped response.
+    """
+    return get_executor().execute(source_code, language_id, stdin)
 
-def decode_b64(text):
-    if not text: return ""
-    try:
-        return base64.b64decode(text).decode('utf-8')
-    except:
-        return text
+def execute_judge0_batch(source_code, language_id, stdins):
+    """
+    Runs the same code against many stdins. With EXECUTION_BATCH_MODE on (default)
+    the executor fans the runs out concurrently (Judge0: /submissions/batch + token
+    polling) and stops at the first compilation error; otherwise runs one by one.
+    """
+    # Compiled languages: build once, run the binary against every case (EXECUTION_COMPILE_ONCE)
+    if COMPILE_ONCE and language_id in COMPILED_LANGUAGES:
+        return get_executor().execute_many(source_code, language_id, stdins)
+    if BATCH_MODE:
+        return get_executor().execute_batch(source_code, language_id, stdins)
 
-def execute_judge0(source_code, language_id, stdin):
+    results = []
+    for inp in stdins:
+        data = execute_judge0(source_code, language_id, inp)
+        results.append(data)
+        if data.get("status", {}).get("id") == 6: break
+    return results + [None] * (len(stdins) - len(results))
+
+def run_code(source_code, language_id, test_cases_json, progress=no_progress, function_name=None):
     """
-    Helper to run a single execution on Judge0
+    Grades one submission against its test cases. Returns the report dict the frontend expects.
+    `progress(stage, **fields)` is called along the way (see execution_events.py).
+    `function_name` (CourseChallenge.function_name) enables the Java/C++ function harness.
     """
-    url = f"https://{API_HOST}/submissions"
-    querystring = {"base64_encoded": "true", "wait": "true"}
-    
-    payload = {
-        "source_code": encode_b64(source_code),
-        "language_id": language_id,
-        "stdin": encode_b64(stdin)
-    }
-    
-    headers = {
-        "content-type": "application/json",
-        "X-RapidAPI-Key": API_KEY,
-        "X-RapidAPI-Host": API_HOST
-    }
-    
-    try:
-        response = requests.post(url, json=payload, headers=headers, params=querystring, timeout=10)
-        return response.json()
-    except Exception as e:
-        return {"error": str(e)}
 
-@celery_app.task(name="worker.run_code_task", bind=True)
-def run_code_task(self, source_code, language_id, test_cases_json):
+    executor = get_executor()
+    if not executor.is_configured():
+        return {"status": "error", "output": executor.config_error()}
     
-    if not API_KEY:
-        return {"status": "error", "output": "Server Config Error: JUDGE0_API_KEY is missing."}
+    # ⛔ Provider down (circuit open): fail fast instead of timing out case by case
+    unavailable = executor.unavailable_reason()
+    if unavailable:
+        return {"status": "error", "output": unavailable}
 
     # Parse Test Cases
-    try:
-        if isinstance(test_cases_json, str):
-            test_cases = json.loads(test_cases_json)
-        else:
-            test_cases = test_cases_json
-    except:
+    test_cases = parse_test_cases(test_cases_json)
+    if test_cases is None:
         return {"status": "error", "output": "Invalid Test Cases Format"}
 
-    results = []
     total_start = time.time()
     
-    # ---------------------------------------------------------
     # STRATEGY 1: PYTHON (Inject Driver Code - Fastest)
-    # ---------------------------------------------------------
-    if language_id == 71: 
-        driver_template = f"""
-import sys
-import json
-import time
-import inspect
-
-# --- USER CODE START ---
-{source_code}
-# --- USER CODE END ---
-
-def get_user_function():
-    all_funcs = [
-        obj for name, obj in globals().items() 
-        if inspect.isfunction(obj) 
-        and name not in ['get_user_function', 'run_tests', 'encode_b64', 'decode_b64']
-        and obj.__module__ == '__main__'
-    ]
-    if all_funcs: return all_funcs[-1]
-    return None
-
-def run_tests():
-    # We use explicit repr() or just the variable to ensure Python boolean syntax (True/False)
-    test_cases = {test_cases} 
-    results = []
-    
-    user_func = get_user_function()
-    
-    if not user_func:
-        print("---JSON_START---")
-        print(json.dumps({{"stats": {{"total": 0, "passed": 0}}, "error": "No function found."}}))
-        print("---JSON_END---")
-        return
+    if language_id == PYTHON_LANGUAGE_ID: 
+        driver = build_python_driver(source_code, time_budget=python_time_budget(executor.time_limit()))
+        progress("running", total=len(test_cases))
+        data = execute_judge0(driver, language_id, cases_stdin(test_cases))
+        progress("grading")
+        return grade_python_result(data, test_cases, progress)
+
+    # STRATEGY 1b: JAVA / C++ with a named function -> call it for every case in one execution
+    harness = build_function_harness(source_code, language_id, function_name)
+    if harness:
+        progress("running", total=len(test_cases))
+        data = execute_judge0(harness, language_id, harness_stdin(test_cases))
+        progress("grading")
+        report = grade_harness_result(data, test_cases, progress)
+        if report is not None:
+            return report
+        # Harness didn't fit this submission (no such function / signature): fall through to the per-case path
+
+    # STRATEGY 2: JAVA / C++ (Server-Side Loop - Robust)
+    # For Java/C++, we execute the user code *for each test case* individually
+    # (compiled once, then run per case). This supports 'Scanner' and 'cin' style coding perfectly.
+    progress("running", total=len(test_cases))
+    batch = execute_judge0_batch(source_code, language_id, [case.get("input") for case in test_cases])
+    progress("grading")
+    return grade_case_results(test_cases, batch, total_start, progress)
 
-    start_total = time.time()
+
+@celery_app.task(name="worker.run_code_task", bind=True)
+def run_code_task(self, source_code, language_id, test_cases_json, function_name=None, challenge_id=None, test_case_version=None, lane=None, enqueued_at=None):
+    task_id = self.request.id
+    execution_lanes.record_wait(redis_sync, lane, enqueued_at)
+    progress = execution_events.progress_publisher(redis_sync, task_id)
+    progress("started")
     
-    for i, case in enumerate(test_cases):
-        inp = case.get("input")
-        expected = case.get("output")
-        
-        try:
-            # Type Conversion Attempt
-            if isinstance(inp, str) and inp.isdigit(): inp = int(inp)
-            
-            actual = user_func(inp)
-            passed = str(actual).strip() == str(expected).strip()
-            
-            results.append({{
-                "id": i,
-                "status": "Passed" if passed else "Failed",
-                "input": str(inp),
-                "expected": str(expected),
-                "actual": str(actual)
-            }})
-        except Exception as e:
-            results.append({{"id": i, "status": "Runtime Error", "error": str(e), "input": str(inp)}})
-            
-    end_total = time.time()
+    # 📚 Challenge runs ship (challenge_id, version) instead of the cases (see challenge_cases.py)
+    cache_cases, run_function = test_cases_json, function_name
+    if challenge_id is not None:
+        cache_cases = challenge_cases.cache_ref(challenge_id, test_case_version)
+        snapshot = challenge_cases.resolve(redis_sync, challenge_id, test_case_version)
+        if snapshot is None:
+            result = {"status": "error", "output": "This challenge no longer exists."}
+            execution_events.publish(redis_sync, task_id, execution_events.result_event(result))
+            return result
+        test_cases_json = snapshot["test_cases"]
+        run_function = function_name or snapshot.get("function_name")
     
-    report = {{
-        "stats": {{
-            "total": len(test_cases),
-            "passed": len([r for r in results if r["status"] == "Passed"]),
-            "runtime_ms": round((end_total - start_total) * 1000, 2)
-        }},
-        "results": results
-    }}
+    # Graded on the full outputs; what is kept/sent from here on is size-capped (result_storage.py)
+    result = result_storage.compact(run_code(source_code, language_id, test_cases_json, progress=progress, function_name=run_function))
+    # 🙈 Hidden challenge cases stay hidden on plain runs too (cached and streamed results included)
+    result = redact_hidden(result, parse_test_cases(test_cases_json) or [])
+    # ⚡ Remember deterministic outcomes so identical re-runs are answered by the API directly
+    result_cache.store(redis_sync, result_cache.cache_key(source_code, language_id, cache_cases, function_name), result)
     
-    print("---JSON_START---")
-    print(json.dumps(report))
-    print("---JSON_END---")
-
-if __name__ == "__main__":
-    try: run_tests()
-    except Exception as e: print(f"Driver Error: {{e}}")
-"""
-        # Run Python Driver
-        data = execute_judge0(driver_template, language_id, "")
-        
-        # Parse Python Result
-        status_id = data.get("status", {}).get("id", 0)
-        if status_id == 3:
-            raw_output = decode_b64(data.get("stdout"))
-            if "---JSON_START---" in raw_output:
-                json_str = raw_output.split("---JSON_START---")[1].split("---JSON_END---")[0]
-                return {"status": "success", "data": json.loads(json_str)}
-            return {"status": "error", "output": raw_output}
-        elif status_id == 6:
-            return {"status": "compilation_error", "output": decode_b64(data.get("compile_output"))}
-        else:
-            return {"status": "runtime_error", "output": decode_b64(data.get("stderr"))}
-
-    # ---------------------------------------------------------
-    # STRATEGY 2: JAVA / C++ (Server-Side Loop - Robust)
-    # ---------------------------------------------------------
-    else: 
-        # For Java/C++, we execute the user code *for each test case* individually.
-        # This supports 'Scanner' and 'cin' style coding perfectly.
-        
-        passed_count = 0
-        
-        for i, case in enumerate(test_cases):
-            inp = case.get("input")
-            expected = str(case.get("output")).strip()
-            
-            # Run on Judge0
-            data = execute_judge0(source_code, language_id, inp)
-            
-            status_id = data.get("status", {}).get("id", 0)
-            
-            if status_id == 3: # Accepted
-                actual = decode_b64(data.get("stdout")).strip()
-                passed = actual == expected
-                if passed: passed_count += 1
-                
-                results.append({
-                    "id": i,
-                    "status": "Passed" if passed else "Failed",
-                    "input": inp,
-                    "expected": expected,
-                    "actual": actual
-                })
-            
-            elif status_id == 6: # Compilation Error (Fail immediately)
-                return {"status": "compilation_error", "output": decode_b64(data.get("compile_output"))}
-            
-            else: # Runtime Error
-                err_msg = decode_b64(data.get("stderr")) or data.get("status", {}).get("description")
-                results.append({
-                    "id": i,
-                    "status": "Runtime Error",
-                    "error": err_msg,
-                    "input": inp
-                })
-
-        total_end = time.time()
-        
-        # Construct JSON Report manually
-        report = {
-            "stats": {
-                "total": len(test_cases),
-                "passed": passed_count,
-                "runtime_ms": round((total_end - total_start) * 1000, 2)
-            },
-            "results": results
-        }
-        
-        return {"status": "success", "data": report}
+    # 📡 Final report for /api/v1/stream subscribers (polling still works off the result backend)
+    execution_events.publish(redis_sync, task_id, execution_events.result_event(result))
+    return result_storage.pack(result)
+
+
+
+# Upsert under a per-(user, challenge) advisory lock: no duplicate rows even when two submits race
+RECORD_SOLUTION_SQL = text("""
+    WITH updated AS (
+        UPDATE challenge_progress SET is_solved = TRUE, solved_at = :time, user_code = :code, language_id = :lang
+        WHERE user_id = :uid AND challenge_id = :cid
+        RETURNING id
+    )
+    INSERT INTO challenge_progress (user_id, challenge_id, is_solved, solved_at, user_code, language_id)
+    SELECT :uid, :cid, TRUE, :time, :code, :lang
+    WHERE NOT EXISTS (SELECT 1 FROM updated)
+""")
+
+def record_solution(user_id, challenge_id, source_code, language_id):
+    with get_sync_engine().begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:uid, :cid)"), {"uid": user_id, "cid": challenge_id})
+        conn.execute(RECORD_SOLUTION_SQL, {"uid": user_id, "cid": challenge_id, "code": source_code, "lang": language_id, "time": datetime.utcnow()})
+    # 🔍 Keep the near-duplicate index current (best effort, rebuildable offline)
+    try:
+        similarity.index(redis_sync, similarity.scope_for_challenge(challenge_id), user_id, source_code)
+    except Exception as e:
+        print(f"Similarity index update failed (ignored): {e}")
+
+
+@celery_app.task(name="worker.submit_challenge_task", bind=True)
+def submit_challenge_task(self, source_code, language_id, challenge_id, test_case_version, user_id):
+    """
+    Judged submission: runs the challenge's full test set (hidden cases included) and, when
+    everything passes, records ChallengeProgress with the code in one transaction.
+    The verdict goes out on the task's event channel like any run (see /api/v1/stream).
+    """
+    task_id = self.request.id
+    progress = execution_events.progress_publisher(redis_sync, task_id)
+    progress("started")
+
+    snapshot = challenge_cases.resolve(redis_sync, challenge_id, test_case_version)
+    if snapshot is None:
+        result = {"status": "error", "output": "This challenge no longer exists."}
+    else:
+        test_cases = parse_test_cases(snapshot["test_cases"]) or []
+        result = run_code(source_code, language_id, snapshot["test_cases"], progress=progress, function_name=snapshot.get("function_name"))
+        accepted = is_accepted(result, test_cases)
+        recorded = False
+        for attempt in range(3 if accepted else 0):
+            try:
+                record_solution(user_id, challenge_id, source_code, language_id)
+                recorded = True
+                break
+            except Exception as e:
+                print(f"❌ Failed to record solution (user {user_id}, challenge {challenge_id}, attempt {attempt + 1}): {e}")
+                time.sleep(1)
+        result = result_storage.compact({**redact_hidden(result, test_cases), "verdict": "accepted" if accepted else "rejected", "recorded": recorded})
+
+    execution_events.publish(redis_sync, task_id, execution_events.result_event(result))
+    return result_storage.pack(result)
+
+
+
+# ---------------------------------------------------------
+# BULK REGRADE (job state in regrade.py)
+# ---------------------------------------------------------
+def grade_stored_solution(row, test_cases_json, function_name):
+    """(progress_id, accepted) or (progress_id, None) when the run itself failed."""
+    progress_id, source_code, language_id = row
+    try:
+        result = run_code(source_code, language_id, test_cases_json, function_name=function_name)
+    except Exception as e:
+        print(f"Regrade of progress {progress_id} crashed: {e}")
+        return progress_id, None
+    if result.get("status") in ("success", "compilation_error", "runtime_error"):
+        return progress_id, is_accepted(result, parse_test_cases(test_cases_json) or [])
+    return progress_id, None  # executor/config error: leave the row alone
+
+
+# Old rows predate challenge_progress.language_id; they came from the Python-only arena
+REGRADE_PAGE_SQL = text("""
+    SELECT id, user_code, COALESCE(language_id, 71) FROM challenge_progress
+    WHERE challenge_id = :cid AND user_code IS NOT NULL AND id > :cursor
+    ORDER BY id LIMIT :limit
+""")
+
+
+@celery_app.task(name="worker.regrade_challenge_task", bind=True, acks_late=True, reject_on_worker_lost=True)
+def regrade_challenge_task(self, job_id):
+    """
+    Re-runs every stored solution of a challenge against its current cases and rewrites is_solved.
+    Pages through challenge_progress by id; each page is graded REGRADE_CONCURRENCY at a time
+    (Judge0 calls still go through the shared rate limiter), written back with one executemany
+    and checkpointed. acks_late: if the worker dies, the task is redelivered and resumes from the cursor.
+    A delivery that finds the job locked by a live run (see regrade.JobLock) retries later.
+    """
+    job = regrade.load(redis_sync, job_id)
+    if not job or job["status"] in ("completed", "failed"):
+        return job
+
+    lock = regrade.JobLock(redis_sync, job_id)
+    if not lock.acquire():
+        print(f"🔁 Regrade {job_id} is already running elsewhere; checking again in {regrade.LOCK_TTL}s")
+        raise self.retry(countdown=regrade.LOCK_TTL, max_retries=None)
+    try:
+        job = regrade.load(redis_sync, job_id)   # may have finished while we waited for the lock
+        if job["status"] in ("completed", "failed"):
+            return job
+        return regrade_job(job, lock)
+    finally:
+        lock.release()
+
+
+def regrade_job(job, lock):
+    """The body of regrade_challenge_task, run while holding the job's lock."""
+    job_id, challenge_id = job["job_id"], job["challenge_id"]
+
+    engine = get_sync_engine()
+    with engine.connect() as conn:
+        challenge = conn.execute(text("SELECT test_cases, function_name FROM course_challenges WHERE id = :cid"), {"cid": challenge_id}).first()
+        if challenge is None:
+            regrade.finish(redis_sync, job_id, challenge_id, status="failed", error="Challenge not found")
+            return regrade.load(redis_sync, job_id)
+        total = conn.execute(text("SELECT COUNT(*) FROM challenge_progress WHERE challenge_id = :cid AND user_code IS NOT NULL"), {"cid": challenge_id}).scalar()
+    test_cases_json, function_name = challenge
+
+    regrade.update(redis_sync, job_id, status="running", total=total, started_at=job.get("started_at") or time.time())
+    cursor = job["cursor"]
+    print(f"🔁 Regrade {job_id}: challenge {challenge_id}, {total} solutions, resuming after id {cursor}")
+
+    with ThreadPoolExecutor(max_workers=max(1, REGRADE_CONCURRENCY)) as pool:
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(REGRADE_PAGE_SQL, {"cid": challenge_id, "cursor": cursor, "limit": REGRADE_PAGE_SIZE}).fetchall()
+            if not rows:
+                break
+            if lock.lost.is_set():
+                # Another delivery owns the job now and resumes from the last checkpoint
+                print(f"⚠️ Regrade {job_id}: lock lost after id {cursor}, stopping")
+                return regrade.load(redis_sync, job_id)
+
+            graded = list(pool.map(lambda row: grade_stored_solution(row, test_cases_json, function_name), rows))
+            updates = [{"id": pid, "solved": accepted} for pid, accepted in graded if accepted is not None]
+            if updates:
+                with engine.begin() as conn:
+                    conn.execute(text("UPDATE challenge_progress SET is_solved = :solved WHERE id = :id"), updates)
+
+            cursor = rows[-1][0]
+            regrade.checkpoint(
+                redis_sync, job_id, cursor,
+                solved=sum(1 for u in updates if u["solved"]),
+                unsolved=sum(1 for u in updates if not u["solved"]),
+                errors=len(rows) - len(updates),
+            )
+
+    regrade.finish(redis_sync, job_id, challenge_id)
+    return regrade.load(redis_sync, job_id)
+
+
+
+@celery_app.task(name="worker.rebuild_similarity_task")
+def rebuild_similarity_task(challenge_id):
+    """Offline rebuild of one challenge's near-duplicate index from the stored solutions."""
+    with get_sync_engine().connect() as conn:
+        rows = conn.execute(text("SELECT user_id, user_code FROM challenge_progress WHERE challenge_id = :cid AND user_code IS NOT NULL"), {"cid": challenge_id}).fetchall()
+    count = similarity.rebuild(redis_sync, similarity.scope_for_challenge(challenge_id), rows)
+    print(f"🔍 Similarity index for challenge {challenge_id} rebuilt ({count} solutions)")
+    return count
     
     
+@celery_app.task(name="worker.evict_results_task")
+def evict_results_task():
+    """Periodic (Celery beat): keeps stored execution results and the result cache inside their budgets."""
+    stats = result_storage.evict(redis_sync)
+    result_cache.evict(redis_sync)
+    print(f"🧹 Result eviction: {stats}")
+    return stats
+
+
 @celery_app.task(name="worker.run_backup_task")
 def run_backup_task():
     print("Executing Daily Backup...")
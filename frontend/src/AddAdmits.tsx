@@ -108,10 +108,19 @@ const AddAdmits = () => {
     formData.append("course_id", bulkCourseId.toString());
     try {
       const token = localStorage.getItem("token");
-      await axios.post(`${API_BASE_URL}/admin/bulk-admit`, formData, {
+      const res = await axios.post(`${API_BASE_URL}/admin/bulk-admit`, formData, {
         headers: { Authorization: `Bearer ${token}`, "Content-Type": "multipart/form-data" }
       });
-      triggerToast(`🎉 Bulk Process Complete! Emails Sent.`, "success");
+      // Large files keep running on the server: poll the job until it finishes
+      let job = res.data.job;
+      while (job && (job.status === "queued" || job.status === "running")) {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        job = (await axios.get(`${API_BASE_URL}/admin/bulk-admit/${res.data.job_id}`, {
+          headers: { Authorization: `Bearer ${token}` }
+        })).data;
+      }
+      if (job && job.status !== "completed") throw new Error(job.error || job.status);
+      triggerToast(`🎉 Bulk Process Complete! ${job ? job.enrolled : ""} enrolled, emails sent.`, "success");
       setBulkFile(null);
     } catch (err: any) { triggerToast("Upload failed", "error"); }
     finally { setBulkLoading(false); }
@@ -127,8 +127,9 @@ def solve(x):
             const res = await axios.post(`${API_BASE_URL}/execute`, {
                 source_code: code,
                 language_id: language,
-                test_cases: testCasesPayload // ✅ Sending Array
-            });
+                test_cases: testCasesPayload, // ✅ Sending Array
+                content_item_id: lesson.id // scheduled assessments run in the exam lane
+            }, { headers: { Authorization: `Bearer ${localStorage.getItem("token")}` } }); // own quota, not the shared per-IP one
 
             const taskId = res.data.task_id;
 
@@ -322,15 +323,10 @@ def solve(x):
             const langMap: any = { "python": 71, "java": 62, "cpp": 54, "javascript": 63 };
             const langId = langMap[course.language] || 71;
 
-            let cases = [];
-            try {
-                cases = typeof selectedProblem.test_cases === 'string' ? JSON.parse(selectedProblem.test_cases) : selectedProblem.test_cases;
-            } catch (e) {
-                setOutput("❌ Error: Invalid Test Case Format.");
-                setLoading(false); return;
-            }
-
-            const res = await axios.post(`${API_BASE_URL}/execute`, { source_code: code, language_id: langId, test_cases: cases });
+            // Judged on the server against every case (hidden ones included); it records the solve itself
+            const res = await axios.post(`${API_BASE_URL}/challenges/${selectedProblem.id}/submit`,
+                { source_code: code, language_id: langId },
+                { headers: { Authorization: `Bearer ${token}` } });
             setOutput("Running tests on server...");
 
             const result = await pollResult(res.data.task_id);
@@ -341,22 +337,20 @@ def solve(x):
 
                 setStats({ runtime: `${report.stats.runtime_ms} ms`, passed: report.stats.passed, total: report.stats.total, results: report.results || [] });
 
-                if (report.stats.passed === report.stats.total) {
+                if (result.verdict === "accepted") {
                     setOutput("🎉 SUCCESS! All Test Cases Passed.");
                     triggerToast("Problem Solved!", "success");
 
-                    // 1. Mark Solved in Backend
-                    await axios.post(`${API_BASE_URL}/challenges/${selectedProblem.id}/solve`, {}, { headers: { Authorization: `Bearer ${token}` } });
-
-                    // 2. Update Local State (Green Tick appears immediately)
+                    // 1. Update Local State (Green Tick appears immediately)
                     const updated = challenges.map(c => c.id === selectedProblem.id ? { ...c, is_solved: true } : c);
                     setChallenges(updated);
 
-                    // 3. Re-Check Locked Status (Important!)
+                    // 2. Re-Check Locked Status (Important!)
                     // Since state updated, React will re-render and `isTabLocked` logic will run automatically.
                 } else {
                     const fail = report.results.find((r: any) => r.status !== "Passed");
-                    if (fail) setOutput(`❌ TEST FAILED (Case ${fail.id + 1})\n\nInput: ${fail.input}\nExpected: ${fail.expected}\nActual: ${fail.actual}`);
+                    if (fail && fail.input === undefined) setOutput(`❌ TEST FAILED (Hidden Case ${fail.id + 1}): ${fail.status}`);
+                    else if (fail) setOutput(`❌ TEST FAILED (Case ${fail.id + 1})\n\nInput: ${fail.input}\nExpected: ${fail.expected}\nActual: ${fail.actual}`);
                 }
             } else {
                 setOutput(result.output || "Execution Error");
@@ -678,8 +672,9 @@ const LiveTestProctor = ({ lesson }: { lesson: any }) => {
             try {
                 const token = localStorage.getItem("token");
                 // Call the new endpoint we just added
-                const res = await axios.get(`${API_BASE_URL} /proctoring/status / ${lesson.id} `, {
-                    headers: { Authorization: `Bearer ${token} ` }
+                // Inside the test window this also opens the attempt that puts runs in the exam lane
+                const res = await axios.get(`${API_BASE_URL}/proctoring/status/${lesson.id}`, {
+                    headers: { Authorization: `Bearer ${token}` }
                 });
 
                 if (res.data.is_terminated) {
@@ -749,9 +744,9 @@ const LiveTestProctor = ({ lesson }: { lesson: any }) => {
 
         try {
             const token = localStorage.getItem("token");
-            const res = await axios.post(`${API_BASE_URL} /proctoring/violation`,
+            const res = await axios.post(`${API_BASE_URL}/proctoring/violation`,
                 { lesson_id: lesson.id },
-                { headers: { Authorization: `Bearer ${token} ` } }
+                { headers: { Authorization: `Bearer ${token}` } }
             );
 
             setViolationCount(res.data.violation_count);
@@ -511,7 +511,8 @@ const StudentDashboard = () => {
                 {
                     source_code: userCode,
                     language_id: language,
-                    test_cases: testCases // ✅ Sending Array
+                    test_cases: testCases, // ✅ Sending Array
+                    code_test_id: activeTest?.id // exam lane while this attempt is open
                 },
                 { headers: { Authorization: `Bearer ${localStorage.getItem("token")}` } }
             );